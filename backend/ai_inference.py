@@ -1,12 +1,34 @@
+import logging
 import os
 import pickle
-import osmnx as ox
+import threading
+import multiprocessing
 import networkx as nx
 import numpy as np
-from collections import defaultdict, deque
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 import time
 
+from services.local_graph import GRAPHS_SUFFIX, LocalGraphStore, base_key
+from services.metrics import observe_stage, timed
+from services.qtable import CompactQTable, qtable_path
+from services.plow_engine import POLICIES, CompiledGraph, CompiledSnowEnv, inference_tables, make_policy
+
+GRAPH_DIST = 3500
+WORK_STEPS = 400
+STREAM_BATCH = 25
+# greedy: 기존 정책 그대로, lookahead: k홉 미리보기로 제설된 길 반복 주행을 줄임 (services.plow_engine)
+AI_POLICY = os.getenv("AI_POLICY", "greedy")
+# 추론 풀 크기는 프로세스(gunicorn 워커)마다 따로이므로 기본은 코어 수 / 웹 워커 수 (gunicorn.conf.py가 WEB_WORKERS 설정)
+AI_WORKERS = int(os.getenv("AI_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // (int(os.getenv("WEB_WORKERS", "0")) or 1))
+# 지역 그래프 캐시 크기 (기지 수보다 크게)
+AI_GRAPH_CACHE = int(os.getenv("AI_GRAPH_CACHE", "256"))
+
+log = logging.getLogger(__name__)
+
 class InferenceSnowEnv:
+    """원래 정수 비트마스크 구현 (services.plow_engine 결과 비교용 기준)"""
+
     def __init__(self, start, g, attr, step_limit=400):
         self.start = start
         self.g = g
@@ -73,64 +95,373 @@ def select_action(env, Q):
             
     return best
 
-def get_ai_route(gu_name, start_lat, start_lng):
-    model_file = f"models/q_table_{gu_name}.pkl"
-    
-    if not os.path.exists(model_file):
-        print(f"⚠️ 모델 없음: {model_file}")
+class LocalGraph:
+    """한 제설 기지 주변의 추론용 그래프 (요청마다 다시 만들지 않도록 캐시)"""
+
+    def __init__(self, G, start_node):
+        self.G = G
+        self.start_node = start_node
+        self.graph_dict, self.edge_attr = inference_tables(G)
+        self.compiled = CompiledGraph(self.graph_dict, self.edge_attr)
+        self._q_indexes = {}
+        self._lock = threading.Lock()
+
+    def q_index(self, gu_name, Q):
+        """이 그래프 기준으로 변환한 Q 색인 (Q-table이 다시 로드되면 새로 변환)"""
+        with self._lock:
+            cached = self._q_indexes.get(gu_name)
+            if cached is not None and cached[0] is Q:
+                return cached[1]
+        index = self.compiled.compile_q(Q)
+        with self._lock:
+            self._q_indexes[gu_name] = (Q, index)
+        return index
+
+
+class ModelRegistry:
+    """구별 Q-table과 기지별 지역 그래프를 LRU로 보관
+
+    Q-table은 변환된 q_table_{gu}.qtab(mmap)이 최신이면 그것을, 아니면 pkl을 읽고
+    파일 수정 시각이 바뀌면 다시 읽는다. 지역 그래프는 Q 상태 순서가 학습 때와 같아야 하므로
+    model_dir의 q_table_*.graphs에 저장된 학습 그래프(osmnx 노드/엣지 순서)만 쓰고, 네트워크에서
+    내려받거나 도시 스냅샷에서 잘라내지 않는다. 저장된 그래프가 없는 기지는 FileNotFoundError.
+    """
+
+    def __init__(self, model_dir='models', max_models=32, max_graphs=AI_GRAPH_CACHE):
+        self.model_dir = model_dir
+        self.max_models = max_models
+        self.max_graphs = max_graphs
+        self._models = OrderedDict()
+        self._graphs = OrderedDict()
+        self._stores = (None, {})  # (파일 스탬프, {기지 키: (LocalGraphStore, 슬롯)})
+        self._lock = threading.Lock()
+
+    def model_path(self, gu_name):
+        return os.path.join(self.model_dir, f"q_table_{gu_name}.pkl")
+
+    def has_model(self, gu_name):
+        path = self.model_path(gu_name)
+        return os.path.exists(path) or os.path.exists(qtable_path(path))
+
+    def q_table(self, gu_name):
+        """구의 Q-table (dict 또는 CompactQTable, 모델 파일이 없으면 None)"""
+        pkl_path = self.model_path(gu_name)
+        compact_path = qtable_path(pkl_path)
+        paths = [p for p in (compact_path, pkl_path) if os.path.exists(p)]
+        if not paths:
+            return None
+        stamp = tuple(os.stat(p).st_mtime_ns for p in paths)
+        with self._lock:
+            cached = self._models.get(gu_name)
+            if cached is not None and cached[0] == stamp:
+                self._models.move_to_end(gu_name)
+                return cached[1]
+
+        load_started = time.perf_counter()
+        Q = None
+        if os.path.exists(compact_path):
+            table = CompactQTable.load(compact_path)
+            if table.is_current(pkl_path):
+                Q = table
+            else:
+                log.warning("⚠️ %s가 원본보다 오래되어 pkl을 읽습니다. (python -m services.qtable convert)", compact_path)
+        if Q is None:
+            with open(pkl_path, 'rb') as f:
+                Q = pickle.load(f)['Q']
+        observe_stage('qtable_load', time.perf_counter() - load_started)
+        with self._lock:
+            self._models[gu_name] = (stamp, Q)
+            self._models.move_to_end(gu_name)
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        return Q
+
+    def _stored_graphs(self):
+        """model_dir의 저장된 학습 그래프 {기지 키: (store, 슬롯)} (파일이 바뀌면 다시 읽음)"""
+        try:
+            names = sorted(n for n in os.listdir(self.model_dir)
+                           if n.startswith('q_table_') and n.endswith(GRAPHS_SUFFIX))
+        except FileNotFoundError:
+            names = []
+        paths = [os.path.join(self.model_dir, n) for n in names]
+        stamp = tuple((p, os.stat(p).st_mtime_ns) for p in paths)
+        with self._lock:
+            if self._stores[0] == stamp:
+                return self._stores[1]
+        bases = {}
+        for path in paths:
+            store = LocalGraphStore.load(path)
+            for slot, (lat, lng) in enumerate(store.bases()):
+                bases.setdefault(base_key(lat, lng), (store, slot))
+        with self._lock:
+            self._stores = (stamp, bases)
+        return bases
+
+    def has_graph(self, lat, lng):
+        key = base_key(lat, lng)
+        with self._lock:
+            if key in self._graphs:
+                return True
+        return key in self._stored_graphs()
+
+    def local_graph(self, lat, lng):
+        """기지 좌표 주변 GRAPH_DIST(m) 지역 그래프 (저장된 학습 그래프가 없으면 FileNotFoundError)"""
+        key = base_key(lat, lng)
+        with self._lock:
+            cached = self._graphs.get(key)
+            if cached is not None:
+                self._graphs.move_to_end(key)
+                return cached
+
+        load_started = time.perf_counter()
+        stored = self._stored_graphs().get(key)
+        if stored is None:
+            raise FileNotFoundError(f"({lat:.6f}, {lng:.6f}) 기지의 학습 그래프가 없습니다: "
+                                    f"{os.path.join(self.model_dir, 'q_table_*' + GRAPHS_SUFFIX)} "
+                                    f"(python -m services.local_graph export)")
+        store, slot = stored
+        G, start_node = store.graph(slot)
+        local = LocalGraph(G, start_node)
+        observe_stage('local_graph', time.perf_counter() - load_started)
+
+        with self._lock:
+            self._graphs[key] = local
+            while len(self._graphs) > self.max_graphs:
+                self._graphs.popitem(last=False)
+        return local
+
+    def warm(self, bases):
+        """기지 좌표 [(lat, lng), ...] 중 학습 그래프가 저장된 것의 지역 그래프를 미리 생성. 새로 만든 개수 반환"""
+        built = 0
+        stored = self._stored_graphs()
+        for lat, lng in bases:
+            key = base_key(lat, lng)
+            with self._lock:
+                cached = key in self._graphs
+            if not cached and key in stored:
+                self.local_graph(lat, lng)
+                built += 1
+        return built
+
+    def preload_graphs(self):
+        """저장된 모든 기지 학습 그래프를 미리 생성 (max_graphs까지). 새로 만든 개수 반환"""
+        return self.warm(list(self._stored_graphs())[:self.max_graphs])
+
+    def preload(self):
+        """model_dir의 모든 구 Q-table을 미리 로드. 로드한 구 이름 목록 반환"""
+        if not os.path.isdir(self.model_dir):
+            return []
+        loaded = []
+        for name in sorted(os.listdir(self.model_dir)):
+            stem, ext = os.path.splitext(name)
+            if stem.startswith('q_table_') and ext in ('.pkl', '.qtab'):
+                gu_name = stem[len('q_table_'):]
+                if gu_name not in loaded:
+                    self.q_table(gu_name)
+                    loaded.append(gu_name)
+        return loaded
+
+
+registry = ModelRegistry()
+
+
+def iter_plan(gu_name, start_lat, start_lng, batch_size=STREAM_BATCH, policy=None):
+    """제설 경로를 만들어 가며 좌표 묶음을 차례로 낸다
+
+    ('work', [[lat, lng], ...]) — 출발점 하나를 바로 낸 뒤 batch_size 스텝마다
+    ('return', [[lat, lng], ...]) — 기지 복귀 경로
+    ('done', {'plowed': 제설한 엣지 [k, 2], 'edges': 지역 그래프 엣지 [E, 2]}) — 마지막 한 번
+    (엣지는 정렬된 osmid 쌍)
+    policy: POLICIES 중 하나 (기본 AI_POLICY)
+    """
+    Q = registry.q_table(gu_name)
+    if Q is None:
+        raise FileNotFoundError(registry.model_path(gu_name))
+    local = registry.local_graph(start_lat, start_lng)
+    G, start_node = local.G, local.start_node
+
+    graph = local.compiled
+    with timed('qtable_index'):
+        q_index = local.q_index(gu_name, Q)
+    select = make_policy(policy or AI_POLICY, graph)
+    env = CompiledSnowEnv(graph, graph.node_id[start_node], step_limit=WORK_STEPS)
+
+    curr = start_node
+    yield 'work', [[G.nodes[curr]['y'], G.nodes[curr]['x']]]
+
+    log.debug("🚜 [1단계] AI 제설 작업 수행 중...")
+    pending = []
+    select_s = 0.0
+    for i in range(WORK_STEPS):
+        started = time.perf_counter()
+        nxt = select(env, q_index)
+        select_s += time.perf_counter() - started
+        if nxt is None: break
+
+        env.step(nxt)
+        curr = graph.nodes[nxt]
+
+        pending.append([G.nodes[curr]['y'], G.nodes[curr]['x']])
+        if len(pending) >= batch_size:
+            yield 'work', pending
+            pending = []
+
+        if env.remaining == 0: break
+    if pending:
+        yield 'work', pending
+    # 스트리밍 중 소비자 대기 시간이 섞이지 않도록 정책 선택 시간만 합산
+    observe_stage('plow_select', select_s)
+
+    if curr != start_node:
+        log.debug("🏠 [2단계] 작업 종료 후 기지로 복귀 중...")
+        try:
+            with timed('plow_return'):
+                return_path = nx.shortest_path(G, source=curr, target=start_node, weight='length')
+            for i in range(1, len(return_path), batch_size):
+                yield 'return', [[G.nodes[node]['y'], G.nodes[node]['x']] for node in return_path[i:i + batch_size]]
+
+        except nx.NetworkXNoPath:
+            log.warning("⚠️ 복귀 경로를 찾을 수 없습니다.")
+
+    yield 'done', {'plowed': graph.edge_pairs[env.plowed_edges()], 'edges': graph.edge_pairs}
+
+
+def plan_route(gu_name, start_lat, start_lng, policy=None):
+    """기지 하나의 제설 경로 추론
+
+    반환: {'path': [[lat, lng], ...], 'plowed': 제설한 엣지 [k, 2], 'edges': 지역 그래프 엣지 [E, 2]}
+    (엣지는 정렬된 osmid 쌍). 모델이 없으면 None.
+    """
+    if not registry.has_model(gu_name):
+        log.warning("⚠️ 모델 없음: %s", registry.model_path(gu_name))
         return None
 
+    started = time.perf_counter()
+    path_coords = []
+    for phase, item in iter_plan(gu_name, start_lat, start_lng, policy=policy):
+        if phase == 'done':
+            observe_stage('inference', time.perf_counter() - started)
+            log.info("✅ 최종 경로 생성 완료: 총 %d 구간", len(path_coords))
+            return {'path': path_coords, **item}
+        path_coords.extend(item)
+
+
+def get_ai_route(gu_name, start_lat, start_lng, policy=None):
     try:
-        with open(model_file, 'rb') as f:
-            data = pickle.load(f)
-            Q = data['Q']
+        result = plan_route(gu_name, start_lat, start_lng, policy)
+        return result['path'] if result else None
+
+    except Exception as e:
+        log.exception("❌ AI 추론 중 오류 발생: %s", e)
+        return None
 
-        print(f"🗺️ 지도 데이터 로딩 중... (R=3.5km, {gu_name})")
-        G = ox.graph_from_point((start_lat, start_lng), dist=3500, network_type='drive', simplify=True)
-        
-        start_node = ox.distance.nearest_nodes(G, start_lng, start_lat)
-        
-        graph_dict = {n: list(G.neighbors(n)) for n in G.nodes()}
-        edge_attr = {}
-        for u, v, d in G.edges(data=True):
-            edge_attr[frozenset({u, v})] = d 
-            
-        WORK_STEPS = 400
-        env = InferenceSnowEnv(start_node, graph_dict, edge_attr, step_limit=WORK_STEPS)
-        
-        path_coords = []
-        curr = start_node
-        
-        path_coords.append([G.nodes[curr]['y'], G.nodes[curr]['x']])
-        
-        print("🚜 [1단계] AI 제설 작업 수행 중...")
-        for i in range(WORK_STEPS):
-            nxt = select_action(env, Q)
-            if nxt is None: break
-            
-            env.step(nxt)
-            curr = nxt
-            
-            path_coords.append([G.nodes[nxt]['y'], G.nodes[nxt]['x']])
-            
-            if env.unplowed == 0: break 
-            
-        if curr != start_node:
-            print("🏠 [2단계] 작업 종료 후 기지로 복귀 중...")
-            try:
-                return_path = nx.shortest_path(G, source=curr, target=start_node, weight='length')
-                
-                for node in return_path[1:]:
-                    path_coords.append([G.nodes[node]['y'], G.nodes[node]['x']])
-                    
-            except nx.NetworkXNoPath:
-                print("⚠️ 복귀 경로를 찾을 수 없습니다.")
 
-        print(f"✅ 최종 경로 생성 완료: 총 {len(path_coords)} 구간")
-        return path_coords
+# ---------------------------------------------------------------------------
+# 여러 기지 일괄 추론 (프로세스 풀)
+# ---------------------------------------------------------------------------
+_pool = None
+_pool_lock = threading.Lock()
 
+
+def _mp_context():
+    # 요청/작업 큐 스레드가 도는 프로세스에서 fork하면 다른 스레드가 잡은 잠금을 물려받을 수 있음 (route_batch와 같은 방식)
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    ctx = multiprocessing.get_context('forkserver')
+    ctx.set_forkserver_preload([__name__])
+    return ctx
+
+
+def _init_worker(model_dir):
+    """워커: 부모와 같은 모델 폴더의 Q-table과 기지 학습 그래프를 미리 로드"""
+    registry.model_dir = model_dir
+    registry.preload()
+    registry.preload_graphs()
+
+
+def _plan_worker(gu_name, lat, lng, policy=None):
+    try:
+        result = plan_route(gu_name, lat, lng, policy)
     except Exception as e:
-        print(f"❌ AI 추론 중 오류 발생: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
\ No newline at end of file
+        return {'error': str(e)}
+    if result is None:
+        return {'error': '모델이 없습니다.'}
+    return result
+
+
+def _get_pool():
+    """AI_WORKERS 크기의 워커 풀 (처음 쓸 때 생성해 재사용)
+
+    워커는 forkserver(없으면 spawn)로 띄우고 initializer에서 모델과 그래프를 올린다.
+    .qtab/.graphs는 mmap이라 워커들이 페이지 캐시를 함께 쓴다.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=AI_WORKERS, mp_context=_mp_context(), initializer=_init_worker,
+                                        initargs=(registry.model_dir,))
+        return _pool
+
+
+def plan_route_in_pool(gu_name, start_lat, start_lng, policy=None):
+    """plan_route를 워커 프로세스에서 실행 (호출 스레드는 GIL을 잡지 않고 기다림)"""
+    with timed('inference_pool'):
+        result = _get_pool().submit(_plan_worker, gu_name, start_lat, start_lng, policy).result()
+    if 'error' in result:
+        raise RuntimeError(result['error'])
+    return {
+        'path': result['path'],
+        'plowed_edges': len(result['plowed']),
+        'total_edges': len(result['edges']),
+    }
+
+
+def plan_routes(gu_name, bases, workers=None, policy=None):
+    """여러 기지의 제설 경로를 병렬 추론하고 합산 커버리지를 계산
+
+    bases: [{'lat': ..., 'lng': ..., (선택) 'id': ...}, ...]
+    workers=1이면 호출한 프로세스에서 차례로 실행한다.
+    """
+    started = time.perf_counter()
+    if not registry.has_model(gu_name):
+        return None
+    inline = workers == 1
+    workers = 1 if inline else max(1, min(workers or AI_WORKERS, AI_WORKERS, len(bases)))
+    if inline:
+        results = [_plan_worker(gu_name, float(b['lat']), float(b['lng']), policy) for b in bases]
+    else:
+        pool = _get_pool()
+        futures = [pool.submit(_plan_worker, gu_name, float(b['lat']), float(b['lng']), policy) for b in bases]
+        results = [f.result() for f in futures]
+
+    routes, plowed, edges = [], [], []
+    for base, result in zip(bases, results):
+        route = {'base': {k: base[k] for k in ('id', 'lat', 'lng') if k in base}}
+        if 'error' in result:
+            route['error'] = result['error']
+        else:
+            route['path'] = result['path']
+            route['plowed_edges'] = len(result['plowed'])
+            route['total_edges'] = len(result['edges'])
+            plowed.append(result['plowed'])
+            edges.append(result['edges'])
+        routes.append(route)
+
+    def _unique_count(pairs):
+        return len(np.unique(np.concatenate(pairs), axis=0)) if pairs else 0
+
+    union_plowed = _unique_count(plowed)
+    union_total = _unique_count(edges)
+    elapsed = time.perf_counter() - started
+    observe_stage('inference_batch', elapsed)
+    return {
+        'routes': routes,
+        'coverage': {
+            'plowed_edges': union_plowed,
+            'total_edges': union_total,
+            'ratio': round(union_plowed / union_total, 4) if union_total else 0.0,
+            'overlap_edges': sum(len(p) for p in plowed) - union_plowed,
+        },
+        'workers': workers,
+        'elapsed_ms': round(elapsed * 1000, 1),
+    }
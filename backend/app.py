@@ -1,14 +1,30 @@
+import gc
 import os 
+import json
+import logging
+import random
+import threading
+import time
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g, stream_with_context, send_from_directory
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from urllib.parse import quote_plus
 from datetime import datetime
+from functools import wraps
+from services import metrics
+from services.log_config import configure_logging
+from services.profiling import StackSampler
 from services.route_algo import RouteFinder
-from ai_inference import get_ai_route
+from services.route_engine import ALT_METHODS, MODES as ROUTE_MODES
+from services.cost_profiles import CostProfile
+from services.route_batch import evaluate_routes
+from services.risk_tiles import EMPTY_TILE, MAX_ZOOM, MIN_ZOOM, TILE_LAYERS, RiskTileCache
+from services.score_sync import DELTA, RELOAD, ScoreSync
+from ai_inference import POLICIES as AI_POLICIES, get_ai_route, iter_plan, plan_route_in_pool, plan_routes, registry as ai_registry
+from services.job_queue import JobQueue, QueueFull, SqliteJobStore
 
 load_dotenv()
 
@@ -18,12 +34,41 @@ DB_HOST = os.getenv("DB_HOST", "127.0.0.1")
 DB_PORT = os.getenv("DB_PORT", "5432")
 DB_NAME = os.getenv("DB_NAME", "postgres")
 JWT_KEY = os.getenv("JWT_SECRET_KEY", "secret-key")
+# 관리자 API(/api/admin/*)를 쓸 수 있는 사용자 이름 (쉼표 구분). role은 회원가입/프로필 수정으로 누구나 바꿀 수 있어 쓰지 않음
+ADMIN_USERS = frozenset(name.strip() for name in os.getenv("ADMIN_USERS", "").split(",") if name.strip())
+SCORE_WATCH_INTERVAL = float(os.getenv("SCORE_WATCH_INTERVAL", "0"))
+ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "4096"))
+ROUTE_CACHE_TTL = float(os.getenv("ROUTE_CACHE_TTL", "600"))
+ROUTE_CACHE_DB = os.getenv("ROUTE_CACHE_DB") or None
+AI_PRELOAD_MODELS = os.getenv("AI_PRELOAD_MODELS", "0") == "1"
+AI_JOB_WORKERS = int(os.getenv("AI_JOB_WORKERS", "2"))
+AI_JOB_QUEUE = int(os.getenv("AI_JOB_QUEUE", "32"))
+# 제설 작업 상태 저장소. 미설정이면 단일 프로세스는 메모리, prefork(wsgi.py)는 워커들이 함께 쓰는 PREFORK_JOB_DB
+AI_JOB_DB = os.getenv("AI_JOB_DB") or None
+PREFORK_JOB_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plow_jobs.db")
+AI_WARM_BASES = os.getenv("AI_WARM_BASES", "0") == "1"
+MAX_ROUTE_ALTERNATIVES = int(os.getenv("MAX_ROUTE_ALTERNATIVES", "3"))
+ROUTE_BATCH_MAX = int(os.getenv("ROUTE_BATCH_MAX", "500"))
+ROUTE_DIGEST_PAGE = int(os.getenv("ROUTE_DIGEST_PAGE", "200"))
+RISK_TILE_DIR = os.getenv("RISK_TILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tiles"))
+RISK_TILE_ZOOMS = tuple(int(z) for z in os.getenv("RISK_TILE_ZOOMS", f"{MIN_ZOOM},{MAX_ZOOM}").split(","))
+RISK_TILE_MAX_AGE = int(os.getenv("RISK_TILE_MAX_AGE", "60"))
+SCORE_SYNC_DB = os.getenv("SCORE_SYNC_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "score_events.db"))
+SCORE_SYNC_INTERVAL = float(os.getenv("SCORE_SYNC_INTERVAL", "1"))
+# prefork 워커들의 지표를 합칠 폴더 (wsgi.py에서만 사용)
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics"))
+# 요청 프로파일 덤프 폴더. 설정하면 X-Profile: 1 헤더 요청(또는 PROFILE_SAMPLE_RATE 비율)을 샘플링
+PROFILE_DIR = os.getenv("PROFILE_DIR") or None
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+
+configure_logging()
+log = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
 
 SAFE_DB_PASSWORD = quote_plus(DB_PASSWORD) if DB_PASSWORD else "" 
-DATABASE_URI = f"postgresql+psycopg2://{DB_USER}:{SAFE_DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+DATABASE_URI = os.getenv("DATABASE_URI") or f"postgresql+psycopg2://{DB_USER}:{SAFE_DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
@@ -34,6 +79,63 @@ bcrypt = Bcrypt(app)
 jwt = JWTManager(app)
 
 route_finder = None 
+# 위험도 히트맵 타일 캐시 (점수가 바뀌면 백그라운드에서 해당 타일만 다시 그림)
+risk_tiles = None
+# prefork 서버(wsgi.py)에서 워커 간 점수 변경 동기화 (단일 프로세스 실행이면 None)
+score_sync = None
+# 제설 경로 추론 작업 큐 (추론은 워커 프로세스에서 돌아 라우팅 요청을 막지 않음)
+plow_jobs = JobQueue(AI_JOB_WORKERS, AI_JOB_QUEUE, SqliteJobStore(AI_JOB_DB) if AI_JOB_DB else None)
+# wsgi.py(prefork)에서만 켜짐: 워커별 지표 파일을 METRICS_DIR에 모아 /metrics에서 합산
+metrics_dir = None
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+    if PROFILE_DIR and (request.headers.get('X-Profile') == '1'
+                        or (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE)):
+        g.sampler = StackSampler().start()
+
+@app.after_request
+def _record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint or 'unknown',
+                                     method=request.method, status=response.status_code)
+    sampler = g.pop('sampler', None)
+    if sampler is not None:
+        sampler.stop()
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'unknown'}-{os.getpid()}-{id(sampler) & 0xffff:04x}.folded"
+        sampler.dump(os.path.join(PROFILE_DIR, name))
+        response.headers['X-Profile-Dump'] = name
+        log.info("🔬 요청 프로파일 저장: %s (샘플 %d개, %.1fms)", name, sampler.samples, sampler.elapsed * 1000)
+    return response
+
+def _runtime_gauges():
+    """/metrics 응답 시점의 이 프로세스 상태 (경로 캐시, 점수 revision, 작업 큐)"""
+    samples = []
+    if route_finder is not None and route_finder.state is not None:
+        state = route_finder.state
+        samples.append(('risk_scores_revision', '위험 점수 revision', {}, state.revision))
+        if route_finder.cache is not None:
+            cache = route_finder.cache.stats()
+            for key in ('size', 'hits', 'misses', 'evictions', 'invalidations'):
+                samples.append((f"route_cache_{key}", f"경로 캐시 {key}", {}, cache[key]))
+    jobs = plow_jobs.stats()
+    samples.append(('plow_jobs_queued', '대기 중인 제설 추론 작업', {}, jobs['queued']))
+    samples.append(('plow_jobs_running', '실행 중인 제설 추론 작업', {}, jobs['running']))
+    return samples
+
+metrics.add_collector(_runtime_gauges)
+
+def admin_required(fn):
+    """ADMIN_USERS에 등록된 사용자 토큰만 허용"""
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if get_jwt_identity() not in ADMIN_USERS:
+            return jsonify({"error": "관리자 권한이 필요합니다."}), 403
+        return fn(*args, **kwargs)
+    return wrapper
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -321,6 +423,85 @@ def delete_my_route(route_id):
     db.session.commit()
     return jsonify({"message": "경로가 삭제되었습니다."}), 200
 
+@app.route("/api/routes/evaluate", methods=['POST'])
+@jwt_required()
+def evaluate_my_routes():
+    """
+    저장 경로(또는 주어진 출발/도착 쌍)들의 현재 위험도를 한 번에 평가합니다.
+    Request Body: (선택) { "pairs": [{"start": {...}, "end": {...}}, ...], "mode": "safe",
+                          "profile": {...} | "<digest>", "include_path": false }
+    pairs가 없으면 내 저장 경로 전체를 평가합니다.
+    """
+    if route_finder is None:
+        return jsonify({'success': False, 'error': '지도 데이터가 로딩되지 않았습니다.'}), 503
+    user = User.query.filter_by(username=get_jwt_identity()).first()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    data = request.get_json(silent=True) or {}
+    profile, error = _request_profile(data)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    if data.get('pairs') is not None:
+        pairs = data['pairs']
+        if not isinstance(pairs, list) or len(pairs) > ROUTE_BATCH_MAX:
+            return jsonify({'success': False, 'error': f"pairs는 최대 {ROUTE_BATCH_MAX}개의 목록이어야 합니다."}), 400
+        try:
+            coords = [(float(p['start']['lat']), float(p['start']['lng']),
+                       float(p['end']['lat']), float(p['end']['lng'])) for p in pairs]
+        except (TypeError, ValueError, KeyError):
+            return jsonify({'success': False, 'error': '각 쌍에는 start, end 좌표가 필요합니다.'}), 400
+        labels = [{'index': i} for i in range(len(pairs))]
+    else:
+        rows = UserRoute.query.filter_by(user_id=user.user_id).order_by(UserRoute.created_at.desc()).all()
+        coords = [(r.start_lat, r.start_lng, r.end_lat, r.end_lng) for r in rows]
+        labels = [{'id': r.id, 'name': r.name, 'start': r.start_name, 'end': r.end_name} for r in rows]
+
+    try:
+        results, summary = evaluate_routes(route_finder, coords, mode=data.get('mode', 'safe'), profile=profile,
+                                           include_path=bool(data.get('include_path')))
+    except Exception as e:
+        log.exception("경로 일괄 평가 에러: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+    routes = [{**label, 'found': result is not None, **(result or {})} for label, result in zip(labels, results)]
+    return jsonify({'success': True, 'routes': routes, 'summary': summary}), 200
+
+@app.route('/api/admin/route_digest', methods=['POST'])
+@admin_required
+def route_risk_digest():
+    """
+    사용자 저장 경로(출퇴근길) 위험도를 한 페이지씩 평가해 사용자별로 요약합니다.
+    Request Body: (선택) { "mode": "safe", "limit": 200, "after_id": <이전 응답의 next_after_id> }
+    """
+    if route_finder is None:
+        return jsonify({'success': False, 'error': '지도 데이터가 로딩되지 않았습니다.'}), 503
+    data = request.get_json(silent=True) or {}
+    try:
+        limit = int(data.get('limit', ROUTE_DIGEST_PAGE))
+        after_id = int(data.get('after_id', 0))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'limit, after_id는 정수여야 합니다.'}), 400
+    if not 1 <= limit <= ROUTE_BATCH_MAX:
+        return jsonify({'success': False, 'error': f"limit은 1~{ROUTE_BATCH_MAX} 사이여야 합니다."}), 400
+    rows = UserRoute.query.filter(UserRoute.id > after_id).order_by(UserRoute.id).limit(limit).all()
+    try:
+        results, summary = evaluate_routes(route_finder, [(r.start_lat, r.start_lng, r.end_lat, r.end_lng) for r in rows],
+                                           mode=data.get('mode', 'safe'))
+    except Exception as e:
+        log.exception("위험 요약 에러: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    users = {}
+    for row, result in zip(rows, results):
+        stats = result['stats'] if result else None
+        entry = users.setdefault(row.user_id, {'user_id': row.user_id, 'routes': [], 'worst': None})
+        entry['routes'].append({'id': row.id, 'name': row.name, 'found': result is not None, 'stats': stats})
+        if stats and (entry['worst'] is None or stats['max'] > entry['worst']['max']):
+            entry['worst'] = {'id': row.id, 'name': row.name, 'max': stats['max'], 'risk_level': stats['risk_level']}
+    next_after_id = rows[-1].id if len(rows) == limit else None
+    return jsonify({'success': True, 'users': list(users.values()), 'summary': summary,
+                    'next_after_id': next_after_id}), 200
+
 @app.route("/api/history", methods=['GET'])
 @jwt_required()
 def get_history():
@@ -394,54 +575,370 @@ def find_safe_route():
         end = data.get('end')
         mode = data.get('mode', 'fast') 
 
-        print(f"🔍 [DEBUG] 요청된 모드: {mode}")
-        print(f"📍 출발: {start}, 도착: {end}")
+        log.debug("🔍 요청된 모드: %s, 출발: %s, 도착: %s", mode, start, end)
 
         if not start or not end:
             return jsonify({'success': False, 'error': '출발지와 도착지 좌표가 필요합니다.'}), 400
+        profile, error = _request_profile(data)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
 
         result = route_finder.find_path(
             float(start['lat']), float(start['lng']),
             float(end['lat']), float(end['lng']),
-            mode=mode
+            mode=mode, profile=profile
         )
 
-        if result:
-            return jsonify({'success': True, **result})
+        if result is not None:
+            extra = {'profile': profile.digest} if profile else {}
+            return jsonify({'success': True, **extra, **result}), 200
         else:
             return jsonify({'success': False, 'message': '경로를 찾을 수 없습니다.'}), 404
 
     except Exception as e:
-        print(f"경로 분석 에러: {e}")
+        log.exception("경로 분석 에러: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route("/api/find_routes", methods=['POST'])
+def find_routes():
+    """
+    fast/safe 경로와 대안 경로를 한 번에 계산합니다 (스냅/탐색 구조 공유).
+    Request Body: { "start": {...}, "end": {...}, (선택) "modes": ["fast", "safe"], "mode": "safe",
+                    "alternatives": 2, "method": "plateau" | "penalty", "profile": {...} | "<digest>" }
+    profile을 주면 그 비용 프로파일 경로가 routes["profile:<digest>"]에 담기고 대안 경로도 그 기준이 된다.
+    """
+    if route_finder is None:
+        return jsonify({'success': False, 'error': '지도 데이터가 로딩되지 않았습니다.'}), 503
+
+    data = request.get_json() or {}
+    start, end = data.get('start'), data.get('end')
+    if not start or not end:
+        return jsonify({'success': False, 'error': '출발지와 도착지 좌표가 필요합니다.'}), 400
+    modes = data.get('modes') or list(ROUTE_MODES)
+    method = data.get('method', 'plateau')
+    if not isinstance(modes, list) or any(m not in ROUTE_MODES for m in modes):
+        return jsonify({'success': False, 'error': f"modes는 {list(ROUTE_MODES)} 중에서 선택해야 합니다."}), 400
+    if method not in ALT_METHODS:
+        return jsonify({'success': False, 'error': f"method는 {list(ALT_METHODS)} 중 하나여야 합니다."}), 400
+    profile, error = _request_profile(data)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    try:
+        alternatives = min(max(int(data.get('alternatives', 0)), 0), MAX_ROUTE_ALTERNATIVES)
+        result = route_finder.find_routes(
+            float(start['lat']), float(start['lng']), float(end['lat']), float(end['lng']),
+            modes=modes, mode=data.get('mode', 'fast'), alternatives=alternatives, method=method,
+            profile=profile
+        )
+    except (TypeError, ValueError, KeyError):
+        return jsonify({'success': False, 'error': '좌표 또는 alternatives 값이 올바르지 않습니다.'}), 400
+    except Exception as e:
+        log.exception("경로 분석 에러: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    if not any(result['routes'].values()):
+        return jsonify({'success': False, 'message': '경로를 찾을 수 없습니다.'}), 404
+    return jsonify({'success': True, **result}), 200
+
+@app.route("/api/tiles/<layer>/<int:z>/<int:x>/<int:y>.png", methods=['GET'])
+def risk_tile(layer, z, x, y):
+    """미리 그려 둔 위험도 히트맵 타일 (layer: risk / freeze / slope). 도로가 없는 타일은 투명 PNG"""
+    if layer not in TILE_LAYERS:
+        return jsonify({'success': False, 'error': f"layer는 {sorted(TILE_LAYERS)} 중 하나여야 합니다."}), 404
+    if risk_tiles is not None and os.path.exists(risk_tiles.tile_path(layer, z, x, y)):
+        response = send_from_directory(risk_tiles.cache_dir, os.path.join(layer, str(z), str(x), f"{y}.png"),
+                                       mimetype='image/png', max_age=RISK_TILE_MAX_AGE)
+    else:
+        response = Response(EMPTY_TILE, mimetype='image/png')
+        response.headers['Cache-Control'] = f"public, max-age={RISK_TILE_MAX_AGE}"
+    return response
+
 @app.route('/api/professional/recommend', methods=['POST'])
 @jwt_required()
 def recommend_ai_route():
     """
     학습된 AI(Q-Learning) 모델을 사용하여 최적 제설 경로를 추천합니다.
-    Request Body: { "gu_name": "gangnam", "base_coords": { "lat": ..., "lng": ... } }
+    Request Body: { "gu_name": "gangnam", "base_coords": { "lat": ..., "lng": ... }, (선택) "policy": "lookahead" }
     """
     data = request.get_json()
     gu_name = data.get('gu_name')
     base_coords = data.get('base_coords')
+    policy = data.get('policy')
     
     if not gu_name or not base_coords:
         return jsonify({"error": "구(gu_name) 또는 출발지(base_coords) 정보가 누락되었습니다."}), 400
+    if policy is not None and policy not in AI_POLICIES:
+        return jsonify({"error": f"알 수 없는 정책입니다: {policy}"}), 400
 
-    print(f"🤖 AI 경로 추론 요청: {gu_name}구, 출발: {base_coords}")
+    log.info("🤖 AI 경로 추론 요청: %s구, 출발: %s", gu_name, base_coords)
 
     try:
-        path = get_ai_route(gu_name, float(base_coords['lat']), float(base_coords['lng']))
+        path = get_ai_route(gu_name, float(base_coords['lat']), float(base_coords['lng']), policy)
         
         if path:
             return jsonify({"path": path}), 200
         else:
             return jsonify({"error": "경로를 생성할 수 없습니다. (모델 없음 또는 지도 오류)"}), 500
     except Exception as e:
-        print(f"❌ AI 추론 에러: {e}")
+        log.exception("❌ AI 추론 에러: %s", e)
+        return jsonify({"error": f"서버 에러: {str(e)}"}), 500
+
+@app.route('/api/professional/recommend/stream', methods=['POST'])
+@jwt_required()
+def stream_ai_route():
+    """
+    제설 경로를 만들어지는 대로 조금씩 보냅니다.
+    기본은 NDJSON(한 줄에 이벤트 하나), ?format=sse 또는 Accept: text/event-stream이면 SSE.
+    이벤트: {"type": "start"} / {"type": "points", "phase": "work"|"return", "points": [[lat, lng], ...]}
+            / {"type": "done", "total": ..., "plowed_edges": ..., "total_edges": ...} / {"type": "error", "error": ...}
+    Request Body: { "gu_name": "gangnam", "base_coords": { "lat": ..., "lng": ... } }
+    """
+    data = request.get_json() or {}
+    gu_name = data.get('gu_name')
+    base_coords = data.get('base_coords')
+    policy = data.get('policy')
+    if not gu_name or not base_coords:
+        return jsonify({"error": "구(gu_name) 또는 출발지(base_coords) 정보가 누락되었습니다."}), 400
+    if policy is not None and policy not in AI_POLICIES:
+        return jsonify({"error": f"알 수 없는 정책입니다: {policy}"}), 400
+    if not ai_registry.has_model(gu_name):
+        return jsonify({"error": "경로를 생성할 수 없습니다. (모델 없음)"}), 404
+    try:
+        lat, lng = float(base_coords['lat']), float(base_coords['lng'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "출발지(base_coords) 좌표 형식이 올바르지 않습니다."}), 400
+    if not ai_registry.has_graph(lat, lng):
+        return jsonify({"error": "경로를 생성할 수 없습니다. (기지 학습 그래프 없음)"}), 404
+
+    sse = request.args.get('format') == 'sse' or 'text/event-stream' in request.headers.get('Accept', '')
+
+    def encode(event):
+        body = json.dumps(event, ensure_ascii=False)
+        return f"data: {body}\n\n" if sse else body + "\n"
+
+    def generate():
+        yield encode({'type': 'start', 'gu_name': gu_name})
+        total = 0
+        try:
+            for phase, item in iter_plan(gu_name, lat, lng, policy=policy):
+                if phase == 'done':
+                    yield encode({'type': 'done', 'total': total, 'plowed_edges': len(item['plowed']),
+                                  'total_edges': len(item['edges'])})
+                else:
+                    total += len(item)
+                    yield encode({'type': 'points', 'phase': phase, 'points': item})
+        except Exception as e:
+            log.exception("❌ AI 스트리밍 추론 에러: %s", e)
+            yield encode({'type': 'error', 'error': str(e)})
+
+    log.info("🤖 AI 경로 스트리밍 요청: %s구, 출발: %s", gu_name, base_coords)
+    return Response(stream_with_context(generate()),
+                    mimetype='text/event-stream' if sse else 'application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _request_profile(data):
+    """요청 본문의 profile -> (CostProfile 또는 None, 오류 메시지)
+
+    profile: {"weights": {"risk": 4, "slope": 1}, "exponent": 2, "threshold": 40}
+             또는 이전 응답의 digest 문자열 (이미 컴파일된 프로파일 재사용)
+    """
+    spec = data.get('profile')
+    if spec is None:
+        return None, None
+    if isinstance(spec, str):
+        profile = route_finder.find_profile(spec)
+        if profile is None:
+            return None, "등록되지 않은 프로파일입니다. 계수(weights 등)를 보내 주세요."
+        return profile, None
+    try:
+        return CostProfile.from_dict(spec), None
+    except (TypeError, ValueError) as e:
+        return None, str(e)
+
+def _request_bases(data):
+    """요청 본문의 bases 또는 base_ids(SnowBase) -> (기지 목록, 오류 메시지)"""
+    bases = data.get('bases')
+    if bases is None and data.get('base_ids'):
+        rows = SnowBase.query.filter(SnowBase.id.in_(data['base_ids'])).all()
+        bases = [{'id': b.id, 'lat': float(b.lat), 'lng': float(b.lng)} for b in rows]
+
+    if not data.get('gu_name') or not isinstance(bases, list) or not bases:
+        return None, "구(gu_name) 또는 기지 목록(bases) 정보가 누락되었습니다."
+    if any(not isinstance(b, dict) or 'lat' not in b or 'lng' not in b for b in bases):
+        return None, "각 기지에는 lat, lng 좌표가 필요합니다."
+    if data.get('policy') is not None and data['policy'] not in AI_POLICIES:
+        return None, f"알 수 없는 정책입니다: {data['policy']}"
+    return bases, None
+
+@app.route('/api/professional/recommend/batch', methods=['POST'])
+@jwt_required()
+def recommend_ai_routes():
+    """
+    한 구의 여러 제설 기지 경로를 한 번에 추론합니다 (프로세스 풀 병렬 처리).
+    Request Body: { "gu_name": "gangnam", "bases": [ { "id": 1, "lat": ..., "lng": ... }, ... ] }
+                  또는 { "gu_name": "gangnam", "base_ids": [1, 2, ...] }
+    """
+    data = request.get_json() or {}
+    gu_name = data.get('gu_name')
+    bases, error = _request_bases(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    log.info("🤖 AI 경로 일괄 추론 요청: %s구, 기지 %d곳", gu_name, len(bases))
+
+    try:
+        result = plan_routes(gu_name, bases, policy=data.get('policy'))
+        if result is None:
+            return jsonify({"error": "경로를 생성할 수 없습니다. (모델 없음)"}), 500
+        return jsonify(result), 200
+    except Exception as e:
+        log.exception("❌ AI 일괄 추론 에러: %s", e)
         return jsonify({"error": f"서버 에러: {str(e)}"}), 500
 
+def _run_batch_job(gu_name, bases, policy=None):
+    result = plan_routes(gu_name, bases, policy=policy)
+    if result is None:
+        raise RuntimeError("모델이 없습니다.")
+    return result
+
+@app.route('/api/professional/jobs', methods=['POST'])
+@jwt_required()
+def submit_plow_job():
+    """
+    제설 경로 추론을 비동기 작업으로 등록하고 작업 id를 바로 반환합니다.
+    Request Body: { "gu_name": "gangnam", "base_coords": { "lat": ..., "lng": ... } }
+                  또는 일괄 추론과 같은 { "gu_name": ..., "bases": [...] } / { "gu_name": ..., "base_ids": [...] }
+    """
+    data = request.get_json() or {}
+    gu_name = data.get('gu_name')
+    base_coords = data.get('base_coords')
+    policy = data.get('policy')
+
+    try:
+        if base_coords:
+            if not gu_name:
+                return jsonify({"error": "구(gu_name) 또는 출발지(base_coords) 정보가 누락되었습니다."}), 400
+            if policy is not None and policy not in AI_POLICIES:
+                return jsonify({"error": f"알 수 없는 정책입니다: {policy}"}), 400
+            lat, lng = float(base_coords['lat']), float(base_coords['lng'])
+            job_id = plow_jobs.submit('recommend', {'gu_name': gu_name, 'base_coords': {'lat': lat, 'lng': lng},
+                                                    'policy': policy},
+                                      plan_route_in_pool, gu_name, lat, lng, policy, owner=get_jwt_identity())
+        else:
+            bases, error = _request_bases(data)
+            if error:
+                return jsonify({"error": error}), 400
+            job_id = plow_jobs.submit('batch', {'gu_name': gu_name, 'bases': bases, 'policy': policy},
+                                      _run_batch_job, gu_name, bases, policy, owner=get_jwt_identity())
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 429
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "출발지(base_coords) 좌표 형식이 올바르지 않습니다."}), 400
+
+    return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+@app.route('/api/professional/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_plow_job(job_id):
+    """작업 상태/결과 조회 (status: queued, running, done, failed, cancelled). 다른 사용자의 작업은 404"""
+    job = plow_jobs.get(job_id, owner=get_jwt_identity())
+    if job is None:
+        return jsonify({"error": "작업을 찾을 수 없습니다."}), 404
+    return jsonify(job), 200
+
+@app.route('/api/professional/jobs/<job_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_plow_job(job_id):
+    """작업 취소 (대기 중이면 실행하지 않고, 실행 중이면 결과를 버림). 다른 사용자의 작업은 404"""
+    owner = get_jwt_identity()
+    if plow_jobs.get(job_id, owner=owner) is None:
+        return jsonify({"error": "작업을 찾을 수 없습니다."}), 404
+    if not plow_jobs.cancel(job_id, owner=owner):
+        return jsonify({"error": "취소할 수 없는 작업입니다. (이미 종료됨)"}), 409
+    return jsonify(plow_jobs.get(job_id, owner=owner)), 200
+
+@app.route('/api/admin/scores/reload', methods=['POST'])
+@admin_required
+def reload_scores():
+    """final_freezing_score.csv를 다시 읽어 위험 점수를 무중단 교체합니다."""
+    if route_finder is None or route_finder.state is None:
+        return jsonify({'success': False, 'error': '지도 데이터가 로딩되지 않았습니다.'}), 503
+
+    try:
+        report = score_sync.submit(RELOAD) if score_sync else route_finder.reload_scores()
+        return jsonify({'success': True, **report}), 200
+    except Exception as e:
+        log.exception("❌ 위험 점수 갱신 에러: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admin/scores/delta', methods=['POST'])
+@admin_required
+def apply_score_deltas():
+    """
+    일부 도로(road_id)의 위험 점수만 갱신합니다.
+    Request Body: { "deltas": [ { "road_id": 123, "final_risk_score": 85.0, ... }, ... ] }
+    """
+    if route_finder is None or route_finder.state is None:
+        return jsonify({'success': False, 'error': '지도 데이터가 로딩되지 않았습니다.'}), 503
+
+    data = request.get_json()
+    deltas = data.get('deltas') if data else None
+    if not isinstance(deltas, list) or not deltas:
+        return jsonify({'success': False, 'error': '변경할 점수 목록(deltas)이 필요합니다.'}), 400
+
+    try:
+        report = score_sync.submit(DELTA, deltas) if score_sync else route_finder.apply_score_deltas(deltas)
+        return jsonify({'success': True, **report}), 200
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': f"잘못된 점수 데이터: {e}"}), 400
+    except Exception as e:
+        log.exception("❌ 위험 점수 부분 갱신 에러: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admin/route_cache', methods=['GET'])
+@admin_required
+def route_cache_stats():
+    """경로 캐시 적중률/크기를 조회합니다."""
+    if route_finder is None or route_finder.cache is None:
+        return jsonify({'success': False, 'error': '경로 캐시가 비활성화되어 있습니다.'}), 503
+    return jsonify({'success': True, **route_finder.cache.stats()}), 200
+
+@app.route('/api/admin/risk_tiles', methods=['GET'])
+@admin_required
+def risk_tile_stats():
+    """위험도 타일 캐시 상태(점수 지문, 갱신 대기 여부, 마지막 갱신)를 조회합니다."""
+    if risk_tiles is None:
+        return jsonify({'success': False, 'error': '위험도 타일이 비활성화되어 있습니다.'}), 503
+    return jsonify({'success': True, **risk_tiles.stats()}), 200
+
+@app.route("/metrics", methods=['GET'])
+def prometheus_metrics():
+    """단계별/요청별 지연 시간 히스토그램과 상태 게이지 (Prometheus text format)"""
+    return Response(metrics.render(metrics_dir), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route("/api/ready", methods=['GET'])
+def ready():
+    """로드 상태 확인 (로드 밸런서/오케스트레이터용). 지도와 점수가 준비되면 200, 아니면 503"""
+    state = route_finder.state if route_finder is not None else None
+    body = {
+        'ready': state is not None,
+        'pid': os.getpid(),
+        'graph': None,
+        'scores': None,
+        'score_sync': score_sync.stats() if score_sync else None,
+        'risk_tiles': risk_tiles.stats() if risk_tiles else None,
+    }
+    if state is not None:
+        body['graph'] = {'nodes': route_finder.snapshot.n_nodes, 'edges': route_finder.snapshot.n_edges,
+                         'path': route_finder.snapshot.path}
+        body['scores'] = {'version': state.version, 'revision': state.revision, 'source': state.source,
+                          'landmark_modes': sorted(state.landmark_modes)}
+    elif route_finder is None:
+        body['error'] = '지도 데이터를 로딩 중입니다.'
+    else:
+        body['error'] = '지도 데이터 로딩에 실패했습니다.'
+    return jsonify(body), 200 if body['ready'] else 503
+
 @app.route("/api/protected", methods=['GET'])
 @jwt_required()
 def protected():
@@ -452,17 +949,80 @@ def protected():
     else:
          return jsonify({"error": "사용자를 찾을 수 없습니다."}), 404
 
+def _warm_base_graphs():
+    """모든 제설 기지의 지역 그래프를 미리 만들어 둠 (첫 추천 요청 지연 제거)"""
+    with app.app_context():
+        bases = [(float(b.lat), float(b.lng)) for b in SnowBase.query.all() if b.lat is not None and b.lng is not None]
+    log.info("🗺️ 기지 지역 그래프 %d개 생성 완료", ai_registry.warm(bases))
+
+def init_services(prefork=False):
+    """지도/점수, 히트맵 타일, 제설 추론 그래프를 한 번 올림
+
+    prefork=True(wsgi.py)면 부모 프로세스에서 불린다. 여기서 만든 배열(스냅샷 mmap, CSR, 비용,
+    공간 인덱스, Q-table)은 fork된 워커들이 복사 없이 함께 쓰므로 스레드는 띄우지 않고,
+    워커마다 필요한 스레드는 on_worker_start()에서 시작한다.
+    """
+    global route_finder, risk_tiles, score_sync, metrics_dir
+    if prefork:
+        metrics_dir = METRICS_DIR
+        metrics.clear_dir(metrics_dir)
+        # 작업 조회/취소가 제출받은 워커가 아닌 다른 워커로 가도 찾을 수 있도록
+        if AI_JOB_DB is None:
+            plow_jobs.store = SqliteJobStore(PREFORK_JOB_DB)
+    route_finder = RouteFinder(csv_path='final_freezing_score.csv', cache_size=ROUTE_CACHE_SIZE,
+                               cache_ttl=ROUTE_CACHE_TTL, cache_db=ROUTE_CACHE_DB)
+
+    if route_finder.state is not None:
+        risk_tiles = RiskTileCache(route_finder.snapshot, RISK_TILE_DIR, RISK_TILE_ZOOMS)
+    if prefork and route_finder.state is not None:
+        score_sync = ScoreSync(route_finder, SCORE_SYNC_DB, SCORE_SYNC_INTERVAL, SCORE_WATCH_INTERVAL)
+        score_sync.reset()
+    elif route_finder.state is not None:
+        if SCORE_WATCH_INTERVAL > 0:
+            route_finder.start_score_watcher(SCORE_WATCH_INTERVAL)
+        # 히트맵 타일: 캐시가 현재 점수와 다르면 백그라운드에서 전체 생성, 이후 점수 변경분만 갱신
+        risk_tiles.attach(route_finder)
+
+    # 제설 경로 추론은 모델 폴더에 저장된 기지별 학습 그래프(q_table_*.graphs)를 쓴다
+    if AI_WARM_BASES:
+        if prefork:
+            _warm_base_graphs()
+        else:
+            threading.Thread(target=_warm_base_graphs, name="ai-warm-bases", daemon=True).start()
+    if AI_PRELOAD_MODELS:
+        log.info("🤖 Q-table 사전 로드: %s", ai_registry.preload())
+
+    if prefork:
+        # 지도 로드 등 부모에서 잰 값은 부모 파일로 한 번 남기고, 워커는 0부터 센다
+        metrics.export(metrics_dir)
+        # 부모가 들고 있는 객체를 GC가 건드려 워커 메모리 페이지가 복사되지 않도록 고정
+        gc.collect()
+        gc.freeze()
+
+def on_worker_start():
+    """prefork 워커에서 fork 직후 호출 (gunicorn.conf.py post_fork)"""
+    # 부모가 열어 둔 DB 연결을 워커끼리 나눠 쓰지 않도록 버림 (닫지 않고 새로 연결)
+    with app.app_context():
+        db.engine.dispose(close=False)
+    if metrics_dir is not None:
+        metrics.start_exporter(metrics_dir)
+    if score_sync is not None:
+        score_sync.after_fork()
+        # 타일은 리더 워커 하나만 그리고 나머지는 파일만 내려준다
+        if score_sync.leader and risk_tiles is not None:
+            risk_tiles.attach(route_finder)
+
 if __name__ == '__main__':
     if not DB_PASSWORD:
-        print(" FATAL ERROR: DB_PASSWORD 환경 변수가 로드되지 않았습니다.")
+        log.critical(" FATAL ERROR: DB_PASSWORD 환경 변수가 로드되지 않았습니다.")
         exit(1)
         
     with app.app_context():
         db.create_all()
-    
-    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
-         route_finder = RouteFinder(csv_path='final_freezing_score.csv')
-    else:
-         route_finder = RouteFinder(csv_path='final_freezing_score.csv')
 
-    app.run(port=5000, debug=True)
\ No newline at end of file
+    debug = os.getenv("FLASK_DEBUG", "1") == "1"
+    # 디버그 리로더의 감시 프로세스는 코드 변경만 지켜보므로 지도를 올리지 않는다
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        init_services()
+
+    app.run(port=5000, debug=debug)
\ No newline at end of file
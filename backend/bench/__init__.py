@@ -0,0 +1,12 @@
+"""
+RouteFinder / 제설 경로 추론 벤치마크 (오프라인 재현용)
+
+  python -m bench run --city grid:60 --pairs 500 --concurrency 1 2 4 --out results/bench.json
+  python -m bench run --city graph_seoul.snap --csv final_freezing_score.csv --workload history.json
+  python -m bench export-history --out history.json        # SearchHistory -> 재생용 워크로드
+  python -m bench compare results/before.json results/after.json
+
+도시는 합성 격자(grid:<한 변 노드 수>) 또는 저장된 그래프 스냅샷을 쓰고, 위험 점수 CSV가 없으면 시드로
+생성한다. 합성 도시와 점수는 .bench/ 에 캐시해 같은 시드면 같은 입력으로 다시 잰다.
+결과는 JSON(환경, 입력, 기동 시간, 메모리, 모드별 p50/p95/p99, 동시성별 처리량)으로 남긴다.
+"""
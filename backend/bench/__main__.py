@@ -0,0 +1,148 @@
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+from bench.city import prepare_city
+from bench.runner import bench_ai, bench_routing, environment
+from bench.workloads import export_history, load_history, random_pairs
+from services.graph_snapshot import GraphSnapshot
+from services.route_engine import MODES
+
+# compare에서 비교할 지표: (경로, 클수록 좋은지)
+_COMPARE_KEYS = (('latency_ms.p50', False), ('latency_ms.p95', False), ('latency_ms.p99', False))
+
+
+def _run(args):
+    started = time.perf_counter()
+    snap_path, csv_path, city = prepare_city(args.city, args.csv, args.seed)
+    snapshot = GraphSnapshot.load(snap_path)
+    if args.workload == 'random':
+        pairs = random_pairs(snapshot, args.pairs, args.seed)
+        workload = {'kind': 'random', 'pairs': len(pairs), 'seed': args.seed}
+    else:
+        pairs = load_history(args.workload)
+        if args.pairs and len(pairs) > args.pairs:
+            pairs = pairs[:args.pairs]
+        workload = {'kind': 'history', 'path': os.path.abspath(args.workload), 'pairs': len(pairs)}
+    if not pairs:
+        raise SystemExit("재생할 출발/도착 쌍이 없습니다.")
+
+    result = {
+        'environment': environment(),
+        'args': {k: v for k, v in vars(args).items() if k != 'func'},
+        'city': city,
+        'workload': workload,
+        'routing': bench_routing(snap_path, csv_path, pairs, args.modes, args.concurrency, cache=args.cache),
+    }
+    if args.ai_bases:
+        rng = random.Random(args.seed)
+        bases = [(float(snapshot.node_y[i]), float(snapshot.node_x[i]))
+                 for i in rng.sample(range(snapshot.n_nodes), min(args.ai_bases, snapshot.n_nodes))]
+        result['ai'] = bench_ai(snap_path, bases, args.models, args.gu, args.policy)
+    result['elapsed_s'] = round(time.perf_counter() - started, 1)
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+    _print_summary(result)
+    if not args.out:
+        print(text)
+
+
+def _print_summary(result):
+    routing = result['routing']
+    print(f"✅ {result['city']['kind']} 도시 (노드 {result['city']['nodes']}개), 쌍 {result['workload']['pairs']}개, "
+          f"RouteFinder 기동 {routing['startup_s']:.2f}s, RSS {routing['rss_mb']['loaded']:.0f}MB", file=sys.stderr)
+    for mode, report in routing['modes'].items():
+        lat = report['latency_ms']
+        print(f"   [{mode}] p50 {lat['p50']:.2f}ms  p95 {lat['p95']:.2f}ms  p99 {lat['p99']:.2f}ms  "
+              f"확정 노드 {report['settled_mean']}", file=sys.stderr)
+        for run in report['throughput']:
+            print(f"      동시성 {run['concurrency']:>2}: {run['rps']:>8.1f} req/s  "
+                  f"p95 {run['latency_ms']['p95']:.2f}ms", file=sys.stderr)
+    if 'ai' in result:
+        ai = result['ai']
+        print(f"   [ai] Q-table 로드 {ai['qtable_load_s']:.2f}s  첫 요청 p50 {ai['first_request_ms']['p50']:.0f}ms  "
+              f"이후 p50 {ai['cached_graph_ms']['p50']:.0f}ms", file=sys.stderr)
+
+
+def _export_history(args):
+    print(f"✅ {args.out}: {export_history(args.out, args.limit)}개 요청")
+
+
+def _lookup(report, dotted):
+    for key in dotted.split('.'):
+        report = report.get(key) if isinstance(report, dict) else None
+    return report
+
+
+def _compare(args):
+    with open(args.before, encoding='utf-8') as f:
+        before = json.load(f)
+    with open(args.after, encoding='utf-8') as f:
+        after = json.load(f)
+    print(f"{before['environment'].get('commit')} -> {after['environment'].get('commit')}")
+    print(f"   기동 {before['routing']['startup_s']:.2f}s -> {after['routing']['startup_s']:.2f}s")
+    regressed = False
+    for mode in sorted(set(before['routing']['modes']) & set(after['routing']['modes'])):
+        b, a = before['routing']['modes'][mode], after['routing']['modes'][mode]
+        rows = [(key, _lookup(b, key), _lookup(a, key), higher_better) for key, higher_better in _COMPARE_KEYS]
+        runs_b = {r['concurrency']: r for r in b['throughput']}
+        for run in a['throughput']:
+            if run['concurrency'] in runs_b:
+                rows.append((f"rps@{run['concurrency']}", runs_b[run['concurrency']]['rps'], run['rps'], True))
+        for key, old, new, higher_better in rows:
+            if old is None or new is None:
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            worse = change < -args.threshold if higher_better else change > args.threshold
+            regressed = regressed or worse
+            print(f"   [{mode}] {key:<16} {old:>10.2f} -> {new:>10.2f}  {change:+6.1f}%{'  ⚠️' if worse else ''}")
+    raise SystemExit(1 if regressed and args.fail else 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description='라우팅/제설 추론 벤치마크')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_run = sub.add_parser('run', help='벤치마크 실행')
+    p_run.add_argument('--city', default='grid:60', help="'grid:<한 변 노드 수>' 또는 스냅샷 경로")
+    p_run.add_argument('--csv', help='점수 CSV (미지정 시 시드로 생성)')
+    p_run.add_argument('--workload', default='random', help="'random' 또는 export-history 결과(JSON/CSV)")
+    p_run.add_argument('--pairs', type=int, default=500)
+    p_run.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    p_run.add_argument('--concurrency', nargs='+', type=int, default=[1, 2, 4])
+    p_run.add_argument('--cache', action='store_true', help='경로 캐시 사용 (기본은 매번 탐색)')
+    p_run.add_argument('--ai-bases', type=int, default=3, help='제설 추론 기지 수 (0이면 건너뜀)')
+    p_run.add_argument('--models', help='Q-table 폴더 (미지정 시 합성 Q-table)')
+    p_run.add_argument('--gu', default='bench', help='--models 사용 시 구 이름')
+    p_run.add_argument('--policy')
+    p_run.add_argument('--seed', type=int, default=0)
+    p_run.add_argument('--out', help='결과 JSON 경로 (미지정 시 표준 출력)')
+    p_run.set_defaults(func=_run)
+
+    p_export = sub.add_parser('export-history', help='SearchHistory 좌표를 워크로드 JSON으로 저장')
+    p_export.add_argument('--out', default='history.json')
+    p_export.add_argument('--limit', type=int)
+    p_export.set_defaults(func=_export_history)
+
+    p_compare = sub.add_parser('compare', help='두 결과 JSON 비교')
+    p_compare.add_argument('before')
+    p_compare.add_argument('after')
+    p_compare.add_argument('--threshold', type=float, default=10.0, help='회귀로 볼 변화율(%%)')
+    p_compare.add_argument('--fail', action='store_true', help='회귀가 있으면 종료 코드 1')
+    p_compare.set_defaults(func=_compare)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
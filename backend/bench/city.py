@@ -0,0 +1,136 @@
+"""
+벤치마크 입력 도시: 합성 격자 도시 또는 저장된 스냅샷 + 위험 점수 CSV
+"""
+import math
+import os
+import random
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from shapely.geometry import LineString
+
+from services.graph_snapshot import GraphSnapshot
+from services.risk_scores import CSV_COLUMNS, load_score_table, map_scores, score_fingerprint
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.bench')
+# 서울 시청 근처에서 시작하는 격자 (간격 약 100m)
+ORIGIN_LAT, ORIGIN_LNG = 37.5665, 126.9780
+SPACING_DEG = 0.0009
+# 위험 점수: 대부분 낮고 일부 구간만 높은 분포 (safe 모드 우회가 실제처럼 생기도록)
+HOT_SHARE = 0.12
+
+
+def grid_city(size, seed=0):
+    """size x size 격자 도로망 (osmnx MultiDiGraph 형식)
+
+    좌표를 조금씩 흔들고, 일부 블록은 끊고, 대부분 양방향·일부 일방통행,
+    일부 엣지는 휘어진 geometry와 여러 osmid를 갖는다.
+    """
+    rng = random.Random(seed)
+    G = nx.MultiDiGraph(crs='epsg:4326')
+
+    def node_id(i, j):
+        return 1_000_000 + i * size + j
+
+    jitter = SPACING_DEG * 0.2
+    for i in range(size):
+        for j in range(size):
+            G.add_node(node_id(i, j), x=ORIGIN_LNG + j * SPACING_DEG + rng.uniform(-jitter, jitter),
+                       y=ORIGIN_LAT + i * SPACING_DEG + rng.uniform(-jitter, jitter))
+
+    kx = math.radians(1) * 6_371_009 * math.cos(math.radians(ORIGIN_LAT))
+    ky = math.radians(1) * 6_371_009
+    way = 100_000_000
+    for i in range(size):
+        for j in range(size):
+            for di, dj in ((0, 1), (1, 0)):
+                if i + di >= size or j + dj >= size or rng.random() < 0.06:
+                    continue
+                u, v = node_id(i, j), node_id(i + di, j + dj)
+                way += 1
+                ux, uy, vx, vy = G.nodes[u]['x'], G.nodes[u]['y'], G.nodes[v]['x'], G.nodes[v]['y']
+                length = math.hypot((ux - vx) * kx, (uy - vy) * ky)
+                osmid = [way, way + 50_000_000] if rng.random() < 0.1 else way
+                curved = rng.random() < 0.3
+                # 간선도로(10칸마다)는 양방향, 나머지는 일부 일방통행
+                arterial = i % 10 == 0 or j % 10 == 0
+                directions = ((u, v), (v, u)) if arterial or rng.random() < 0.85 else ((u, v),)
+                for s, t in directions:
+                    data = {'osmid': osmid, 'length': length * (1.15 if curved else 1.0),
+                            'name': f"벤치{'대로' if arterial else '길'} {i if di == 0 else j}"}
+                    if curved:
+                        sx, sy, tx, ty = G.nodes[s]['x'], G.nodes[s]['y'], G.nodes[t]['x'], G.nodes[t]['y']
+                        bend = SPACING_DEG * 0.15
+                        mid = ((sx + tx) / 2 + bend * (ty - sy) / SPACING_DEG, (sy + ty) / 2 + bend * (sx - tx) / SPACING_DEG)
+                        data['geometry'] = LineString([(sx, sy), mid, (tx, ty)])
+                    G.add_edge(s, t, **data)
+    return G
+
+
+def write_risk_csv(snapshot, path, seed=0):
+    """스냅샷의 road_id(osmid)마다 위험 점수 행 생성 (HOT_SHARE 비율만 60점 이상)"""
+    rng = np.random.default_rng(seed)
+    road_ids = np.unique(snapshot.osmid_values)
+    n = len(road_ids)
+    hot = rng.random(n) < HOT_SHARE
+    risk = np.where(hot, rng.uniform(60, 100, n), rng.beta(2, 5, n) * 60)
+    columns = {
+        'road_id': road_ids,
+        'final_risk_score': risk,
+        'norm_slope_score': np.clip(risk * 0.6 + rng.normal(0, 10, n), 0, 100),
+        'norm_freezing_weak_score': np.clip(risk * 0.8 + rng.normal(0, 8, n), 0, 100),
+        'norm_accident_score': rng.uniform(0, 100, n),
+        'norm_population_risk': rng.uniform(0, 100, n),
+        'original_raw_score': risk / 10,
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    pd.DataFrame({col: columns[col] for col in ['road_id'] + CSV_COLUMNS}).to_csv(path, index=False)
+    return path
+
+
+def prepare_city(spec, csv_path=None, seed=0, cache_dir=CACHE_DIR):
+    """spec('grid:<size>' 또는 스냅샷 경로) -> (스냅샷 경로, 점수 CSV 경로, 설명 dict)
+
+    합성 도시는 cache_dir에 한 번 만들어 두고 재사용한다. 점수 CSV를 주지 않으면 시드로 생성하고,
+    합성 도시는 ALT 인덱스까지 만들어 둬 실제 서버와 같은 탐색 경로를 잰다.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    generated = csv_path is None
+    if spec.startswith('grid:'):
+        size = int(spec.split(':', 1)[1])
+        snap_path = os.path.join(cache_dir, f"grid{size}-s{seed}.snap")
+        info = {'kind': 'grid', 'size': size, 'seed': seed}
+    else:
+        snap_path = os.path.abspath(spec)
+        info = {'kind': 'snapshot', 'path': snap_path}
+    if generated:
+        csv_path = os.path.join(cache_dir, f"{os.path.splitext(os.path.basename(snap_path))[0]}-risk-s{seed}.csv")
+    csv_path = os.path.abspath(csv_path)
+
+    if info['kind'] == 'grid' and not os.path.exists(snap_path):
+        # 운영 스냅샷처럼 점수를 미리 매핑해 저장 (RouteFinder가 기동 시 다시 매핑하지 않음)
+        snapshot = GraphSnapshot.from_graph(grid_city(size, seed), region=f"bench grid {size}x{size}")
+        if generated:
+            write_risk_csv(snapshot, csv_path, seed)
+        scores = map_scores(snapshot.osmid_offsets, snapshot.osmid_values, load_score_table(csv_path))
+        snapshot.set_scores(scores, score_fingerprint(csv_path))
+        snapshot.save(snap_path)
+    snapshot = GraphSnapshot.load(snap_path)
+    if generated and not os.path.exists(csv_path):
+        write_risk_csv(snapshot, csv_path, seed)
+
+    if info['kind'] == 'grid':
+        _ensure_landmarks(snap_path, csv_path)
+    info.update({'nodes': snapshot.n_nodes, 'edges': snapshot.n_edges, 'csv': csv_path,
+                 'csv_generated': generated, 'score_source': score_fingerprint(csv_path)})
+    return snap_path, csv_path, info
+
+
+def _ensure_landmarks(snap_path, csv_path):
+    """합성 도시의 ALT 인덱스가 현재 점수와 맞지 않으면 다시 만듦"""
+    from services.route_algo import RouteFinder
+
+    finder = RouteFinder(csv_path=csv_path, snapshot_path=snap_path, cache_size=0)
+    if set(finder.state.costs) - finder.state.landmark_modes:
+        finder.build_landmarks(save=True)
@@ -0,0 +1,239 @@
+"""
+벤치마크 실행: 기동 시간, 메모리, 모드별 지연 분포, 동시성별 처리량, 제설 추론
+
+동시성은 운영 서버(wsgi.py)와 같이 RouteFinder를 한 번 올린 뒤 fork한 프로세스들로 잰다.
+fork가 없는 플랫폼에서는 스레드로 잰다 (GIL 때문에 처리량이 늘지 않는 것이 정상).
+"""
+import multiprocessing
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from services.route_engine import MODES
+
+PERCENTILES = (50, 95, 99)
+
+_finder = None
+
+
+def rss_mb():
+    """현재 프로세스 RSS (MB)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def private_mb():
+    """이 프로세스만 가진 메모리 (MB, fork 후 공유되지 않는 부분). 알 수 없으면 None"""
+    try:
+        total = 0
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                    total += int(line.split()[1])
+        return total / 2**10
+    except (OSError, ValueError):
+        return None
+
+
+def latency_summary(seconds):
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    if not ms.size:
+        return {'count': 0}
+    summary = {'count': int(ms.size), 'mean': round(float(ms.mean()), 3), 'max': round(float(ms.max()), 3)}
+    for p, value in zip(PERCENTILES, np.percentile(ms, PERCENTILES).tolist()):
+        summary[f"p{p}"] = round(value, 3)
+    return summary
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+# ---------------------------------------------------------------------------
+# 라우팅
+# ---------------------------------------------------------------------------
+def _route_batch(pairs, mode):
+    """pairs를 차례로 find_path_json. (요청별 소요 시간 [초], 경로 없음 수, 이 프로세스 고유 메모리)"""
+    finder = _finder
+    times, missing = [], 0
+    for a_lat, a_lng, b_lat, b_lng in pairs:
+        started = time.perf_counter()
+        payload = finder.find_path_json(a_lat, a_lng, b_lat, b_lng, mode=mode)
+        times.append(time.perf_counter() - started)
+        missing += payload == 'null'
+    return times, missing, private_mb()
+
+
+def _search_stats(finder, pairs, mode, limit=200):
+    """확정 노드 수/탐색 알고리즘 (응답 본문과 별도로 with_stats로 일부만)"""
+    settled, algorithms = [], set()
+    for a_lat, a_lng, b_lat, b_lng in pairs[:limit]:
+        result = finder.find_path(a_lat, a_lng, b_lat, b_lng, mode=mode, with_stats=True)
+        if result is not None:
+            settled.append(result['search']['settled'])
+            algorithms.add(result['search']['algorithm'])
+    return {'settled_mean': round(float(np.mean(settled)), 1) if settled else None, 'algorithms': sorted(algorithms)}
+
+
+def _throughput(pairs, mode, concurrency):
+    """concurrency개 워커로 pairs를 나눠 실행 -> 처리량과 지연 분포"""
+    chunks = [pairs[i::concurrency] for i in range(concurrency)]
+    use_fork = 'fork' in multiprocessing.get_all_start_methods()
+    if use_fork:
+        pool = multiprocessing.get_context('fork').Pool(concurrency)
+        pool.map(abs, range(concurrency))  # 워커 기동은 측정에서 제외
+        started = time.perf_counter()
+        outputs = pool.starmap(_route_batch, [(chunk, mode) for chunk in chunks])
+        wall = time.perf_counter() - started
+        pool.close()
+        pool.join()
+    else:
+        with ThreadPoolExecutor(concurrency) as executor:
+            started = time.perf_counter()
+            outputs = list(executor.map(_route_batch, chunks, [mode] * concurrency))
+            wall = time.perf_counter() - started
+    times = [t for out in outputs for t in out[0]]
+    private = [out[2] for out in outputs if out[2] is not None]
+    return {
+        'concurrency': concurrency,
+        'executor': 'process' if use_fork else 'thread',
+        'requests': len(times),
+        'wall_s': round(wall, 3),
+        'rps': round(len(times) / wall, 1) if wall else None,
+        'latency_ms': latency_summary(times),
+        'worker_private_mb': round(max(private), 1) if use_fork and private else None,
+    }
+
+
+def bench_routing(snap_path, csv_path, pairs, modes=MODES, concurrency=(1,), warmup=20, cache=False):
+    """RouteFinder 기동/메모리와 모드별 지연·처리량"""
+    global _finder
+    from services.route_algo import RouteFinder
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    _finder = RouteFinder(csv_path=csv_path, snapshot_path=snap_path, cache_size=4096 if cache else 0)
+    startup_s = time.perf_counter() - started
+    if _finder.state is None:
+        raise RuntimeError("RouteFinder 로딩 실패")
+    report = {
+        'startup_s': round(startup_s, 3),
+        'rss_mb': {'before': round(rss_before, 1), 'loaded': round(rss_mb(), 1)},
+        'cache': cache,
+        'landmark_modes': sorted(_finder.state.landmark_modes),
+        'modes': {},
+    }
+    for mode in modes:
+        _route_batch(pairs[:warmup], mode)
+        times, missing, _ = _route_batch(pairs, mode)
+        report['modes'][mode] = {
+            'latency_ms': latency_summary(times),
+            'no_path': missing,
+            **_search_stats(_finder, pairs, mode),
+            'throughput': [_throughput(pairs, mode, c) for c in concurrency],
+        }
+    report['rss_mb']['after'] = round(rss_mb(), 1)
+    return report
+
+
+# ---------------------------------------------------------------------------
+# 제설 경로 추론
+# ---------------------------------------------------------------------------
+def _synthetic_qtable(snapshot, spatial, bases, path):
+    """각 기지 지역 그래프의 첫 상태에 대한 무작위 Q 값 (학습 모델 없이 추론 경로 전체를 돌리기 위함)
+
+    첫 스텝 이후 상태는 표에 없으므로 정책의 기본 선택으로 진행한다. 절대 시간은 실제 모델과 다르고
+    변경 전후 비교용이다. 지역 그래프는 학습 그래프처럼 모델 옆 .graphs로 저장한다.
+    """
+    from services.local_graph import extract_subgraph, graphs_path, nearest_node, save_local_graphs
+    from services.plow_engine import inference_tables
+    from ai_inference import GRAPH_DIST
+
+    rng = np.random.default_rng(0)
+    Q = {}
+    graphs = []
+    for lat, lng in bases:
+        G = extract_subgraph(snapshot, lat, lng, dist=GRAPH_DIST, spatial=spatial)
+        graphs.append((lat, lng, G, nearest_node(G, lat, lng)))
+        graph_dict, edge_attr = inference_tables(G)
+        full = (1 << len(edge_attr)) - 1
+        for u, nbs in graph_dict.items():
+            for v in nbs:
+                Q[((u, full), v)] = float(rng.random())
+    with open(path, 'wb') as f:
+        pickle.dump({'Q': Q}, f)
+    save_local_graphs(graphs_path(path), graphs, {'dist': GRAPH_DIST, 'source': 'snapshot'})
+
+
+def bench_ai(snap_path, bases, model_dir=None, gu_name='bench', policy=None, repeats=3):
+    """get_ai_route: Q-table 로드/지역 그래프 생성(첫 요청)과 이후 요청 지연
+
+    model_dir을 주면 그 폴더의 q_table_{gu}.graphs에 bases의 학습 그래프가 있어야 한다.
+    """
+    import ai_inference
+
+    synthetic = model_dir is None
+    if synthetic:
+        from bench.city import CACHE_DIR
+        from services.graph_snapshot import GraphSnapshot
+        from services.spatial_index import SpatialIndex
+
+        snapshot = GraphSnapshot.load(snap_path)
+        spatial = SpatialIndex(snapshot)
+        model_dir = os.path.join(CACHE_DIR, 'models')
+        os.makedirs(model_dir, exist_ok=True)
+        _synthetic_qtable(snapshot, spatial, bases, os.path.join(model_dir, f"q_table_{gu_name}.pkl"))
+
+    # 새 레지스트리로 바꿔 이전 측정의 캐시 없이 시작 (get_ai_route는 모듈 전역 registry를 쓴다)
+    registry = ai_inference.registry = ai_inference.ModelRegistry(model_dir=model_dir)
+
+    started = time.perf_counter()
+    registry.q_table(gu_name)
+    qtable_s = time.perf_counter() - started
+
+    cold, warm, points = [], [], []
+    for lat, lng in bases:
+        started = time.perf_counter()
+        path = ai_inference.get_ai_route(gu_name, lat, lng, policy)
+        cold.append(time.perf_counter() - started)
+        if path is None:
+            raise RuntimeError(f"제설 경로 추론 실패 ({lat}, {lng})")
+        points.append(len(path))
+        for _ in range(repeats):
+            started = time.perf_counter()
+            ai_inference.get_ai_route(gu_name, lat, lng, policy)
+            warm.append(time.perf_counter() - started)
+    return {
+        'gu_name': gu_name,
+        'synthetic_model': synthetic,
+        'policy': policy or ai_inference.AI_POLICY,
+        'bases': len(bases),
+        'qtable_load_s': round(qtable_s, 3),
+        'first_request_ms': latency_summary(cold),
+        'cached_graph_ms': latency_summary(warm),
+        'path_points_mean': round(float(np.mean(points)), 1),
+        'rss_mb': round(rss_mb(), 1),
+    }
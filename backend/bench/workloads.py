@@ -0,0 +1,65 @@
+"""
+출발/도착 워크로드: 시드 난수 또는 SearchHistory 내보내기 재생
+
+워크로드는 [(출발 lat, 출발 lng, 도착 lat, 도착 lng), ...] 이다.
+"""
+import csv
+import json
+import os
+
+import numpy as np
+
+HISTORY_FIELDS = ('start_lat', 'start_lng', 'end_lat', 'end_lng')
+# 난수 출발/도착 사이 최소 직선거리 (너무 가까운 쌍은 실제 요청과 달라 제외)
+MIN_TRIP_M = 500.0
+
+
+def random_pairs(snapshot, n, seed=0, min_trip_m=MIN_TRIP_M):
+    """도로 노드 근처(약 ±30m) 좌표를 골라 n개 쌍 생성 (같은 시드면 같은 워크로드)"""
+    rng = np.random.default_rng(seed)
+    lat0 = float(np.mean(snapshot.node_y))
+    ky = np.radians(1.0) * 6_371_009
+    kx = ky * np.cos(np.radians(lat0))
+    jitter = 30.0 / ky
+    pairs = []
+    while len(pairs) < n:
+        idx = rng.integers(0, snapshot.n_nodes, size=(2 * (n - len(pairs)) + 16, 2))
+        lat = snapshot.node_y[idx] + rng.uniform(-jitter, jitter, idx.shape)
+        lng = snapshot.node_x[idx] + rng.uniform(-jitter, jitter, idx.shape)
+        trip = np.hypot((lat[:, 0] - lat[:, 1]) * ky, (lng[:, 0] - lng[:, 1]) * kx)
+        for row in np.flatnonzero(trip >= min_trip_m)[:n - len(pairs)].tolist():
+            pairs.append((float(lat[row, 0]), float(lng[row, 0]), float(lat[row, 1]), float(lng[row, 1])))
+    return pairs
+
+
+def load_history(path):
+    """export-history 결과(JSON 목록) 또는 같은 컬럼의 CSV -> 워크로드 (좌표가 빠진 행은 건너뜀)"""
+    if os.path.splitext(path)[1].lower() == '.csv':
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, encoding='utf-8') as f:
+            rows = json.load(f)
+    pairs = []
+    for row in rows:
+        try:
+            pairs.append(tuple(float(row[k]) for k in HISTORY_FIELDS))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return pairs
+
+
+def export_history(path, limit=None):
+    """DB의 SearchHistory 좌표를 시간순 JSON 목록으로 저장 (DB 접속 환경 변수 필요). 저장한 행 수 반환"""
+    from app import SearchHistory, app
+
+    with app.app_context():
+        query = SearchHistory.query.filter(*(getattr(SearchHistory, k).isnot(None) for k in HISTORY_FIELDS))
+        query = query.order_by(SearchHistory.created_at)
+        if limit:
+            query = query.limit(limit)
+        rows = [{k: getattr(h, k) for k in HISTORY_FIELDS} for h in query.all()]
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(rows, f)
+    return len(rows)
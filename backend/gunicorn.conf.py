@@ -0,0 +1,20 @@
+"""gunicorn 설정 (gunicorn -c gunicorn.conf.py wsgi:app)"""
+import os
+
+bind = os.getenv("WEB_BIND", "0.0.0.0:5000")
+# 라우팅은 CPU 작업이라 코어당 워커 하나, 워커 안 스레드는 DB/IO 대기용
+workers = int(os.getenv("WEB_WORKERS", "0")) or (os.cpu_count() or 1)
+# 앱이 워커 수를 알도록 (ai_inference.AI_WORKERS 기본값 = 코어 수 / 워커 수)
+os.environ["WEB_WORKERS"] = str(workers)
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "4"))
+timeout = int(os.getenv("WEB_TIMEOUT", "120"))
+# 지도는 부모에서 한 번만 올리고 워커는 fork로 공유
+preload_app = True
+# 제설 작업(/api/professional/jobs) 상태는 워커 간에 보이도록 SQLite에 둔다.
+# AI_JOB_DB 미설정이면 backend/plow_jobs.db (app.PREFORK_JOB_DB). 실행은 제출받은 워커가 맡는다.
+
+
+def post_fork(server, worker):
+    from app import on_worker_start
+    on_worker_start()
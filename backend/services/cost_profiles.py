@@ -0,0 +1,85 @@
+"""
+연속 위험 가중 비용 프로파일
+
+safe 모드의 계단식 가중(위험도 60/80 이상 ×100/×1000) 대신
+  비용 = 길이 × (1 + Σ 가중치ᵢ × ((점수ᵢ - threshold) / (100 - threshold))₊ ^ exponent)
+로 엣지 비용을 만든다. 계수는 사용자가 정하고(ThresholdSettings의 위험 시작 점수 -> threshold),
+같은 계수는 같은 digest를 가지므로 RouteFinder가 digest 단위로 한 번만 컴파일해 재사용한다.
+
+배율이 항상 1 이상이므로 fast(길이) 비용의 ALT 하한을 그대로 쓸 수 있다.
+"""
+import hashlib
+import json
+
+import numpy as np
+
+from services.risk_scores import SCORE_ATTRS
+
+# 요청 키 -> 점수 배열 열
+PROFILE_TERMS = {
+    'risk': SCORE_ATTRS.index('risk_score'),
+    'slope': SCORE_ATTRS.index('slope_score'),
+    'freeze': SCORE_ATTRS.index('freeze_score'),
+    'accident': SCORE_ATTRS.index('accident_score'),
+    'population': SCORE_ATTRS.index('population_score'),
+}
+DEFAULT_WEIGHTS = {'risk': 4.0}
+MAX_WEIGHT = 1000.0
+PROFILE_PREFIX = 'profile:'
+
+
+class CostProfile:
+    def __init__(self, weights=None, exponent=2.0, threshold=0.0):
+        self.weights = {term: float(w) for term, w in (DEFAULT_WEIGHTS if weights is None else weights).items()
+                        if float(w) != 0.0}
+        self.exponent = float(exponent)
+        self.threshold = float(threshold)
+        canonical = json.dumps(self.to_dict(), sort_keys=True, separators=(',', ':'))
+        self.digest = hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:16]
+
+    @property
+    def mode(self):
+        """경로 캐시/비용 조회에 쓰는 모드 이름"""
+        return PROFILE_PREFIX + self.digest
+
+    @classmethod
+    def from_dict(cls, data):
+        """요청 본문 -> CostProfile (잘못된 값은 ValueError)
+
+        {"weights": {"risk": 4, "slope": 1, ...}, "exponent": 2, "threshold": 40}
+        """
+        if not isinstance(data, dict):
+            raise ValueError("비용 프로파일은 객체여야 합니다.")
+        unknown = set(data) - {'weights', 'exponent', 'threshold'}
+        if unknown:
+            raise ValueError(f"알 수 없는 프로파일 항목입니다: {sorted(unknown)}")
+        weights = data.get('weights', DEFAULT_WEIGHTS)
+        if not isinstance(weights, dict):
+            raise ValueError("weights는 객체여야 합니다.")
+        unknown = set(weights) - set(PROFILE_TERMS)
+        if unknown:
+            raise ValueError(f"알 수 없는 가중 항목입니다: {sorted(unknown)} (가능: {sorted(PROFILE_TERMS)})")
+        weights = {term: float(w) for term, w in weights.items()}
+        if any(not 0.0 <= w <= MAX_WEIGHT for w in weights.values()):
+            raise ValueError(f"가중치는 0 이상 {MAX_WEIGHT:g} 이하여야 합니다.")
+        exponent = float(data.get('exponent', 2.0))
+        if not 0.0 < exponent <= 8.0:
+            raise ValueError("exponent는 0 초과 8 이하여야 합니다.")
+        threshold = float(data.get('threshold', 0.0))
+        if not 0.0 <= threshold < 100.0:
+            raise ValueError("threshold는 0 이상 100 미만이어야 합니다.")
+        return cls(weights, exponent, threshold)
+
+    def to_dict(self):
+        return {'weights': dict(self.weights), 'exponent': self.exponent, 'threshold': self.threshold}
+
+    def edge_costs(self, lengths, scores):
+        """엣지별 비용 벡터 (lengths [E], scores [E, 6])"""
+        lengths = np.asarray(lengths, dtype=np.float64)
+        scores = np.asarray(scores)
+        factor = np.ones(len(lengths))
+        span = 100.0 - self.threshold
+        for term, weight in self.weights.items():
+            level = np.clip((scores[:, PROFILE_TERMS[term]] - self.threshold) / span, 0.0, 1.0)
+            factor += weight * level ** self.exponent
+        return lengths * factor
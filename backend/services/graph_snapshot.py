@@ -0,0 +1,346 @@
+"""
+도로망 그래프 스냅샷 (버전 관리되는 바이너리 포맷)
+
+한 번 CLI로 만들어 두면 서버 시작 시 OSM 다운로드 없이 mmap으로 바로 연다.
+여러 워커 프로세스가 같은 파일을 열면 페이지 캐시를 공유한다.
+
+  python -m services.graph_snapshot build --out graph_seoul.snap
+  python -m services.graph_snapshot info graph_seoul.snap
+
+파일 구조: MAGIC(8) | version(u32) | header_len(u32) | header JSON | 64바이트 정렬된 배열들
+"""
+import argparse
+import json
+import os
+import struct
+import time
+import numpy as np
+
+from services.risk_scores import SCORE_ATTRS, load_score_table, map_scores, score_fingerprint
+
+SNAPSHOT_MAGIC = b'CSGSNAP\x00'
+SNAPSHOT_VERSION = 1
+_ALIGN = 64
+NO_ROAD_NAME = '도로명 정보 없음'
+
+# 스냅샷에 반드시 있어야 하는 배열
+SNAPSHOT_ARRAYS = [
+    'node_osmid',      # int64 [N]      osmid 오름차순 정렬
+    'node_x',          # float64 [N]    경도
+    'node_y',          # float64 [N]    위도
+    'indptr',          # int64 [N+1]    CSR 행 포인터
+    'edge_target',     # int32 [E]      엣지 도착 노드 인덱스 ((출발, 도착, key) 순 정렬)
+    'edge_key',        # int32 [E]      MultiDiGraph key
+    'edge_length',     # float64 [E]    미터
+    'edge_scores',     # float64 [E,6]  SCORE_ATTRS 순서
+    'geom_offsets',    # int64 [E+1]    geom_coords 구간 (geometry 없는 엣지는 빈 구간)
+    'geom_coords',     # float64 [M,2]  (x, y)
+    'osmid_offsets',   # int64 [E+1]
+    'osmid_values',    # int64 [K]      엣지를 이루는 OSM way id들
+    'name_ids',        # int32 [E]      도로명 테이블 인덱스 (-1: 없음)
+    'name_offsets',    # int64 [S+1]
+    'name_blob',       # uint8 [B]      UTF-8 도로명
+]
+
+
+def write_container(path, meta, arrays):
+    """헤더 JSON + 정렬된 원시 배열로 저장 (임시 파일에 쓴 뒤 교체)"""
+    layout = {}
+    offset = 0
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        arrays[name] = arr
+        layout[name] = {'dtype': arr.dtype.str, 'shape': list(arr.shape), 'offset': offset}
+        offset += -(-arr.nbytes // _ALIGN) * _ALIGN
+
+    header = json.dumps({**meta, 'arrays': layout}, ensure_ascii=False).encode('utf-8')
+    data_start = -(-(16 + len(header)) // _ALIGN) * _ALIGN
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack('<II', SNAPSHOT_VERSION, len(header)))
+        f.write(header)
+        for name, arr in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(arr.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_container(path):
+    """mmap으로 열어 (meta, {이름: 읽기 전용 배열}) 반환"""
+    raw = np.memmap(path, dtype=np.uint8, mode='r')
+    if bytes(raw[:8]) != SNAPSHOT_MAGIC:
+        raise ValueError(f"스냅샷 파일 형식이 아닙니다: {path}")
+    version, header_len = struct.unpack('<II', bytes(raw[8:16]))
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"지원하지 않는 스냅샷 버전입니다: {version} (필요: {SNAPSHOT_VERSION})")
+
+    meta = json.loads(bytes(raw[16:16 + header_len]).decode('utf-8'))
+    data_start = -(-(16 + header_len) // _ALIGN) * _ALIGN
+
+    arrays = {}
+    for name, spec in meta.pop('arrays').items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        start = data_start + spec['offset']
+        arrays[name] = raw[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+    return meta, arrays
+
+
+def _road_name(raw_name):
+    if raw_name is None:
+        return None
+    return raw_name[0] if isinstance(raw_name, list) else str(raw_name)
+
+
+def _edge_osmids(osm_ids):
+    if isinstance(osm_ids, list):
+        return [int(i) for i in osm_ids if isinstance(i, (int, str))]
+    if isinstance(osm_ids, (int, str)):
+        return [int(osm_ids)]
+    return []
+
+
+class GraphSnapshot:
+    def __init__(self, meta, arrays):
+        missing = [name for name in SNAPSHOT_ARRAYS if name not in arrays]
+        if missing:
+            raise ValueError(f"스냅샷에 배열이 없습니다: {missing}")
+        self.meta = meta
+        self.arrays = arrays
+        for name in SNAPSHOT_ARRAYS:
+            setattr(self, name, arrays[name])
+        self._edge_source = None
+        self._names = None
+        self.path = None
+
+    @property
+    def n_nodes(self):
+        return len(self.node_osmid)
+
+    @property
+    def n_edges(self):
+        return len(self.edge_target)
+
+    @property
+    def edge_source(self):
+        """엣지 출발 노드 인덱스 [E]"""
+        if self._edge_source is None:
+            self._edge_source = np.repeat(
+                np.arange(self.n_nodes, dtype=np.int32), np.diff(self.indptr)
+            )
+        return self._edge_source
+
+    def node_index(self, osmid):
+        """osmid -> 노드 인덱스 (없으면 KeyError)"""
+        i = int(np.searchsorted(self.node_osmid, osmid))
+        if i >= self.n_nodes or self.node_osmid[i] != osmid:
+            raise KeyError(osmid)
+        return i
+
+    def road_names(self):
+        """도로명 테이블 (list[str])"""
+        if self._names is None:
+            blob = bytes(self.name_blob)
+            offs = self.name_offsets.tolist()
+            self._names = [blob[offs[i]:offs[i + 1]].decode('utf-8') for i in range(len(offs) - 1)]
+        return self._names
+
+    def road_name(self, e):
+        name_id = int(self.name_ids[e])
+        return self.road_names()[name_id] if name_id >= 0 else NO_ROAD_NAME
+
+    def path_coords(self, edges, last_node):
+        """엣지 경로의 [lat, lng] 좌표열 [P, 2]
+
+        geometry가 있는 엣지는 그 좌표 전체, 없는 엣지는 출발 노드 좌표 하나를 쓰고
+        마지막에 도착 노드 좌표를 붙인다.
+        """
+        edges = np.asarray(edges, dtype=np.int64)
+        starts = self.geom_offsets[edges]
+        n_geom = self.geom_offsets[edges + 1] - starts
+        counts = np.maximum(n_geom, 1)
+        owner = np.repeat(np.arange(edges.size), counts)
+        local = np.arange(owner.size) - (np.cumsum(counts) - counts)[owner]
+        has_geom = n_geom[owner] > 0
+
+        coords = np.empty((owner.size + 1, 2), dtype=np.float64)
+        src = self.edge_source[edges[owner]]
+        coords[:-1, 0] = self.node_y[src]
+        coords[:-1, 1] = self.node_x[src]
+        if len(self.geom_coords):
+            g = (starts[owner] + local)[has_geom]
+            coords[:-1][has_geom] = self.geom_coords[g][:, ::-1]
+        coords[-1] = (self.node_y[last_node], self.node_x[last_node])
+        return coords
+
+    @classmethod
+    def from_graph(cls, G, region=None):
+        """osmnx MultiDiGraph -> 스냅샷 (메모리 상)"""
+        node_osmid = np.array(sorted(G.nodes), dtype=np.int64)
+        pos = {n: i for i, n in enumerate(node_osmid.tolist())}
+        node_x = np.array([G.nodes[n]['x'] for n in node_osmid.tolist()], dtype=np.float64)
+        node_y = np.array([G.nodes[n]['y'] for n in node_osmid.tolist()], dtype=np.float64)
+
+        edges = sorted(G.edges(keys=True, data=True), key=lambda e: (pos[e[0]], pos[e[1]], e[2]))
+        n_edges = len(edges)
+
+        counts = np.bincount([pos[u] for u, _, _, _ in edges], minlength=len(node_osmid))
+        indptr = np.zeros(len(node_osmid) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+
+        edge_target = np.empty(n_edges, dtype=np.int32)
+        edge_key = np.empty(n_edges, dtype=np.int32)
+        edge_length = np.empty(n_edges, dtype=np.float64)
+        edge_scores = np.zeros((n_edges, len(SCORE_ATTRS)), dtype=np.float64)
+        geom_offsets = np.zeros(n_edges + 1, dtype=np.int64)
+        osmid_offsets = np.zeros(n_edges + 1, dtype=np.int64)
+        name_ids = np.full(n_edges, -1, dtype=np.int32)
+        geom_coords, osmid_values, name_table = [], [], {}
+
+        for e, (u, v, k, data) in enumerate(edges):
+            edge_target[e] = pos[v]
+            edge_key[e] = k
+            edge_length[e] = data.get('length', 10)
+            for c, attr in enumerate(SCORE_ATTRS):
+                edge_scores[e, c] = data.get(attr, 0.0)
+
+            if 'geometry' in data:
+                geom_coords.extend(data['geometry'].coords)
+            geom_offsets[e + 1] = len(geom_coords)
+
+            osmid_values.extend(_edge_osmids(data.get('osmid', [])))
+            osmid_offsets[e + 1] = len(osmid_values)
+
+            name = _road_name(data.get('name'))
+            if name is not None:
+                name_ids[e] = name_table.setdefault(name, len(name_table))
+
+        encoded = [name.encode('utf-8') for name in name_table]
+        name_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=name_offsets[1:])
+
+        arrays = {
+            'node_osmid': node_osmid,
+            'node_x': node_x,
+            'node_y': node_y,
+            'indptr': indptr,
+            'edge_target': edge_target,
+            'edge_key': edge_key,
+            'edge_length': edge_length,
+            'edge_scores': edge_scores,
+            'geom_offsets': geom_offsets,
+            'geom_coords': np.array(geom_coords, dtype=np.float64).reshape(-1, 2),
+            'osmid_offsets': osmid_offsets,
+            'osmid_values': np.array(osmid_values, dtype=np.int64),
+            'name_ids': name_ids,
+            'name_offsets': name_offsets,
+            'name_blob': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        }
+        meta = {
+            'format_version': SNAPSHOT_VERSION,
+            'region': region,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'n_nodes': int(len(node_osmid)),
+            'n_edges': int(n_edges),
+            'score_source': None,
+        }
+        return cls(meta, arrays)
+
+    @classmethod
+    def load(cls, path):
+        meta, arrays = read_container(path)
+        snapshot = cls(meta, arrays)
+        snapshot.path = path
+        return snapshot
+
+    def set_scores(self, scores, source=None):
+        """엣지 점수 배열 교체 (source: 점수 CSV 지문)"""
+        self.arrays['edge_scores'] = self.edge_scores = scores
+        self.meta['score_source'] = source
+
+    def save(self, path):
+        write_container(path, dict(self.meta), dict(self.arrays))
+
+    def to_networkx(self, scores=None):
+        """호환용 networkx MultiDiGraph 재구성 (geometry는 shapely LineString)"""
+        import networkx as nx
+        from shapely.geometry import LineString
+
+        scores = self.edge_scores if scores is None else scores
+        G = nx.MultiDiGraph(crs='epsg:4326')
+        osmids = self.node_osmid.tolist()
+        for n, x, y in zip(osmids, self.node_x.tolist(), self.node_y.tolist()):
+            G.add_node(n, x=x, y=y)
+
+        names = self.road_names()
+        src = self.edge_source.tolist()
+        geom_offsets = self.geom_offsets.tolist()
+        osmid_offsets = self.osmid_offsets.tolist()
+        osmid_values = self.osmid_values.tolist()
+        score_rows = np.asarray(scores).tolist()
+        for e, (s, t, k, length, name_id) in enumerate(zip(
+                src, self.edge_target.tolist(), self.edge_key.tolist(),
+                self.edge_length.tolist(), self.name_ids.tolist())):
+            ids = osmid_values[osmid_offsets[e]:osmid_offsets[e + 1]]
+            data = {'osmid': ids[0] if len(ids) == 1 else ids, 'length': length}
+            if name_id >= 0:
+                data['name'] = names[name_id]
+            g0, g1 = geom_offsets[e], geom_offsets[e + 1]
+            if g1 > g0:
+                data['geometry'] = LineString(self.geom_coords[g0:g1])
+            data.update(zip(SCORE_ATTRS, score_rows[e]))
+            G.add_edge(osmids[s], osmids[t], key=k, **data)
+        return G
+
+
+def _build(args):
+    import osmnx as ox
+
+    started = time.time()
+    print(f"🗺️ '{args.region}' 도로망 다운로드 중...")
+    G = ox.graph_from_place(args.region, network_type='drive')
+    snapshot = GraphSnapshot.from_graph(G, region=args.region)
+
+    if args.csv and os.path.exists(args.csv):
+        table = load_score_table(args.csv)
+        scores = map_scores(snapshot.osmid_offsets, snapshot.osmid_values, table)
+        snapshot.set_scores(scores, score_fingerprint(args.csv))
+        print(f"   - 결빙 데이터 {len(table)}개 매핑 완료")
+
+    snapshot.save(args.out)
+    size_mb = os.path.getsize(args.out) / 1e6
+    print(f"✅ 스냅샷 저장: {args.out} (노드 {snapshot.n_nodes}개, 엣지 {snapshot.n_edges}개, "
+          f"{size_mb:.1f}MB, {time.time() - started:.1f}s)")
+
+
+def _info(args):
+    started = time.perf_counter()
+    snapshot = GraphSnapshot.load(args.path)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(json.dumps(snapshot.meta, ensure_ascii=False, indent=2))
+    print(f"로드 시간: {elapsed_ms:.1f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m services.graph_snapshot', description='도로망 그래프 스냅샷 도구')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_build = sub.add_parser('build', help='OSM에서 도로망을 받아 스냅샷 생성')
+    p_build.add_argument('--region', default='Seoul, South Korea')
+    p_build.add_argument('--csv', default='final_freezing_score.csv', help='엣지에 미리 매핑할 위험 점수 CSV')
+    p_build.add_argument('--out', default='graph_seoul.snap')
+    p_build.set_defaults(func=_build)
+
+    p_info = sub.add_parser('info', help='스냅샷 메타데이터 출력')
+    p_info.add_argument('path')
+    p_info.set_defaults(func=_info)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
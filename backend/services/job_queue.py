@@ -0,0 +1,226 @@
+"""
+오래 걸리는 작업(제설 경로 추론)용 비동기 작업 큐
+
+외부 브로커 없이 프로세스 안에서 돈다. submit()은 작업 id를 바로 돌려주고,
+고정 개수의 작업 스레드가 큐에서 하나씩 꺼내 실행한다. 큐가 가득 차면 QueueFull.
+
+작업 상태: queued -> running -> done | failed | cancelled
+대기 중인 작업은 취소하면 실행되지 않고, 실행 중인 작업은 끝난 뒤 결과를 버린다.
+
+SqliteJobStore를 쓰면 상태/결과가 SQLite 파일에 저장돼 같은 서버의 다른 워커
+프로세스에서도 조회·취소할 수 있다. 실행은 제출받은 프로세스가 맡는다.
+owner를 주고 제출한 작업은 같은 owner로만 조회·취소된다.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class MemoryJobStore:
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def add(self, job):
+        with self._lock:
+            self._jobs[job['id']] = dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id, only_if=None, **fields):
+        """상태 갱신. only_if가 주어지면 현재 상태가 그중 하나일 때만 (성공 여부 반환)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or (only_if is not None and job['status'] not in only_if):
+                return False
+            job.update(fields)
+            return True
+
+    def purge(self, before):
+        with self._lock:
+            stale = [job_id for job_id, job in self._jobs.items()
+                     if job['status'] in FINISHED and (job['finished_at'] or 0) < before]
+            for job_id in stale:
+                del self._jobs[job_id]
+
+
+class SqliteJobStore:
+    _COLUMNS = ('id', 'kind', 'status', 'params', 'result', 'error',
+                'submitted_at', 'started_at', 'finished_at', 'cancel_requested', 'owner')
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, kind TEXT, status TEXT, params TEXT, '
+            'result TEXT, error TEXT, submitted_at REAL, started_at REAL, finished_at REAL, '
+            'cancel_requested INTEGER DEFAULT 0, owner TEXT)'
+        )
+        # owner 열이 없던 이전 파일
+        if 'owner' not in {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}:
+            conn.execute('ALTER TABLE jobs ADD COLUMN owner TEXT')
+
+    def _connect(self):
+        # prefork 부모가 연 연결은 fork된 워커에서 쓰지 않고 새로 연결
+        conn, pid = getattr(self._local, 'conn', None), getattr(self._local, 'pid', None)
+        if conn is None or pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @staticmethod
+    def _encode(fields):
+        return {k: json.dumps(v, ensure_ascii=False) if k in ('params', 'result') and v is not None else v
+                for k, v in fields.items()}
+
+    def add(self, job):
+        row = self._encode(job)
+        cols = [c for c in self._COLUMNS if c in row]
+        self._connect().execute(
+            f"INSERT INTO jobs ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+            [row[c] for c in cols],
+        )
+
+    def get(self, job_id):
+        row = self._connect().execute(
+            f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(self._COLUMNS, row))
+        for k in ('params', 'result'):
+            if job[k] is not None:
+                job[k] = json.loads(job[k])
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        return job
+
+    def update(self, job_id, only_if=None, **fields):
+        row = self._encode(fields)
+        sql = f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in row)} WHERE id = ?"
+        args = list(row.values()) + [job_id]
+        if only_if is not None:
+            sql += f" AND status IN ({', '.join('?' * len(only_if))})"
+            args += list(only_if)
+        return self._connect().execute(sql, args).rowcount > 0
+
+    def purge(self, before):
+        self._connect().execute(
+            f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) AND finished_at < ?",
+            (*FINISHED, before),
+        )
+
+
+class JobQueue:
+    def __init__(self, workers=2, max_queue=32, store=None, ttl=3600.0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.store = store if store is not None else MemoryJobStore()
+        self.ttl = ttl
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._tasks = {}
+        self._threads = []
+        self._lock = threading.Lock()
+        self._running = 0
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, kind, params, fn, *args, owner=None, **kwargs):
+        """작업 등록 후 id 반환 (큐가 가득 차면 QueueFull)
+
+        params: 조회 시 함께 돌려줄 요청 정보 (JSON 직렬화 가능해야 함)
+        owner: 제출한 사용자. get/cancel에 다른 owner를 주면 없는 작업으로 본다.
+        fn(*args, **kwargs)의 반환값(JSON 직렬화 가능)이 작업 결과가 된다.
+        """
+        self._ensure_workers()
+        self.store.purge(time.time() - self.ttl)
+        job_id = uuid.uuid4().hex
+        job = {'id': job_id, 'kind': kind, 'status': QUEUED, 'params': params, 'result': None,
+               'error': None, 'submitted_at': time.time(), 'started_at': None, 'finished_at': None,
+               'cancel_requested': False, 'owner': owner}
+        self.store.add(job)
+        with self._lock:
+            self._tasks[job_id] = (fn, args, kwargs)
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            with self._lock:
+                self._tasks.pop(job_id, None)
+            self.store.update(job_id, status=FAILED, error='queue full', finished_at=time.time())
+            raise QueueFull(f"대기 중인 작업이 너무 많습니다 (최대 {self.max_queue}개)")
+        return job_id
+
+    def get(self, job_id, owner=None):
+        job = self.store.get(job_id)
+        if job is None or (owner is not None and job['owner'] != owner):
+            return None
+        if job['status'] == QUEUED:
+            job['queue_depth'] = self._queue.qsize()
+        return job
+
+    def cancel(self, job_id, owner=None):
+        """취소 요청. 이미 끝난 작업이거나 없는(다른 owner의) 작업이면 False"""
+        if owner is not None and self.get(job_id, owner) is None:
+            return False
+        now = time.time()
+        if self.store.update(job_id, only_if=(QUEUED,), status=CANCELLED, finished_at=now,
+                             cancel_requested=True):
+            return True
+        # 실행 중: 끝난 뒤 결과를 버리도록 표시
+        return self.store.update(job_id, only_if=(RUNNING,), cancel_requested=True)
+
+    def stats(self):
+        with self._lock:
+            running = self._running
+        return {'workers': self.workers, 'max_queue': self.max_queue,
+                'queued': self._queue.qsize(), 'running': running}
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                fn, args, kwargs = self._tasks.pop(job_id, (None, (), {}))
+            # 대기 중 취소된 작업은 건너뜀
+            if fn is None or not self.store.update(job_id, only_if=(QUEUED,), status=RUNNING,
+                                                   started_at=time.time()):
+                continue
+            with self._lock:
+                self._running += 1
+            try:
+                result, error = fn(*args, **kwargs), None
+            except Exception as e:
+                result, error = None, str(e) or e.__class__.__name__
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+            job = self.store.get(job_id)
+            now = time.time()
+            if job is not None and job['cancel_requested']:
+                self.store.update(job_id, status=CANCELLED, finished_at=now)
+            elif error is not None:
+                self.store.update(job_id, status=FAILED, error=error, finished_at=now)
+            else:
+                self.store.update(job_id, status=DONE, result=result, finished_at=now)
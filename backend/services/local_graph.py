@@ -0,0 +1,333 @@
+"""
+제설 추론용 지역 그래프 (기지 주변 GRAPH_DIST 반경)
+
+Q-table 상태의 unplowed 비트 번호는 학습에 쓴 ox.graph_from_point 그래프의 엣지 순서(edge_attr)를,
+행동 후보 순서는 이웃 순서를 따른다. 노드 구성이 같아도 순서가 다르면 상태 정수가 달라져
+Q값이 조용히 0으로 조회되므로, 학습 그래프를 osmnx 순서 그대로 모델 옆에 저장해 두고
+(models/q_table_{gu}.graphs) 같은 순서로 다시 만든다. 서버(ai_inference.ModelRegistry)는 이 파일만 쓰고
+없으면 추론을 거부한다.
+
+extract_subgraph: 도시 스냅샷을 bbox로 잘라낸 그래프. 노드 구성은 비슷하지만 순서가 osmnx와 다르고
+스냅샷 밖 도로가 빠지므로 학습 모델 추론에는 쓰지 않는다 (합성 벤치마크, check --snapshot 비교용).
+
+  python -m services.local_graph export models/q_table_gangnam.pkl --bases bases.json
+  python -m services.local_graph check models [--snapshot graph_seoul.snap]
+"""
+import argparse
+import json
+import os
+import pickle
+
+import networkx as nx
+import numpy as np
+
+from services.graph_snapshot import read_container, write_container
+from services.plow_engine import CompiledGraph, CompiledSnowEnv, inference_tables, make_policy
+from services.route_engine import EARTH_RADIUS_M, haversine_m
+
+GRAPHS_SUFFIX = '.graphs'
+
+
+def graphs_path(pkl_path):
+    return os.path.splitext(pkl_path)[0] + GRAPHS_SUFFIX
+
+
+def base_key(lat, lng):
+    return (round(lat, 6), round(lng, 6))
+
+
+def bbox_from_point(lat, lng, dist):
+    """(north, south, east, west) — osmnx bbox_from_point와 같은 계산"""
+    delta_lat = np.degrees(dist / EARTH_RADIUS_M)
+    delta_lng = delta_lat / np.cos(np.radians(lat))
+    return lat + delta_lat, lat - delta_lat, lng + delta_lng, lng - delta_lng
+
+
+def _nodes_in_bbox(snapshot, south, west, north, east, spatial=None):
+    if spatial is not None:
+        return spatial.nodes_in_bbox(south, west, north, east)
+    return np.flatnonzero((snapshot.node_y >= south) & (snapshot.node_y <= north)
+                          & (snapshot.node_x >= west) & (snapshot.node_x <= east))
+
+
+def extract_subgraph(snapshot, lat, lng, dist=3500, spatial=None):
+    """지점 주변 dist(m) bbox의 MultiDiGraph (노드 x/y, 엣지 length)
+
+    spatial(SpatialIndex)이 있으면 격자로 bbox 안 노드만 찾아 전체 배열을 훑지 않는다.
+    """
+    north, south, east, west = bbox_from_point(lat, lng, dist)
+    nodes = _nodes_in_bbox(snapshot, south, west, north, east, spatial)
+    inside = np.zeros(snapshot.n_nodes, dtype=bool)
+    inside[nodes] = True
+
+    # bbox 안 노드에서 나가는 엣지 중 도착 노드도 안에 있는 것
+    starts = snapshot.indptr[nodes]
+    counts = snapshot.indptr[nodes + 1] - starts
+    owner = np.repeat(np.arange(nodes.size), counts)
+    edges = starts[owner] + np.arange(owner.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    keep = inside[snapshot.edge_target[edges]]
+    edges = edges[keep]
+    src, dst = nodes[owner[keep]], snapshot.edge_target[edges]
+
+    G = nx.MultiDiGraph(crs='epsg:4326')
+    G.add_nodes_from(
+        (osmid, {'x': x, 'y': y})
+        for osmid, x, y in zip(snapshot.node_osmid[nodes].tolist(),
+                               snapshot.node_x[nodes].tolist(), snapshot.node_y[nodes].tolist())
+    )
+    osmid = snapshot.node_osmid
+    G.add_edges_from(
+        (u, v, k, {'length': length})
+        for u, v, k, length in zip(osmid[src].tolist(), osmid[dst].tolist(),
+                                   snapshot.edge_key[edges].tolist(), snapshot.edge_length[edges].tolist())
+    )
+    if G.number_of_nodes() == 0:
+        return G
+    largest = max(nx.weakly_connected_components(G), key=len)
+    return G.subgraph(largest).copy()
+
+
+def nearest_node(G, lat, lng):
+    """지역 그래프에서 가장 가까운 노드 osmid (대원거리 기준)"""
+    nodes = list(G.nodes)
+    ys = np.fromiter((G.nodes[n]['y'] for n in nodes), dtype=np.float64, count=len(nodes))
+    xs = np.fromiter((G.nodes[n]['x'] for n in nodes), dtype=np.float64, count=len(nodes))
+    return nodes[int(np.argmin(haversine_m(lat, lng, ys, xs)))]
+
+
+def download_graph(lat, lng, dist=3500):
+    """Q-table 학습과 같은 osmnx 지역 그래프와 시작 노드 (네트워크 필요)"""
+    import osmnx as ox
+
+    G = ox.graph_from_point((lat, lng), dist=dist, network_type='drive', simplify=True)
+    return G, ox.distance.nearest_nodes(G, lng, lat)
+
+
+def save_local_graphs(path, graphs, meta=None):
+    """[(기지 lat, lng, G, 시작 노드), ...]를 노드/엣지 순서 그대로 저장
+
+    노드는 G.nodes 순서, 엣지는 G.edges(keys=True) 순서로 적어 두면 같은 순서로 다시 추가했을 때
+    이웃 순서와 edge_attr 순서(= Q 상태 비트 번호)가 원래 그래프와 같아진다.
+    """
+    node_ptr, edge_ptr = [0], [0]
+    osmid, xs, ys = [], [], []
+    us, vs, keys, lengths = [], [], [], []
+    for _, _, G, _ in graphs:
+        for n, d in G.nodes(data=True):
+            osmid.append(n)
+            xs.append(d['x'])
+            ys.append(d['y'])
+        for u, v, k, length in G.edges(keys=True, data='length'):
+            us.append(u)
+            vs.append(v)
+            keys.append(k)
+            lengths.append(length)
+        node_ptr.append(len(osmid))
+        edge_ptr.append(len(us))
+    arrays = {
+        'base_lat': np.array([g[0] for g in graphs], dtype=np.float64),
+        'base_lng': np.array([g[1] for g in graphs], dtype=np.float64),
+        'start_node': np.array([g[3] for g in graphs], dtype=np.int64),
+        'node_ptr': np.array(node_ptr, dtype=np.int64),
+        'node_osmid': np.array(osmid, dtype=np.int64),
+        'node_x': np.array(xs, dtype=np.float64),
+        'node_y': np.array(ys, dtype=np.float64),
+        'edge_ptr': np.array(edge_ptr, dtype=np.int64),
+        'edge_u': np.array(us, dtype=np.int64),
+        'edge_v': np.array(vs, dtype=np.int64),
+        'edge_key': np.array(keys, dtype=np.int64),
+        'edge_length': np.array(lengths, dtype=np.float64),
+    }
+    write_container(path, {'kind': 'local_graphs', 'bases': len(graphs), **(meta or {})}, arrays)
+    return path
+
+
+class LocalGraphStore:
+    """save_local_graphs로 저장한 기지별 학습 그래프 (mmap)"""
+
+    def __init__(self, meta, arrays):
+        self.meta = meta
+        self.arrays = arrays
+        self._slots = {base_key(lat, lng): i for i, (lat, lng)
+                       in enumerate(zip(arrays['base_lat'].tolist(), arrays['base_lng'].tolist()))}
+
+    def __len__(self):
+        return len(self._slots)
+
+    @classmethod
+    def load(cls, path):
+        meta, arrays = read_container(path)
+        if meta.get('kind') != 'local_graphs':
+            raise ValueError(f"지역 그래프 파일이 아닙니다: {path}")
+        return cls(meta, arrays)
+
+    def bases(self):
+        a = self.arrays
+        return list(zip(a['base_lat'].tolist(), a['base_lng'].tolist()))
+
+    def find(self, lat, lng):
+        """기지 좌표의 슬롯 번호 (없으면 None)"""
+        return self._slots.get(base_key(lat, lng))
+
+    def graph(self, slot):
+        """(MultiDiGraph, 시작 노드) — 저장할 때와 같은 노드/엣지 순서"""
+        a = self.arrays
+        n0, n1 = int(a['node_ptr'][slot]), int(a['node_ptr'][slot + 1])
+        e0, e1 = int(a['edge_ptr'][slot]), int(a['edge_ptr'][slot + 1])
+        G = nx.MultiDiGraph(crs='epsg:4326')
+        G.add_nodes_from(
+            (osmid, {'x': x, 'y': y})
+            for osmid, x, y in zip(a['node_osmid'][n0:n1].tolist(),
+                                   a['node_x'][n0:n1].tolist(), a['node_y'][n0:n1].tolist())
+        )
+        G.add_edges_from(
+            (u, v, k, {'length': length})
+            for u, v, k, length in zip(a['edge_u'][e0:e1].tolist(), a['edge_v'][e0:e1].tolist(),
+                                       a['edge_key'][e0:e1].tolist(), a['edge_length'][e0:e1].tolist())
+        )
+        return G, int(a['start_node'][slot])
+
+
+class _CountingIndex:
+    """Q 색인 조회 중 0이 아닌 값이 나온 횟수 (Q-table 적중 확인용)"""
+
+    def __init__(self, index):
+        self.index = index
+        self.hits = 0
+
+    def get(self, env, action):
+        value = self.index.get(env, action)
+        if value:
+            self.hits += 1
+        return value
+
+
+def _rollout(G, start_node, Q, steps, policy=None):
+    """정책을 실행하며 스텝별 (노드 osmid, unplowed 상태 정수)와 Q 적중 수"""
+    graph = CompiledGraph(*inference_tables(G))
+    index = _CountingIndex(graph.compile_q(Q))
+    select = make_policy(policy, graph)
+    env = CompiledSnowEnv(graph, graph.node_id[start_node], step_limit=steps)
+    states = [(graph.nodes[env.cur], env.unplowed)]
+    for _ in range(steps):
+        nxt = select(env, index)
+        if nxt is None:
+            break
+        _, done = env.step(nxt)
+        states.append((graph.nodes[env.cur], env.unplowed))
+        if done:
+            break
+    return graph, states, index.hits
+
+
+def state_parity(G, start_node, reference, reference_start, Q=None, steps=400, policy=None):
+    """G가 reference(학습 그래프)와 같은 Q 상태 정수를 내는지 비교
+
+    노드 순서, 이웃 순서, 엣지 비트 순서를 비교하고 같은 Q로 정책을 실행해
+    스텝별 (노드, unplowed)가 처음 갈라지는 스텝을 찾는다.
+    """
+    Q = Q if Q is not None else {}
+    graph, states, hits = _rollout(G, start_node, Q, steps, policy)
+    ref_graph, ref_states, ref_hits = _rollout(reference, reference_start, Q, steps, policy)
+    mismatch = next((i for i, (a, b) in enumerate(zip(states, ref_states)) if a != b),
+                    None if len(states) == len(ref_states) else min(len(states), len(ref_states)))
+    return {
+        'nodes': graph.nodes == ref_graph.nodes,
+        'neighbors': [[graph.nodes[v] for v in nbs] for nbs in graph.neighbors]
+                     == [[ref_graph.nodes[v] for v in nbs] for nbs in ref_graph.neighbors],
+        'edge_bits': np.array_equal(graph.edge_pairs, ref_graph.edge_pairs),
+        'steps': len(ref_states) - 1,
+        'first_mismatch': mismatch,
+        'q_hits': hits,
+        'reference_q_hits': ref_hits,
+    }
+
+
+def _parity_ok(report):
+    return report['nodes'] and report['neighbors'] and report['edge_bits'] and report['first_mismatch'] is None
+
+
+def _load_q(pkl_path):
+    from services.qtable import CompactQTable, qtable_path
+
+    compact = qtable_path(pkl_path)
+    if os.path.exists(compact):
+        return CompactQTable.load(compact)
+    if os.path.exists(pkl_path):
+        with open(pkl_path, 'rb') as f:
+            return pickle.load(f)['Q']
+    return {}
+
+
+def _export(args):
+    with open(args.bases, encoding='utf-8') as f:
+        bases = [(float(b['lat']), float(b['lng'])) for b in json.load(f)]
+    graphs = []
+    for lat, lng in bases:
+        G, start_node = download_graph(lat, lng, args.dist)
+        graphs.append((lat, lng, G, start_node))
+        print(f"   ({lat:.6f}, {lng:.6f}) 노드 {G.number_of_nodes()}개, 엣지 {G.number_of_edges()}개")
+    out = save_local_graphs(graphs_path(args.model), graphs, {'dist': args.dist, 'source': 'osmnx'})
+    print(f"✅ {out}: 기지 {len(graphs)}곳")
+
+
+def _check(args):
+    snapshot = spatial = None
+    if args.snapshot:
+        from services.graph_snapshot import GraphSnapshot
+        from services.spatial_index import SpatialIndex
+
+        snapshot = GraphSnapshot.load(args.snapshot)
+        spatial = SpatialIndex(snapshot)
+    names = sorted(n for n in os.listdir(args.model_dir) if n.startswith('q_table_') and n.endswith(GRAPHS_SUFFIX))
+    if not names:
+        raise SystemExit(f"{args.model_dir}에 q_table_*{GRAPHS_SUFFIX} 파일이 없습니다. (export 먼저)")
+
+    failed = 0
+    for name in names:
+        path = os.path.join(args.model_dir, name)
+        store = LocalGraphStore.load(path)
+        Q = _load_q(path[:-len(GRAPHS_SUFFIX)] + '.pkl')
+        dist = store.meta.get('dist', args.dist)
+        print(f"[{name[len('q_table_'):-len(GRAPHS_SUFFIX)]}] 기지 {len(store)}곳")
+        for slot, (lat, lng) in enumerate(store.bases()):
+            reference, reference_start = download_graph(lat, lng, dist)
+            candidates = [('저장', *store.graph(slot))]
+            if snapshot is not None:
+                G = extract_subgraph(snapshot, lat, lng, dist=dist, spatial=spatial)
+                candidates.append(('스냅샷', G, nearest_node(G, lat, lng)))
+            for label, G, start_node in candidates:
+                report = state_parity(G, start_node, reference, reference_start, Q, args.steps)
+                ok = _parity_ok(report)
+                if label == '저장' and not ok:
+                    failed += 1
+                print(f"   ({lat:.6f}, {lng:.6f}) {label:<3} {'✅' if ok else '❌'} "
+                      f"노드 {report['nodes']} 이웃 {report['neighbors']} 엣지 비트 {report['edge_bits']}  "
+                      f"상태 {report['steps']}스텝 중 불일치 {report['first_mismatch']}  "
+                      f"Q 적중 {report['q_hits']}/{report['reference_q_hits']}")
+    raise SystemExit(1 if failed else 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m services.local_graph', description='제설 추론 지역 그래프 도구')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_export = sub.add_parser('export', help='기지별 osmnx 그래프를 q_table_{gu}.graphs로 저장 (네트워크 필요)')
+    p_export.add_argument('model', help='q_table_{gu}.pkl 경로 (옆에 .graphs로 저장)')
+    p_export.add_argument('--bases', required=True, help='[{"lat": ..., "lng": ...}, ...] JSON')
+    p_export.add_argument('--dist', type=float, default=3500)
+    p_export.set_defaults(func=_export)
+
+    p_check = sub.add_parser('check', help='저장된 그래프의 Q 상태 정수를 ox.graph_from_point와 비교 (네트워크 필요)')
+    p_check.add_argument('model_dir')
+    p_check.add_argument('--snapshot', help='도시 스냅샷 (extract_subgraph 결과도 함께 비교)')
+    p_check.add_argument('--steps', type=int, default=400)
+    p_check.add_argument('--dist', type=float, default=3500)
+    p_check.set_defaults(func=_check)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
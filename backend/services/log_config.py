@@ -0,0 +1,42 @@
+"""
+서버 로그 설정 (print 대신 logging)
+
+LOG_LEVEL (DEBUG/INFO/WARNING/...) 로 양을 조절하고, LOG_FORMAT=json 이면 한 줄에 JSON 하나씩
+(시각, 레벨, 로거, 메시지, pid + logger.info(..., extra={...})로 넘긴 필드) 남긴다.
+"""
+import json
+import logging
+import os
+import sys
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level=None, fmt=None):
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = fmt or os.getenv("LOG_FORMAT", "text")
+    handler = logging.StreamHandler(sys.stderr)
+    if fmt == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s'))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
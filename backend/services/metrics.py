@@ -0,0 +1,204 @@
+"""
+단계별 지연 시간 계측과 Prometheus 텍스트 노출 (/metrics)
+
+  with timed('snap'):
+      ...                                   # stage_seconds{stage="snap"} 히스토그램
+  observe_stage('search', seconds)          # 이미 잰 시간 기록
+  HTTP_SECONDS.observe(dt, endpoint=..., method=..., status=...)
+
+외부 의존성 없이 프로세스 안에서 히스토그램을 모으고 render()가 text format 0.0.4를 만든다.
+prefork 서버(wsgi.py)에서는 워커마다 METRICS_DIR/<pid>.json 으로 주기적으로 내보내고, /metrics는
+모든 워커 파일을 합쳐 응답한다 (끝난 워커의 누적값도 유지). add_collector()로 등록한 게이지는
+응답하는 프로세스의 현재 값만 낸다. 풀 워커 프로세스(AI 추론, 일괄 평가) 안의 단계는 기록되지 않으므로
+호출한 쪽에서 전체 시간을 잰다.
+"""
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = {}
+_collectors = []
+_registry_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # 라벨 값 -> [버킷별 개수..., +Inf 개수, 합계]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[k]) for k in self.labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def dump(self):
+        with self._lock:
+            return [[list(k), list(v)] for k, v in self._series.items()]
+
+
+def histogram(name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+    """이름으로 등록 (이미 있으면 기존 것 반환)"""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Histogram(name, help_text, labels, buckets)
+        return _registry[name]
+
+
+def add_collector(fn):
+    """fn() -> [(이름, 설명, {라벨: 값}, 값), ...] 를 /metrics 응답 때마다 게이지로 낸다"""
+    _collectors.append(fn)
+
+
+STAGE_SECONDS = histogram('stage_seconds', '라우팅/추론 단계별 소요 시간 (초)', ('stage',))
+HTTP_SECONDS = histogram('http_request_duration_seconds', 'HTTP 요청 처리 시간 (초)',
+                         ('endpoint', 'method', 'status'))
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+class timed:
+    """with timed('search'): ... — 블록 소요 시간을 stage_seconds에 기록"""
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, stage=self.stage)
+        return False
+
+
+# ---------------------------------------------------------------------------
+# 내보내기
+# ---------------------------------------------------------------------------
+def snapshot():
+    """이 프로세스의 누적값 {이름: {'help', 'labels', 'buckets', 'series'}}"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return {m.name: {'help': m.help, 'labels': list(m.labels), 'buckets': list(m.buckets), 'series': m.dump()}
+            for m in metrics}
+
+
+def _merge(snapshots):
+    merged = {}
+    for snap in snapshots:
+        for name, metric in snap.items():
+            target = merged.setdefault(name, {**metric, 'series': {}})
+            for labels, value in metric['series']:
+                key = tuple(labels)
+                prev = target['series'].get(key)
+                target['series'][key] = value if prev is None else [a + b for a, b in zip(prev, value)]
+    return merged
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _fmt(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(metrics_dir=None):
+    """Prometheus text format. metrics_dir가 있으면 다른 워커가 내보낸 파일과 합친다"""
+    snaps = [snapshot()]
+    if metrics_dir:
+        own = os.path.join(metrics_dir, f"{os.getpid()}.json")
+        for path in glob.glob(os.path.join(metrics_dir, '*.json')):
+            if path == own:
+                continue
+            try:
+                with open(path, encoding='utf-8') as f:
+                    snaps.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+
+    lines = []
+    for name, metric in sorted(_merge(snaps).items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} histogram")
+        for key, value in sorted(metric['series'].items()):
+            cumulative = 0
+            for bound, count in zip(metric['buckets'] + ['+Inf'], value[:-1]):
+                cumulative += count
+                le = bound if bound == '+Inf' else _fmt(float(bound))
+                lines.append(f"{name}_bucket{_labels(metric['labels'], key, {'le': le})} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric['labels'], key)} {_fmt(float(value[-1]))}")
+            lines.append(f"{name}_count{_labels(metric['labels'], key)} {cumulative}")
+
+    gauges = {}
+    for collect in list(_collectors):
+        try:
+            samples = collect()
+        except Exception:
+            continue
+        for name, help_text, labels, value in samples:
+            gauges.setdefault(name, (help_text, []))[1].append((labels, value))
+    for name, (help_text, samples) in sorted(gauges.items()):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_fmt(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def clear_dir(metrics_dir):
+    """서버 시작 시(부모 프로세스) 이전 실행의 워커 파일 삭제"""
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, '*.json')):
+        os.remove(path)
+
+
+def reset():
+    """누적값 비우기 (fork된 워커가 부모 값을 중복 집계하지 않도록)"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    for metric in metrics:
+        with metric._lock:
+            metric._series.clear()
+
+
+def export(metrics_dir):
+    """이 프로세스의 누적값을 metrics_dir/<pid>.json 으로 저장"""
+    path = os.path.join(metrics_dir, f"{os.getpid()}.json")
+    tmp = f"{path}.tmp"
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(snapshot(), f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def start_exporter(metrics_dir, interval=5.0):
+    """fork된 워커에서 호출: 부모 값을 비우고 주기적으로 export()하는 스레드 시작"""
+    reset()
+
+    def run():
+        while True:
+            time.sleep(interval)
+            export(metrics_dir)
+
+    threading.Thread(target=run, name='metrics-export', daemon=True).start()
@@ -0,0 +1,366 @@
+"""
+제설 경로 추론 엔진 (배열 기반)
+
+ai_inference.InferenceSnowEnv / select_action과 같은 행동을 고르지만,
+상태를 엣지 수만큼의 비트를 가진 정수 대신 다음으로 표현한다.
+
+- 노드/엣지는 정수 id, 이웃과 각 이웃으로 가는 무향 엣지는 CSR 배열
+- 미제설 여부는 bytearray, 노드별 미제설 인접 엣지 수(frontier)는 증분 갱신
+- 상태 정수(unplowed)는 만들지 않고 그 해시(unplowed mod 2^61-1)만 증분 갱신
+
+Q-table은 로드 시 (노드 id, 상태 해시, 행동 id) 키로 변환해 두고, 해시가 맞을 때만
+실제 상태 정수와 비교하므로 고르는 행동은 기존 구현과 정확히 같다.
+한 스텝 비용은 지역 그래프 크기와 무관하다(해시 일치 시 정수 복원만 예외).
+
+정책(policy)
+- greedy: 기존 규칙 그대로 (Q값 + 10 * 이웃의 미제설 인접 엣지 수)
+- lookahead: greedy 점수에 'k홉 안에서 가장 가까운 미제설 노드까지의 홉 수' 보너스를 더해
+  주변이 모두 제설된 곳에서 첫 이웃으로 헤매지 않고 남은 작업 쪽으로 이동
+
+  python -m services.plow_engine bench graph_seoul.snap --model models/q_table_gangnam.pkl
+"""
+import argparse
+import pickle
+import random
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+_HASH_MOD = sys.hash_info.modulus  # 2^61 - 1 (파이썬 int 해시와 같은 법)
+FRONTIER_WEIGHT = 10.0
+POLICIES = ('greedy', 'lookahead')
+LOOKAHEAD_HOPS = 6
+# 미제설 엣지 하나(FRONTIER_WEIGHT)보다 작게 두어 greedy 우선순위는 유지하고 동점만 가름
+LOOKAHEAD_WEIGHT = 5.0
+
+
+def inference_tables(G):
+    """networkx 지역 그래프 -> (graph_dict, edge_attr) (InferenceSnowEnv 입력 형식)"""
+    graph_dict = {n: list(G.neighbors(n)) for n in G.nodes()}
+    edge_attr = {}
+    for u, v, d in G.edges(data=True):
+        edge_attr[frozenset({u, v})] = d
+    return graph_dict, edge_attr
+
+
+class CompiledGraph:
+    """graph_dict / edge_attr(InferenceSnowEnv 입력)의 정수 id 표현"""
+
+    def __init__(self, graph_dict, edge_attr):
+        self.nodes = list(graph_dict)
+        self.node_id = {n: i for i, n in enumerate(self.nodes)}
+        for nbs in graph_dict.values():
+            for nb in nbs:
+                if nb not in self.node_id:
+                    self.node_id[nb] = len(self.nodes)
+                    self.nodes.append(nb)
+        # 비트 번호 = edge_attr 순서 (기존 구현과 같아야 Q-table 상태가 맞음)
+        edge_id = {e: i for i, e in enumerate(edge_attr)}
+        self.n_edges = len(edge_id)
+
+        n = len(self.nodes)
+        self.neighbors = [[] for _ in range(n)]
+        self.incident = [[] for _ in range(n)]
+        self.pair_edge = {}
+        for u, nbs in graph_dict.items():
+            ui = self.node_id[u]
+            for nb in nbs:
+                e = edge_id.get(frozenset({u, nb}), -1)
+                self.neighbors[ui].append(self.node_id[nb])
+                self.incident[ui].append(e)
+        # 엣지 id -> 정렬된 (osmid, osmid) (자기 루프는 같은 값 두 번) — 여러 기지 결과 합산용
+        self.edge_pairs = np.array([sorted(key) * (3 - len(key)) for key in edge_attr],
+                                   dtype=np.int64).reshape(-1, 2)
+        for e, key in enumerate(edge_attr):
+            ids = [self.node_id[x] for x in key if x in self.node_id]
+            if len(ids) == len(key):
+                a, b = ids[0], ids[-1]
+                self.pair_edge[(a, b)] = self.pair_edge[(b, a)] = e
+
+        # 엣지 -> 그 엣지를 이웃 목록에 가진 노드들 (제설 시 frontier 감소 대상)
+        self.edge_nodes = [[] for _ in range(self.n_edges)]
+        for ui, inc in enumerate(self.incident):
+            for e in inc:
+                if e >= 0:
+                    self.edge_nodes[e].append(ui)
+        self.initial_frontier = [sum(1 for e in inc if e >= 0) for inc in self.incident]
+
+        self.bit_hash = [pow(2, e, _HASH_MOD) for e in range(self.n_edges)]
+        self.full_hash = (pow(2, self.n_edges, _HASH_MOD) - 1) % _HASH_MOD
+        self._hops = None
+
+    def compile_q(self, Q):
+        """Q 딕셔너리 또는 services.qtable.CompactQTable -> get(env, action) 색인"""
+        if hasattr(Q, 'index_for'):
+            return Q.index_for(self)
+        return QIndex(Q, self)
+
+    def hop_table(self, k=LOOKAHEAD_HOPS):
+        if self._hops is None or self._hops.k != k:
+            self._hops = HopTable(self, k)
+        return self._hops
+
+
+class HopTable:
+    """노드별 k홉 이내 도달 노드와 홉 수 (CSR, 행 안은 홉 오름차순)
+
+    모든 노드 쌍 대신 k홉 안만 저장하므로 크기는 N * (k홉 이웃 수)에 비례한다.
+    """
+
+    def __init__(self, graph, k=LOOKAHEAD_HOPS):
+        self.k = k
+        nodes, hops, ptr = [], [], [0]
+        neighbors = graph.neighbors
+        for src in range(len(graph.nodes)):
+            seen = {src}
+            frontier = [src]
+            nodes.append(src)
+            hops.append(0)
+            for depth in range(1, k + 1):
+                nxt = []
+                for u in frontier:
+                    for v in neighbors[u]:
+                        if v not in seen:
+                            seen.add(v)
+                            nxt.append(v)
+                nodes.extend(nxt)
+                hops.extend([depth] * len(nxt))
+                frontier = nxt
+            ptr.append(len(nodes))
+        self.indptr = np.array(ptr, dtype=np.int64)
+        self.nodes = np.array(nodes, dtype=np.int32)
+        self.hops = np.array(hops, dtype=np.int16)
+
+    def nearest(self, sources, active):
+        """각 source에서 active 노드까지의 최소 홉 수 (k홉 안에 없으면 k + 1)"""
+        sources = np.asarray(sources, dtype=np.int64)
+        starts, ends = self.indptr[sources], self.indptr[sources + 1]
+        counts = ends - starts
+        owner = np.repeat(np.arange(sources.size), counts)
+        idx = starts[owner] + (np.arange(owner.size) - (np.cumsum(counts) - counts)[owner])
+        hop = np.where(active[self.nodes[idx]], self.hops[idx], self.k + 1)
+        return np.minimum.reduceat(hop, np.cumsum(counts) - counts)
+
+
+class QIndex:
+    """Q[((node, unplowed), action)]를 (노드 id, unplowed 해시, 행동 id)로 색인"""
+
+    def __init__(self, Q, graph):
+        self.entries = {}
+        for key, value in Q.items():
+            try:
+                (node, unplowed), action = key
+            except (TypeError, ValueError):
+                continue
+            ni, ai = graph.node_id.get(node), graph.node_id.get(action)
+            if ni is None or ai is None or not isinstance(unplowed, (int, np.integer)):
+                continue
+            unplowed = int(unplowed)
+            # 이 그래프의 엣지 수를 넘는 비트가 있는 상태는 나올 수 없음
+            if unplowed < 0 or unplowed >> graph.n_edges:
+                continue
+            self.entries.setdefault((ni, unplowed % _HASH_MOD, ai), []).append((unplowed, value))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, env, action):
+        found = self.entries.get((env.cur, env.state_hash, action))
+        if found is None:
+            return 0.0
+        unplowed = env.unplowed
+        for state, value in found:
+            if state == unplowed:
+                return value
+        return 0.0
+
+
+class CompiledSnowEnv:
+    """InferenceSnowEnv와 같은 전이 (노드는 CompiledGraph id)"""
+
+    def __init__(self, graph, start, step_limit=400):
+        self.graph = graph
+        self.start = start
+        self.step_limit = step_limit
+        self.reset()
+
+    def reset(self):
+        self.t = 0
+        self.cur = self.start
+        self.prev = None
+        self.plowed = bytearray(self.graph.n_edges)
+        self.remaining = self.graph.n_edges
+        self.state_hash = self.graph.full_hash
+        self.frontier = list(self.graph.initial_frontier)
+        # 미제설 인접 엣지가 남은 노드 (lookahead 정책용)
+        self.active = np.array(self.graph.initial_frontier, dtype=np.int64) > 0
+        self.node_tabu = deque(maxlen=10)
+        self.edge_tabu = deque(maxlen=20)
+        self.node_tabu.append(self.cur)
+        self._unplowed = None
+        return self.cur
+
+    def plowed_edges(self):
+        """지금까지 제설한 엣지 id 배열"""
+        return np.flatnonzero(np.frombuffer(bytes(self.plowed), dtype=np.uint8))
+
+    @property
+    def unplowed(self):
+        """기존 구현의 상태 정수 (Q 해시가 일치할 때만 복원)"""
+        if self._unplowed is None:
+            bits = np.frombuffer(bytes(self.plowed), dtype=np.uint8) ^ 1
+            self._unplowed = int.from_bytes(np.packbits(bits, bitorder='little').tobytes(), 'little')
+        return self._unplowed
+
+    def step(self, nxt):
+        g = self.graph
+        e = g.pair_edge.get((self.cur, nxt), -1)
+        if e >= 0 and not self.plowed[e]:
+            self.plowed[e] = 1
+            self.remaining -= 1
+            self.state_hash = (self.state_hash - g.bit_hash[e]) % _HASH_MOD
+            for node in g.edge_nodes[e]:
+                self.frontier[node] -= 1
+                if not self.frontier[node]:
+                    self.active[node] = False
+            self._unplowed = None
+
+        self.prev = self.cur
+        self.cur = nxt
+        self.node_tabu.append(self.cur)
+        self.edge_tabu.append(e)
+        self.t += 1
+
+        done = (self.remaining == 0) or (self.t >= self.step_limit)
+        return self.cur, done
+
+
+def select_action(env, q_index):
+    """ai_inference.select_action과 같은 규칙: Q값 + 10 * 미제설 인접 엣지 수, 동점이면 먼저 나온 이웃"""
+    actions = env.graph.neighbors[env.cur]
+    if not actions:
+        return None
+
+    cand = [a for a in actions if a not in env.node_tabu]
+    if not cand:
+        cand = actions
+
+    best = None
+    best_val = -1e18
+    frontier = env.frontier
+    for a in cand:
+        val = q_index.get(env, a) + (FRONTIER_WEIGHT * frontier[a])
+        if val > best_val:
+            best_val = val
+            best = a
+    return best
+
+
+def select_action_lookahead(env, q_index, hops, weight=LOOKAHEAD_WEIGHT):
+    """greedy 점수 + weight * (k + 1 - 가장 가까운 미제설 노드까지 홉 수) / (k + 1)
+
+    모든 후보를 배열로 한 번에 평가한다. 동점이면 먼저 나온 이웃.
+    """
+    actions = env.graph.neighbors[env.cur]
+    if not actions:
+        return None
+
+    cand = [a for a in actions if a not in env.node_tabu]
+    if not cand:
+        cand = actions
+
+    q = np.array([q_index.get(env, a) for a in cand], dtype=np.float64)
+    frontier = np.array([env.frontier[a] for a in cand], dtype=np.float64)
+    near = hops.nearest(cand, env.active)
+    val = q + FRONTIER_WEIGHT * frontier + weight * (hops.k + 1 - near) / (hops.k + 1)
+    return cand[int(np.argmax(val))]
+
+
+def make_policy(policy, graph, k=LOOKAHEAD_HOPS):
+    """정책 이름 -> select(env, q_index) 함수"""
+    if policy in (None, 'greedy'):
+        return select_action
+    if policy == 'lookahead':
+        hops = graph.hop_table(k)
+        return lambda env, q_index: select_action_lookahead(env, q_index, hops)
+    raise ValueError(f"알 수 없는 정책입니다: {policy} (가능: {', '.join(POLICIES)})")
+
+
+def run_policy(graph, q_index, start, select, step_limit=400):
+    """한 기지에서 정책을 끝까지 실행 -> (스텝 수, 스텝별 누적 제설 엣지 수)"""
+    env = CompiledSnowEnv(graph, start, step_limit=step_limit)
+    plowed = []
+    for _ in range(step_limit):
+        nxt = select(env, q_index)
+        if nxt is None:
+            break
+        env.step(nxt)
+        plowed.append(graph.n_edges - env.remaining)
+        if env.remaining == 0:
+            break
+    return env.t, plowed
+
+
+def _bench(args):
+    from services.graph_snapshot import GraphSnapshot
+    from services.local_graph import extract_subgraph, nearest_node
+
+    snapshot = GraphSnapshot.load(args.snapshot)
+    Q = {}
+    if args.model:
+        with open(args.model, 'rb') as f:
+            Q = pickle.load(f)['Q']
+    rng = random.Random(args.seed)
+    starts = [rng.randrange(snapshot.n_nodes) for _ in range(args.bases)]
+
+    results = {policy: [] for policy in POLICIES}
+    for i in starts:
+        lat, lng = float(snapshot.node_y[i]), float(snapshot.node_x[i])
+        G = extract_subgraph(snapshot, lat, lng, dist=args.dist)
+        graph = CompiledGraph(*inference_tables(G))
+        q_index = graph.compile_q(Q)
+        start = graph.node_id[nearest_node(G, lat, lng)]
+        for policy in POLICIES:
+            select = make_policy(policy, graph, args.hops)
+            started = time.perf_counter()
+            steps, plowed = run_policy(graph, q_index, start, select, args.steps)
+            elapsed = time.perf_counter() - started
+            results[policy].append((steps, plowed, graph.n_edges, elapsed))
+
+    print(f"기지 {len(starts)}곳, 스텝 한도 {args.steps}, lookahead {args.hops}홉")
+    for policy, runs in results.items():
+        steps = sum(r[0] for r in runs)
+        coverage = np.mean([r[1][-1] / r[2] if r[1] and r[2] else 0.0 for r in runs])
+        per_step = np.mean([r[1][-1] / r[0] if r[0] else 0.0 for r in runs])
+        # 스텝 100/200/... 시점의 평균 커버리지
+        marks = list(range(100, args.steps + 1, 100))
+        curve = [np.mean([r[1][min(m, len(r[1])) - 1] / r[2] if r[1] and r[2] else 0.0 for r in runs])
+                 for m in marks]
+        us = sum(r[3] for r in runs) / max(steps, 1) * 1e6
+        print(f"   {policy:<10} 최종 커버리지 {coverage:6.1%}  스텝당 제설 엣지 {per_step:5.3f}  "
+              f"스텝당 {us:7.1f}us  "
+              + '  '.join(f"@{m}:{c:5.1%}" for m, c in zip(marks, curve)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m services.plow_engine', description='제설 경로 추론 엔진 도구')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_bench = sub.add_parser('bench', help='정책별 스텝당 커버리지/시간 비교')
+    p_bench.add_argument('snapshot')
+    p_bench.add_argument('--model', help='q_table_{gu}.pkl (없으면 Q값 0)')
+    p_bench.add_argument('--bases', type=int, default=10)
+    p_bench.add_argument('--steps', type=int, default=400)
+    p_bench.add_argument('--hops', type=int, default=LOOKAHEAD_HOPS)
+    p_bench.add_argument('--dist', type=float, default=3500)
+    p_bench.add_argument('--seed', type=int, default=0)
+    p_bench.set_defaults(func=_bench)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
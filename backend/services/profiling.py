@@ -0,0 +1,74 @@
+"""
+요청 단위 샘플링 프로파일러
+
+요청을 처리하는 스레드의 호출 스택을 interval마다 다른 스레드에서 읽어(sys._current_frames)
+접힌 스택(folded) 형식으로 센다. 계측 코드를 넣지 않으므로 요청 처리 자체의 부담이 거의 없고,
+결과 파일은 flamegraph.pl / speedscope에 그대로 넣을 수 있다.
+
+  with StackSampler() as sampler:
+      ...
+  sampler.dump('profiles/find_safe_route.folded')
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+DEFAULT_INTERVAL = 0.005
+MAX_DEPTH = 128
+
+
+class StackSampler:
+    def __init__(self, thread_id=None, interval=DEFAULT_INTERVAL):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self._started
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None and len(names) < MAX_DEPTH:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+
+    def folded(self):
+        """'바깥;...;안쪽 횟수' 줄들 (많이 잡힌 스택 먼저)"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def dump(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.folded())
+        return path
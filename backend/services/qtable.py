@@ -0,0 +1,214 @@
+"""
+Q-table 압축 바이너리 포맷 (.qtab)
+
+models/q_table_{gu}.pkl의 {((node, unplowed), action): value} 딕셔너리를
+(node, unplowed 해시, action) 정렬 정수 배열 + float64 값 배열로 바꿔
+스냅샷과 같은 컨테이너 포맷으로 저장한다. 로드는 mmap이라 거의 즉시 끝나고
+pickle을 풀지 않으므로 안전하다.
+
+unplowed 해시는 unplowed mod (2^61 - 1)로, services.plow_engine이 스텝마다
+증분 갱신하는 상태 해시와 같은 값이다. 해시가 같은 다른 상태와 구분하도록
+unplowed mod (2^31 - 1) 검증 값을 함께 저장하고, 해시가 맞는 상태에서만 비교한다
+(plow_engine.QIndex가 해시 일치 시 상태 정수를 비교하는 것과 같은 역할).
+
+  python -m services.qtable convert models/q_table_gangnam.pkl
+  python -m services.qtable convert --all models
+"""
+import argparse
+import gc
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from services.graph_snapshot import read_container, write_container
+
+_HASH_MOD = sys.hash_info.modulus
+_CHECK_MOD = (1 << 31) - 1
+QTABLE_SUFFIX = '.qtab'
+# 검증 값(checks)과 float64 값이 들어간 포맷 (이전 파일은 다시 변환)
+QTABLE_FORMAT = 2
+
+
+def qtable_path(pkl_path):
+    return os.path.splitext(pkl_path)[0] + QTABLE_SUFFIX
+
+
+def _source_fingerprint(path):
+    st = os.stat(path)
+    return {'file': os.path.basename(path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def compact_arrays(Q):
+    """Q 딕셔너리 -> (node, state_hash, action) 순 정렬 배열들"""
+    nodes, hashes, checks, actions, values = [], [], [], [], []
+    for key, value in Q.items():
+        try:
+            (node, unplowed), action = key
+            node, action = int(node), int(action)
+        except (TypeError, ValueError):
+            continue
+        # QIndex와 같은 기준: 상태는 0 이상의 정수만
+        if not isinstance(unplowed, (int, np.integer)) or unplowed < 0:
+            continue
+        unplowed = int(unplowed)
+        nodes.append(node)
+        hashes.append(unplowed % _HASH_MOD)
+        checks.append(unplowed % _CHECK_MOD)
+        actions.append(action)
+        values.append(value)
+
+    nodes = np.array(nodes, dtype=np.int64)
+    hashes = np.array(hashes, dtype=np.uint64)
+    checks = np.array(checks, dtype=np.uint64)
+    actions = np.array(actions, dtype=np.int64)
+    values = np.array(values, dtype=np.float64)
+    order = np.lexsort((actions, hashes, nodes))
+    return {'nodes': nodes[order], 'hashes': hashes[order], 'checks': checks[order],
+            'actions': actions[order], 'values': values[order]}
+
+
+class CompactQTable:
+    def __init__(self, meta, arrays):
+        self.meta = meta
+        self.nodes = arrays['nodes']
+        self.hashes = arrays['hashes']
+        self.checks = arrays.get('checks')
+        self.actions = arrays['actions']
+        self.values = arrays['values']
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @classmethod
+    def load(cls, path):
+        meta, arrays = read_container(path)
+        if meta.get('kind') != 'qtable':
+            raise ValueError(f"Q-table 파일이 아닙니다: {path}")
+        return cls(meta, arrays)
+
+    @classmethod
+    def convert(cls, pkl_path, out_path=None):
+        with open(pkl_path, 'rb') as f:
+            Q = pickle.load(f)['Q']
+        arrays = compact_arrays(Q)
+        meta = {'kind': 'qtable', 'format': QTABLE_FORMAT, 'source': _source_fingerprint(pkl_path),
+                'entries': int(len(arrays['nodes']))}
+        out_path = out_path or qtable_path(pkl_path)
+        write_container(out_path, meta, arrays)
+        return out_path
+
+    def is_current(self, pkl_path):
+        """원본 pkl이 없거나, 현재 포맷으로 변환된 뒤 원본이 바뀌지 않았는지"""
+        if not os.path.exists(pkl_path):
+            return True
+        return self.meta.get('format') == QTABLE_FORMAT and self.meta.get('source') == _source_fingerprint(pkl_path)
+
+    def index_for(self, graph):
+        return CompactQIndex(self, graph)
+
+
+class CompactQIndex:
+    """지역 그래프 노드별 행 범위만 들고, 값은 mmap 정렬 배열에서 이분 탐색으로 조회
+
+    plow_engine.QIndex와 같은 get(env, action) 인터페이스. 표는 (node, 해시, action) 순으로 정렬돼 있으므로
+    노드 행 범위 안에서 해시, 그 안에서 action을 찾고, 해시가 맞는 행이 있을 때만 상태 정수를 복원해
+    검증 값(unplowed mod 2^31-1)까지 비교한다.
+    """
+
+    def __init__(self, table, graph):
+        # memmap 서브클래스를 거치지 않는 일반 ndarray 뷰 (복사 없음)
+        self._hashes = np.asarray(table.hashes)
+        self._checks = np.asarray(table.checks) if table.checks is not None else None
+        self._actions = np.asarray(table.actions)
+        self._values = np.asarray(table.values)
+        self._osmids = [int(n) for n in graph.nodes]
+        nodes = np.asarray(table.nodes)
+        osmids = np.array(self._osmids, dtype=np.int64)
+        self._lo = np.searchsorted(nodes, osmids, side='left').tolist()
+        self._hi = np.searchsorted(nodes, osmids, side='right').tolist()
+        self._last = (None, 0, 0, None)  # 마지막으로 찾은 (상태 키, 시작 행, 끝 행, 검증 값)
+
+    def __len__(self):
+        """이 그래프 노드에서 시작하는 항목 수"""
+        return sum(hi - lo for lo, hi in zip(self._lo, self._hi))
+
+    def _state_rows(self, env):
+        node, state_hash = env.cur, env.state_hash
+        key, lo, hi, check = self._last
+        # 해시가 같은 다른 상태와 검증 값을 섞지 않도록 환경과 스텝까지 키에 포함
+        if key != (id(env), env.t, node, state_hash):
+            lo, hi = self._lo[node], self._hi[node]
+            if lo < hi:
+                # 파이썬 int 그대로 넘기면 float64로 비교돼 61비트 해시가 뭉개진다
+                lo += int(self._hashes[lo:hi].searchsorted(np.uint64(state_hash)))
+                end = lo
+                # 한 상태의 행은 그 노드의 행동 수(몇 개)뿐이라 순차 확인
+                while end < hi and self._hashes.item(end) == state_hash:
+                    end += 1
+                hi = end
+            # 해시가 맞는 상태에서만 상태 정수를 복원 (QIndex와 같음)
+            check = env.unplowed % _CHECK_MOD if lo < hi and self._checks is not None else None
+            # 한 스텝의 후보 행동들은 같은 상태로 연달아 조회된다
+            self._last = ((id(env), env.t, node, state_hash), lo, hi, check)
+        return lo, hi, check
+
+    def get(self, env, action):
+        lo, hi, check = self._state_rows(env)
+        target = self._osmids[action]
+        for row in range(lo, hi):
+            if self._actions.item(row) == target and (check is None or self._checks.item(row) == check):
+                return float(self._values.item(row))
+        return 0.0
+
+
+def _measure(load):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    obj = load()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, elapsed, peak
+
+
+def _load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)['Q']
+
+
+def _convert(args):
+    paths = list(args.paths)
+    if args.all:
+        paths = [os.path.join(d, name) for d in args.paths for name in sorted(os.listdir(d))
+                 if name.startswith('q_table_') and name.endswith('.pkl')]
+    for path in paths:
+        out = CompactQTable.convert(path)
+        table, qtab_s, qtab_mem = _measure(lambda: CompactQTable.load(out))
+        Q, pkl_s, pkl_mem = _measure(lambda: _load_pickle(path))
+        print(f"✅ {out}: 항목 {len(table)}개 (원본 {len(Q)}개)")
+        del Q
+        print(f"   - 로드 시간  pkl {pkl_s * 1000:9.1f}ms  ->  qtab {qtab_s * 1000:7.2f}ms")
+        print(f"   - 힙 메모리  pkl {pkl_mem / 2**20:9.1f}MB  ->  qtab {qtab_mem / 2**20:7.2f}MB "
+              f"(+ mmap 파일 {os.path.getsize(out) / 2**20:.1f}MB, 프로세스 간 공유)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m services.qtable', description='Q-table 압축 포맷 도구')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_convert = sub.add_parser('convert', help='q_table_{gu}.pkl -> q_table_{gu}.qtab')
+    p_convert.add_argument('paths', nargs='+', help='pkl 파일 (--all이면 모델 폴더)')
+    p_convert.add_argument('--all', action='store_true', help='폴더 안의 q_table_*.pkl 전부 변환')
+    p_convert.set_defaults(func=_convert)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import os
+import numpy as np
+import pandas as pd
+
+# (엣지 속성 이름, CSV 컬럼 이름) — 스냅샷/엔진의 점수 배열 열 순서와 동일
+SCORE_COLUMNS = [
+    ('risk_score', 'final_risk_score'),
+    ('slope_score', 'norm_slope_score'),
+    ('freeze_score', 'norm_freezing_weak_score'),
+    ('accident_score', 'norm_accident_score'),
+    ('population_score', 'norm_population_risk'),
+    ('raw_score', 'original_raw_score'),
+]
+SCORE_ATTRS = [attr for attr, _ in SCORE_COLUMNS]
+CSV_COLUMNS = [col for _, col in SCORE_COLUMNS]
+
+
+class ScoreTable:
+    """road_id 오름차순 정렬 배열 + (R, 6) 점수 행렬"""
+
+    def __init__(self, road_ids, values):
+        self.road_ids = road_ids
+        self.values = values
+
+    def __len__(self):
+        return len(self.road_ids)
+
+    def lookup(self, osmids):
+        """osmid 배열 -> (테이블 행 번호, 존재 여부)"""
+        osmids = np.asarray(osmids, dtype=np.int64)
+        if len(self.road_ids) == 0:
+            return np.zeros(len(osmids), dtype=np.int64), np.zeros(len(osmids), dtype=bool)
+        pos = np.minimum(np.searchsorted(self.road_ids, osmids), len(self.road_ids) - 1)
+        return pos, self.road_ids[pos] == osmids
+
+    def rows(self, road_ids):
+        """road_id별 현재 점수 행 복사본 (테이블에 없는 road_id는 0점 행)"""
+        pos, found = self.lookup(road_ids)
+        rows = np.zeros((len(pos), len(SCORE_COLUMNS)), dtype=np.float64)
+        if len(self.road_ids):
+            rows[found] = self.values[pos[found]]
+        return rows
+
+    def with_rows(self, road_ids, rows):
+        """road_id 행을 덮어쓰거나 추가한 새 테이블 (원본은 그대로)"""
+        road_ids = np.asarray(road_ids, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.float64)
+        if len(self.road_ids) == 0:
+            # 빈 테이블(CSV 없이 기동): 중복 road_id는 마지막 행 사용
+            new_ids, last = np.unique(road_ids[::-1], return_index=True)
+            return ScoreTable(new_ids, rows[::-1][last])
+        pos, found = self.lookup(road_ids)
+        values = self.values.copy()
+        values[pos[found]] = rows[found]
+        if found.all():
+            return ScoreTable(self.road_ids, values)
+        new_ids, first = np.unique(road_ids[~found], return_index=True)
+        at = np.searchsorted(self.road_ids, new_ids)
+        return ScoreTable(np.insert(self.road_ids, at, new_ids),
+                          np.insert(values, at, rows[~found][first], axis=0))
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros(0, dtype=np.int64), np.zeros((0, len(SCORE_COLUMNS)), dtype=np.float64))
+
+
+def load_score_table(csv_path):
+    """CSV를 ScoreTable로 로드 (road_id 중복 시 최고 위험도 행 사용)"""
+    score_df = pd.read_csv(csv_path, usecols=['road_id'] + CSV_COLUMNS)
+    score_df = score_df.sort_values('final_risk_score', ascending=False).drop_duplicates(['road_id'])
+    score_df = score_df.sort_values('road_id')
+    return ScoreTable(
+        score_df['road_id'].to_numpy(dtype=np.int64),
+        score_df[CSV_COLUMNS].to_numpy(dtype=np.float64),
+    )
+
+
+def score_fingerprint(csv_path):
+    """스냅샷에 저장된 점수가 현재 CSV와 같은지 판별하기 위한 파일 지문"""
+    if not csv_path or not os.path.exists(csv_path):
+        return None
+    st = os.stat(csv_path)
+    return {'file': os.path.basename(csv_path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def map_scores(osmid_offsets, osmid_values, table):
+    """엣지별 osmid 목록(CSR)을 점수 테이블과 조인해 엣지별 최댓값 (E, 6) 배열로 반환
+
+    테이블에 없는 osmid만 가진 엣지는 0점.
+    """
+    osmid_offsets = np.asarray(osmid_offsets)
+    n_edges = len(osmid_offsets) - 1
+    scores = np.zeros((n_edges, len(SCORE_COLUMNS)), dtype=np.float64)
+    if len(table) == 0 or len(osmid_values) == 0:
+        return scores
+
+    pos, found = table.lookup(osmid_values)
+    values = np.where(found[:, None], table.values[pos], -np.inf)
+
+    nonempty = np.flatnonzero(np.diff(osmid_offsets) > 0)
+    reduced = np.maximum.reduceat(values, osmid_offsets[nonempty], axis=0)
+    scores[nonempty] = np.where(np.isneginf(reduced), 0.0, reduced)
+    return scores
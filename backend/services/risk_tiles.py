@@ -0,0 +1,409 @@
+"""
+도시 전체 위험도 히트맵 타일 (z/x/y PNG)
+
+엣지별 risk_score / freeze_score / slope_score를 웹 메르카토르 픽셀로 래스터화해
+<cache_dir>/<layer>/<z>/<x>/<y>.png 로 미리 그려 둔다. 픽셀 값은 지나가는 엣지 점수의 최댓값이고,
+도로가 잘 보이도록 3x3 최댓값 필터로 굵게 한 뒤 색상표로 칠한다. 필터는 이웃 타일의 1픽셀
+테두리까지 포함한 캔버스에서 적용하고 잘라내므로 타일 경계에 이음매가 생기지 않는다.
+요청 시에는 파일만 내려준다.
+
+점수가 바뀌면 바뀐 엣지가 (굵게 한 뒤) 닿는 타일만, 타일마다 그 타일에 닿는 선분만으로
+다시 그린다 (RouteFinder 점수 리스너).
+meta.json의 점수 지문이 현재 점수와 같으면 재시작 후에도 그대로 쓴다.
+
+  python -m services.risk_tiles render graph_seoul.snap --csv final_freezing_score.csv --out tiles
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from services.risk_scores import SCORE_ATTRS
+
+log = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+TILE_LAYERS = {
+    'risk': SCORE_ATTRS.index('risk_score'),
+    'freeze': SCORE_ATTRS.index('freeze_score'),
+    'slope': SCORE_ATTRS.index('slope_score'),
+}
+MIN_ZOOM, MAX_ZOOM = 11, 16
+# 한 번에 래스터화할 최대 샘플 수 (메모리 상한)
+_CHUNK_SAMPLES = 4_000_000
+# 타일 캔버스 테두리 (3x3 필터 반경)
+_HALO = 1
+# 점수 -> RGBA 색상표 기준점 (이 점수 미만은 투명)
+_RAMP = [
+    (20, (0, 170, 60, 70)),
+    (40, (255, 210, 0, 140)),
+    (60, (255, 120, 0, 190)),
+    (80, (220, 20, 20, 230)),
+    (100, (130, 0, 0, 255)),
+]
+
+
+def _color_table():
+    """점수 0~100 -> RGBA uint8 [101, 4]"""
+    stops = np.array([s for s, _ in _RAMP], dtype=np.float64)
+    colors = np.array([c for _, c in _RAMP], dtype=np.float64)
+    scores = np.arange(101, dtype=np.float64)
+    lut = np.stack([np.interp(scores, stops, colors[:, i]) for i in range(4)], axis=1)
+    lut[scores < stops[0]] = 0
+    return np.rint(lut).astype(np.uint8)
+
+
+_LUT = _color_table()
+
+
+def encode_png(rgba):
+    """(H, W, 4) uint8 -> PNG 바이트 (필터 없음, zlib 압축)"""
+    h, w, _ = rgba.shape
+    raw = np.zeros((h, w * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(h, w * 4)
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', w, h, 8, 6, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw.tobytes(), 6))
+            + chunk(b'IEND', b''))
+
+
+EMPTY_TILE = encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+
+
+def mercator(lng, lat):
+    """경위도 -> 웹 메르카토르 정규 좌표 (0~1)"""
+    lat = np.radians(np.clip(lat, -85.05112878, 85.05112878))
+    return (np.asarray(lng) + 180.0) / 360.0, (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0
+
+
+def score_digest(scores):
+    return hashlib.blake2b(np.ascontiguousarray(scores).tobytes(), digest_size=8).hexdigest()
+
+
+def _edge_segments(snapshot):
+    """엣지 선분 (x0, y0, x1, y1, 엣지) — geometry가 있으면 그 좌표열, 없으면 출발-도착 노드"""
+    n_geom = np.diff(snapshot.geom_offsets)
+    counts = np.where(n_geom > 0, n_geom, 2)
+    owner = np.repeat(np.arange(snapshot.n_edges), counts)
+    local = np.arange(owner.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    lng = np.empty(owner.size)
+    lat = np.empty(owner.size)
+    has = n_geom[owner] > 0
+    if has.any():
+        g = (snapshot.geom_offsets[owner] + local)[has]
+        lng[has], lat[has] = snapshot.geom_coords[g, 0], snapshot.geom_coords[g, 1]
+    node = np.where(local == 0, snapshot.edge_source[owner], snapshot.edge_target[owner])[~has]
+    lng[~has], lat[~has] = snapshot.node_x[node], snapshot.node_y[node]
+    x, y = mercator(lng, lat)
+    pair = np.flatnonzero(owner[:-1] == owner[1:]) if owner.size > 1 else np.zeros(0, dtype=np.int64)
+    return x[pair], y[pair], x[pair + 1], y[pair + 1], owner[pair]
+
+
+class RiskTileCache:
+    def __init__(self, snapshot, cache_dir='tiles', zooms=(MIN_ZOOM, MAX_ZOOM), layers=tuple(TILE_LAYERS)):
+        self.snapshot = snapshot
+        self.cache_dir = cache_dir
+        self.zooms = list(range(zooms[0], zooms[1] + 1))
+        self.layers = list(layers)
+        self.sx0, self.sy0, self.sx1, self.sy1, self.seg_edge = _edge_segments(snapshot)
+        self._seg_box = (np.minimum(self.sx0, self.sx1), np.maximum(self.sx0, self.sx1),
+                         np.minimum(self.sy0, self.sy1), np.maximum(self.sy0, self.sy1))
+        self.meta = self._read_meta()
+        self._pending = None
+        self._full = False
+        self._cond = threading.Condition()
+        self._worker = None
+        self._finder = None
+        self.last_update = None
+
+    # ---- 파일 ----
+    def tile_path(self, layer, z, x, y):
+        return os.path.join(self.cache_dir, layer, str(z), str(x), f"{y}.png")
+
+    def _meta_path(self):
+        return os.path.join(self.cache_dir, 'meta.json')
+
+    def _read_meta(self):
+        try:
+            with open(self._meta_path(), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, scores):
+        meta = {'graph': {'created': self.snapshot.meta.get('created'), 'n_edges': self.snapshot.n_edges},
+                'zooms': self.zooms, 'layers': self.layers, 'scores': score_digest(scores),
+                'updated_at': time.time()}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f"{self._meta_path()}.tmp{os.getpid()}"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path())
+        self.meta = meta
+
+    def is_current(self, scores):
+        """캐시된 타일이 이 그래프/줌/레이어/점수로 그려졌는지"""
+        return (self.meta.get('graph') == {'created': self.snapshot.meta.get('created'),
+                                           'n_edges': self.snapshot.n_edges}
+                and self.meta.get('zooms') == self.zooms and self.meta.get('layers') == self.layers
+                and self.meta.get('scores') == score_digest(scores))
+
+    # ---- 래스터화 ----
+    def _pixels(self, z, segs, values):
+        """선분들을 z 픽셀로 샘플링 -> (정렬된 고유 키, 키별 최댓값 [K, L])
+
+        키 = 타일 번호 << 16 | 타일 안 픽셀 번호 (타일 번호 = ty * 2^z + tx)
+        """
+        scale = TILE_SIZE * (1 << z)
+        keys, vals = [], []
+        x0, y0 = self.sx0[segs] * scale, self.sy0[segs] * scale
+        dx, dy = self.sx1[segs] * scale - x0, self.sy1[segs] * scale - y0
+        n = np.ceil(np.hypot(dx, dy)).astype(np.int64) + 1
+        ends = np.cumsum(n)
+        start = 0
+        while start < len(segs):
+            stop = max(int(np.searchsorted(ends, ends[start] - n[start] + _CHUNK_SAMPLES, side='right')), start + 1)
+            part = slice(start, stop)
+            counts = n[part]
+            owner = np.repeat(np.arange(stop - start), counts)
+            t = (np.arange(owner.size) - np.repeat(np.cumsum(counts) - counts, counts)) / np.maximum(counts - 1, 1)[owner]
+            px = np.clip((x0[part][owner] + dx[part][owner] * t).astype(np.int64), 0, scale - 1)
+            py = np.clip((y0[part][owner] + dy[part][owner] * t).astype(np.int64), 0, scale - 1)
+            key = ((((py >> 8) << z) + (px >> 8)) << 16) | ((py & 255) << 8) | (px & 255)
+            k, v = _reduce_max(key, values[self.seg_edge[segs[part]][owner]])
+            keys.append(k)
+            vals.append(v)
+            start = stop
+        if not keys:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, values.shape[1]), dtype=values.dtype)
+        return _reduce_max(np.concatenate(keys), np.concatenate(vals))
+
+    def _layer_values(self, scores):
+        cols = [TILE_LAYERS[layer] for layer in self.layers]
+        return np.clip(np.rint(np.asarray(scores)[:, cols]), 0, 100).astype(np.uint8)
+
+    def _halo_tiles(self, z, keys):
+        """keys 픽셀이 굵게 그려져 닿는 타일 번호 (자기 타일 + 경계 픽셀이 넘어가는 이웃 타일)"""
+        n = 1 << z
+        tiles = keys >> 16
+        tx, ty = tiles & (n - 1), tiles >> z
+        lx, ly = keys & 255, (keys >> 8) & 255
+        near = {-1: (lx < _HALO, ly < _HALO), 1: (lx >= TILE_SIZE - _HALO, ly >= TILE_SIZE - _HALO)}
+        out = [tiles]
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                if not dx and not dy:
+                    continue
+                m = (tx + dx >= 0) & (tx + dx < n) & (ty + dy >= 0) & (ty + dy < n)
+                if dx:
+                    m &= near[dx][0]
+                if dy:
+                    m &= near[dy][1]
+                out.append(((ty[m] + dy) << z) + tx[m] + dx)
+        return np.unique(np.concatenate(out))
+
+    def _segments_for(self, z, tiles):
+        """tiles(타일 번호 배열)의 테두리 포함 범위에 닿을 수 있는 선분 번호"""
+        n, scale = 1 << z, TILE_SIZE << z
+        # 샘플 좌표 반올림 오차까지 고려해 테두리보다 1픽셀 더 넓게
+        margin = _HALO + 1
+        x_min, x_max, y_min, y_max = self._seg_box
+        tx0 = (np.floor(x_min * scale).astype(np.int64) - margin) >> 8
+        tx1 = (np.floor(x_max * scale).astype(np.int64) + margin) >> 8
+        ty0 = (np.floor(y_min * scale).astype(np.int64) - margin) >> 8
+        ty1 = (np.floor(y_max * scale).astype(np.int64) + margin) >> 8
+        dirty_x, dirty_y = tiles & (n - 1), tiles >> z
+        cand = np.flatnonzero((tx1 >= dirty_x.min()) & (tx0 <= dirty_x.max())
+                              & (ty1 >= dirty_y.min()) & (ty0 <= dirty_y.max()))
+        # 후보 선분을 (선분, 타일) 쌍으로 펼쳐 실제 대상 타일에 닿는 선분만
+        w = tx1[cand] - tx0[cand] + 1
+        counts = w * (ty1[cand] - ty0[cand] + 1)
+        owner = np.repeat(np.arange(cand.size), counts)
+        local = np.arange(owner.size) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_tiles = ((ty0[cand][owner] + local // w[owner]) << z) + tx0[cand][owner] + local % w[owner]
+        return np.unique(cand[owner[np.isin(pair_tiles, tiles)]])
+
+    def _write_tiles(self, z, keys, vals, tiles):
+        """tiles(타일 번호 배열)를 keys/vals 픽셀로 그려 PNG 저장. 쓴 타일 수 반환
+
+        이웃 타일 픽셀을 _HALO만큼 붙인 캔버스에서 굵게 한 뒤 잘라낸다.
+        """
+        n = 1 << z
+        size = TILE_SIZE + 2 * _HALO
+        key_tiles = keys >> 16
+        starts = np.flatnonzero(np.r_[True, key_tiles[1:] != key_tiles[:-1]]) if keys.size else np.zeros(0, dtype=np.int64)
+        ends = np.append(starts[1:], keys.size)
+        spans = dict(zip(key_tiles[starts].tolist(), zip(starts.tolist(), ends.tolist())))
+        written = 0
+        for tile in tiles.tolist():
+            ty, tx = tile >> z, tile & (n - 1)
+            canvas = np.zeros((len(self.layers), size, size), dtype=np.uint8)
+            for dy in (-1, 0, 1):
+                for dx in (-1, 0, 1):
+                    if not (0 <= tx + dx < n and 0 <= ty + dy < n):
+                        continue
+                    span = spans.get(((ty + dy) << z) + tx + dx)
+                    if span is None:
+                        continue
+                    pix = keys[span[0]:span[1]]
+                    py = ((pix >> 8) & 255) + _HALO + dy * TILE_SIZE
+                    px = (pix & 255) + _HALO + dx * TILE_SIZE
+                    m = (px >= 0) & (px < size) & (py >= 0) & (py < size)
+                    canvas[:, py[m], px[m]] = vals[span[0]:span[1]][m].T
+            canvas = _dilate(canvas)[:, _HALO:-_HALO, _HALO:-_HALO]
+            for i, layer in enumerate(self.layers):
+                img = canvas[i]
+                path = self.tile_path(layer, z, tx, ty)
+                if img.max() < _RAMP[0][0]:
+                    if os.path.exists(path):
+                        os.remove(path)
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.tmp{os.getpid()}"
+                with open(tmp, 'wb') as f:
+                    f.write(encode_png(_LUT[img]))
+                os.replace(tmp, path)
+            written += 1
+        return written
+
+    def render_all(self, scores):
+        """모든 줌의 타일을 새로 그림. {'tiles': 타일 수, 'elapsed_ms': ...}"""
+        started = time.perf_counter()
+        values = self._layer_values(scores)
+        segs = np.arange(len(self.seg_edge))
+        written = 0
+        for z in self.zooms:
+            keys, vals = self._pixels(z, segs, values)
+            written += self._write_tiles(z, keys, vals, self._halo_tiles(z, keys))
+        self._write_meta(scores)
+        return {'tiles': written, 'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)}
+
+    def update(self, scores, edges):
+        """edges(엣지 인덱스)가 닿는 타일만, 타일마다 그 타일에 닿는 선분만으로 다시 그림"""
+        started = time.perf_counter()
+        values = self._layer_values(scores)
+        changed = np.flatnonzero(np.isin(self.seg_edge, np.asarray(edges, dtype=np.int64)))
+        written = 0
+        if changed.size:
+            for z in self.zooms:
+                dirty = self._halo_tiles(z, self._pixels(z, changed, values)[0])
+                keys, vals = self._pixels(z, self._segments_for(z, dirty), values)
+                written += self._write_tiles(z, keys, vals, dirty)
+        self._write_meta(scores)
+        return {'tiles': written, 'edges': int(len(edges)),
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)}
+
+    # ---- 백그라운드 갱신 ----
+    def attach(self, finder):
+        """RouteFinder 점수 변경을 받아 백그라운드에서 갱신. 캐시가 현재 점수와 다르면 전체 렌더링"""
+        finder.add_score_listener(lambda state, edges: self.schedule(edges))
+        self._finder = finder
+        self._worker = threading.Thread(target=self._run, name='risk-tiles', daemon=True)
+        self._worker.start()
+        if not self.is_current(finder.state.scores):
+            self.schedule(None)
+
+    def schedule(self, edges):
+        """edges=None이면 전체, 아니면 해당 엣지 타일만 (여러 번 들어오면 합쳐서 한 번에)"""
+        with self._cond:
+            if edges is None:
+                self._full = True
+            else:
+                self._pending = set() if self._pending is None else self._pending
+                self._pending.update(np.asarray(edges).tolist())
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._full and not self._pending:
+                    self._cond.wait()
+                full, edges = self._full, self._pending
+                self._full, self._pending = False, None
+            scores = self._finder.state.scores
+            try:
+                if full:
+                    report = self.render_all(scores)
+                    log.info("🗺️ [RiskTiles] 전체 타일 %d개 생성 (%.0fms)", report['tiles'], report['elapsed_ms'])
+                else:
+                    report = self.update(scores, sorted(edges))
+                self.last_update = {**report, 'full': full, 'at': time.time()}
+            except Exception as e:
+                log.exception("❌ [오류] 위험도 타일 갱신 실패: %s", e)
+
+    def stats(self):
+        with self._cond:
+            pending = self._full or bool(self._pending)
+        # 갱신을 맡지 않은 프로세스(prefork 워커)는 다른 프로세스가 쓴 meta.json을 본다
+        meta = self.meta if self._worker is not None else self._read_meta()
+        return {'cache_dir': self.cache_dir, 'zooms': self.zooms, 'layers': self.layers,
+                'scores': meta.get('scores'), 'updated_at': meta.get('updated_at'), 'pending': pending,
+                'renderer': self._worker is not None, 'last_update': self.last_update}
+
+
+def _reduce_max(keys, values):
+    order = np.argsort(keys, kind='stable')
+    keys, values = keys[order], values[order]
+    if not keys.size:
+        return keys, values
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.maximum.reduceat(values, starts, axis=0)
+
+
+def _dilate(img):
+    """마지막 두 축(세로, 가로)에 대한 3x3 최댓값 필터"""
+    out = img.copy()
+    np.maximum(out[..., 1:, :], img[..., :-1, :], out=out[..., 1:, :])
+    np.maximum(out[..., :-1, :], img[..., 1:, :], out=out[..., :-1, :])
+    row = out.copy()
+    np.maximum(out[..., 1:], row[..., :-1], out=out[..., 1:])
+    np.maximum(out[..., :-1], row[..., 1:], out=out[..., :-1])
+    return out
+
+
+def _render(args):
+    from services.graph_snapshot import GraphSnapshot
+    from services.risk_scores import load_score_table, map_scores
+
+    snapshot = GraphSnapshot.load(args.snapshot)
+    scores = snapshot.edge_scores
+    if args.csv:
+        scores = map_scores(snapshot.osmid_offsets, snapshot.osmid_values, load_score_table(args.csv))
+    cache = RiskTileCache(snapshot, args.out, (args.min_zoom, args.max_zoom))
+    if cache.is_current(scores) and not args.force:
+        print(f"✅ {args.out}: 이미 최신입니다.")
+        return
+    report = cache.render_all(scores)
+    print(f"✅ {args.out}: 타일 {report['tiles']}개 ({len(cache.layers)}개 레이어), {report['elapsed_ms'] / 1000:.1f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m services.risk_tiles', description='위험도 히트맵 타일 도구')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_render = sub.add_parser('render', help='모든 줌의 타일을 미리 생성')
+    p_render.add_argument('snapshot')
+    p_render.add_argument('--csv', help='점수 CSV (미지정 시 스냅샷에 저장된 점수)')
+    p_render.add_argument('--out', default='tiles')
+    p_render.add_argument('--min-zoom', type=int, default=MIN_ZOOM)
+    p_render.add_argument('--max-zoom', type=int, default=MAX_ZOOM)
+    p_render.add_argument('--force', action='store_true')
+    p_render.set_defaults(func=_render)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
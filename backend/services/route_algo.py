@@ -1,158 +1,604 @@
 import osmnx as ox
-import networkx as nx
-import pandas as pd
+import numpy as np
+import json
+import logging
 import os
+import threading
+import time
+from collections import OrderedDict
+
+from services.cost_profiles import PROFILE_PREFIX
+from services.graph_snapshot import GraphSnapshot
+from services.metrics import observe_stage, timed
+from services.risk_scores import CSV_COLUMNS, SCORE_ATTRS, ScoreTable, load_score_table, map_scores, score_fingerprint
+from services.route_engine import MODES, RouteEngine
+from services.route_cache import RouteCache, SqliteRouteStore
+from services.route_index import LandmarkIndex, index_path
+from services.spatial_index import SpatialIndex
+
+log = logging.getLogger(__name__)
+
+class RiskState:
+    """한 시점의 위험 점수와 그로부터 컴파일된 모드별 비용 (교체만 하고 수정하지 않음)
+
+    version은 CSV 전체 갱신마다, revision은 전체/부분 갱신 모두에서 1씩 증가한다.
+    """
+
+    def __init__(self, version, table, scores, costs, landmark_modes, source=None, revision=0):
+        self.version = version
+        self.revision = revision
+        self.table = table
+        self.scores = scores
+        self.costs = costs
+        self.landmark_modes = frozenset(landmark_modes)
+        self.source = source
+        self.loaded_at = time.time()
+
+
+class _CompiledProfile:
+    """RouteFinder가 보관하는 비용 프로파일 컴파일 결과 (점수 revision이 같은 동안 재사용)"""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.revision = None
+        self.costs = None
+        self.uses = 0
+        self.building = False
+        self.landmarks = None
+        self.landmark_costs = None
+
 
 class RouteFinder:
-    def __init__(self, csv_path='final_freezing_score.csv', region="Seoul, South Korea"):
-        print(f"🗺️ [RouteFinder] '{region}' 지도 데이터와 상세 위험 점수 로딩 중...")
+    def __init__(self, csv_path='final_freezing_score.csv', region="Seoul, South Korea", snapshot_path='graph_seoul.snap',
+                 algorithm=None, landmark_count=16, cache_size=4096, cache_ttl=600.0, cache_db=None,
+                 profile_cache=32, profile_alt_after=3):
+        log.info("🗺️ [RouteFinder] '%s' 지도 데이터와 상세 위험 점수 로딩 중...", region)
+        load_started = time.perf_counter()
         
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         full_csv_path = os.path.join(base_dir, csv_path)
+        full_snapshot_path = os.path.join(base_dir, snapshot_path) if snapshot_path else None
         
+        self.csv_path = full_csv_path
         if os.path.exists(full_csv_path):
-            self.score_df = pd.read_csv(full_csv_path)
-            self.score_df = self.score_df.sort_values('final_risk_score', ascending=False).drop_duplicates(['road_id'])
-            self.risk_map = self.score_df.set_index('road_id')[
-                ['final_risk_score', 'norm_slope_score', 'norm_freezing_weak_score', 'norm_accident_score', 'norm_population_risk', 'original_raw_score']
-            ].to_dict('index')
-            
-            print(f"   - 결빙 데이터 {len(self.risk_map)}개 로드 완료")
+            score_table = load_score_table(full_csv_path)
+            log.info("   - 결빙 데이터 %d개 로드 완료", len(score_table))
         else:
-            print(f"⚠️ [경고] '{csv_path}' 파일을 찾을 수 없습니다.")
-            self.risk_map = {}
+            log.warning("⚠️ [경고] '%s' 파일을 찾을 수 없습니다.", csv_path)
+            score_table = ScoreTable.empty()
 
+        self.state = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._road_edges = None
+        self._score_listeners = []
+        self.cache = None
+        if cache_size:
+            self.cache = RouteCache(cache_size, cache_ttl, SqliteRouteStore(cache_db) if cache_db else None)
+        # 비용 프로파일 모드 이름 -> _CompiledProfile (profile_alt_after번 쓰이면 전용 ALT 표 생성)
+        self.profile_cache = profile_cache
+        self.profile_alt_after = profile_alt_after
+        self._profiles = OrderedDict()
+        self._profile_lock = threading.Lock()
+        self._G = None
+        self._G_lock = threading.Lock()
+        self.snapshot = None
+        self.engine = None
+        self.spatial = None
+        self.algorithm = algorithm
+        self.landmark_count = landmark_count
+        self.landmarks = None
+        self.index_path = index_path(full_snapshot_path) if full_snapshot_path else None
         try:
-            self.G = ox.graph_from_place(region, network_type="drive")
-            print(f"   - 도로망 그래프 로드 완료 (노드 {len(self.G.nodes)}개)")
-            self._map_scores_to_graph()
+            if full_snapshot_path and os.path.exists(full_snapshot_path):
+                self.snapshot = GraphSnapshot.load(full_snapshot_path)
+                log.info("   - 그래프 스냅샷 로드 완료 (노드 %d개, %s)", self.snapshot.n_nodes, snapshot_path)
+            else:
+                # 스냅샷이 없으면 기존처럼 OSM에서 받아 메모리 스냅샷으로 변환
+                self._G = ox.graph_from_place(region, network_type="drive")
+                self.snapshot = GraphSnapshot.from_graph(self._G, region=region)
+                log.info("   - 도로망 그래프 로드 완료 (노드 %d개)", len(self._G.nodes))
+            self.engine = RouteEngine(self.snapshot)
+            self.spatial = SpatialIndex(self.snapshot)
+            scores = self._initial_scores(full_csv_path, score_table)
+            costs = self.engine.compile_costs(scores)
+            self.state = RiskState(1, score_table, scores, costs, self._load_landmarks(costs),
+                                   score_fingerprint(full_csv_path))
+            if self._G is not None:
+                self._map_scores_to_graph()
         except Exception as e:
-            print(f"❌ [오류] 지도 로딩 실패: {e}")
-            self.G = None
+            log.exception("❌ [오류] 지도 로딩 실패: %s", e)
+            self.snapshot = None
+            self.engine = None
+            self.spatial = None
+            self.state = None
+            self._G = None
         
-        print("✅ [RouteFinder] 준비 완료!")
-
-    def _map_scores_to_graph(self):
-        """그래프 엣지에 모든 점수 매핑"""
-        for u, v, k, data in self.G.edges(keys=True, data=True):
-            osm_ids = data.get('osmid', [])
-            scores = {
-                'risk': 0.0, 'slope': 0.0, 'freeze': 0.0, 'accident': 0.0, 
-                'population': 0.0, 'raw': 0.0 
-            }
-            
-            target_ids = []
-            if isinstance(osm_ids, list):
-                target_ids = [int(i) for i in osm_ids if isinstance(i, (int, str)) and int(i) in self.risk_map]
-            elif isinstance(osm_ids, (int, str)) and int(osm_ids) in self.risk_map:
-                target_ids = [int(osm_ids)]
-
-            if target_ids:
-                scores['risk'] = max([self.risk_map[i]['final_risk_score'] for i in target_ids])
-                scores['slope'] = max([self.risk_map[i]['norm_slope_score'] for i in target_ids])
-                scores['freeze'] = max([self.risk_map[i]['norm_freezing_weak_score'] for i in target_ids])
-                scores['accident'] = max([self.risk_map[i]['norm_accident_score'] for i in target_ids])
-                scores['population'] = max([self.risk_map[i]['norm_population_risk'] for i in target_ids])
-                scores['raw'] = max([self.risk_map[i]['original_raw_score'] for i in target_ids])
-
-            data['risk_score'] = float(scores['risk'])
-            data['slope_score'] = float(scores['slope'])
-            data['freeze_score'] = float(scores['freeze'])
-            data['accident_score'] = float(scores['accident'])
-            data['population_score'] = float(scores['population'])
-            data['raw_score'] = float(scores['raw'])
-
-    def _get_dist(self, node_id, target_lat, target_lng):
-        node = self.G.nodes[node_id]
-        return (node['y'] - target_lat)**2 + (node['x'] - target_lng)**2
-
-    def find_path(self, start_lat, start_lng, end_lat, end_lng, mode='fast'):
-        if not self.G: raise Exception("지도 데이터가 로드되지 않았습니다.")
-
-        def weight_function(u, v, d):
-            length = d.get('length', 10)
-            risk = d.get('risk_score', 0)
-            if mode == 'safe':
-                if risk >= 80: return length * 1000 
-                if risk >= 60: return length * 100
-            return length
+        load_s = time.perf_counter() - load_started
+        observe_stage('map_load', load_s)
+        log.info("✅ [RouteFinder] 준비 완료! (%.1fs)", load_s)
 
-        try:
-            u, v, key = ox.distance.nearest_edges(self.G, start_lng, start_lat)
-            orig_node = u if self._get_dist(u, start_lat, start_lng) < self._get_dist(v, start_lat, start_lng) else v
-            u, v, key = ox.distance.nearest_edges(self.G, end_lng, end_lat)
-            dest_node = u if self._get_dist(u, end_lat, end_lng) < self._get_dist(v, end_lat, end_lng) else v
-        except Exception:
-            orig_node = ox.distance.nearest_nodes(self.G, start_lng, start_lat)
-            dest_node = ox.distance.nearest_nodes(self.G, end_lng, end_lat)
+    @property
+    def G(self):
+        """호환용 networkx 그래프 (스냅샷으로 시작한 경우 첫 접근 시 재구성)"""
+        if self._G is None and self.snapshot is not None:
+            with self._G_lock:
+                if self._G is None:
+                    self._G = self.snapshot.to_networkx(self.scores)
+        return self._G
 
-        try:
-            route_nodes = nx.shortest_path(self.G, orig_node, dest_node, weight=weight_function)
-        except nx.NetworkXNoPath:
-            return None
+    @property
+    def scores(self):
+        return self.state.scores if self.state else None
+
+    @property
+    def costs(self):
+        return self.state.costs if self.state else {}
+
+    @property
+    def landmark_modes(self):
+        return self.state.landmark_modes if self.state else frozenset()
+
+    def reload_scores(self, csv_path=None):
+        """점수 CSV를 새 배열로 읽어 RiskState를 통째로 교체
+
+        진행 중인 find_path는 시작 시 잡은 state를 끝까지 사용한다.
+        """
+        if not self.state: raise Exception("지도 데이터가 로드되지 않았습니다.")
+        csv_path = csv_path or self.csv_path
+        with self._reload_lock:
+            started = time.perf_counter()
+            old = self.state
+            table = load_score_table(csv_path)
+            scores = map_scores(self.snapshot.osmid_offsets, self.snapshot.osmid_values, table)
+            costs = self.engine.compile_costs(scores)
+            new = RiskState(old.version + 1, table, scores, costs,
+                            self._still_admissible(old, costs), score_fingerprint(csv_path), old.revision + 1)
+            self.state = new
+            if self.cache:
+                self.cache.clear(revision=new.revision)
+            if self._G is not None:
+                self._map_scores_to_graph()
+            elapsed_ms = (time.perf_counter() - started) * 1000
 
-        path_coords = []
-        metrics = {
-            'risk': [], 'slope': [], 'freeze': [], 'accident': [], 
-            'population': [], 'raw': []
+        changed_edges = np.flatnonzero(np.any(scores != old.scores, axis=1))
+        changed = int(changed_edges.size)
+        observe_stage('score_reload', elapsed_ms / 1000)
+        log.info("🔄 [RouteFinder] 위험 점수 갱신 v%d: 변경 엣지 %d개, %.0fms", new.version, changed, elapsed_ms)
+        self._notify_score_listeners(new, changed_edges)
+        return {
+            'version': new.version,
+            'elapsed_ms': round(elapsed_ms, 1),
+            'changed_edges': changed,
+            'score_rows': len(table),
+            'landmark_modes': sorted(new.landmark_modes),
+        }
+
+    def apply_score_deltas(self, deltas):
+        """road_id 단위 점수 변경을 해당 엣지에만 반영
+
+        deltas: [{'road_id': int, 'final_risk_score': float, ...}] (빠진 컬럼은 기존 값 유지)
+        """
+        if not self.state: raise Exception("지도 데이터가 로드되지 않았습니다.")
+        latest = {}
+        for delta in deltas:
+            unknown = set(delta) - {'road_id', *CSV_COLUMNS}
+            if unknown:
+                raise ValueError(f"알 수 없는 점수 컬럼입니다: {sorted(unknown)}")
+            latest[int(delta['road_id'])] = delta
+        if not latest:
+            raise ValueError("변경할 도로(road_id)가 없습니다.")
+
+        with self._reload_lock:
+            started = time.perf_counter()
+            old = self.state
+            road_ids = np.fromiter(latest, dtype=np.int64, count=len(latest))
+            rows = old.table.rows(road_ids)
+            for i, delta in enumerate(latest.values()):
+                for c, col in enumerate(CSV_COLUMNS):
+                    if col in delta:
+                        rows[i, c] = float(delta[col])
+            table = old.table.with_rows(road_ids, rows)
+
+            edges = self.edges_for_roads(road_ids)
+            scores = np.array(old.scores)
+            if edges.size:
+                counts = self.snapshot.osmid_offsets[edges + 1] - self.snapshot.osmid_offsets[edges]
+                sub_offsets = np.zeros(edges.size + 1, dtype=np.int64)
+                np.cumsum(counts, out=sub_offsets[1:])
+                first = sub_offsets[:-1]
+                idx = np.repeat(self.snapshot.osmid_offsets[edges] - first, counts) + np.arange(counts.sum())
+                scores[edges] = map_scores(sub_offsets, self.snapshot.osmid_values[idx], table)
+
+            costs, landmark_modes, decreased = {}, set(), set()
+            for mode, mode_costs in old.costs.items():
+                costs[mode] = self.engine.update_mode(mode_costs, scores, edges)
+                # 비용이 늘기만 했다면 기존 ALT 하한과 다른 캐시 경로의 최적성이 유지된다
+                if np.any(costs[mode].array < mode_costs.array):
+                    decreased.add(mode)
+                elif mode in old.landmark_modes:
+                    landmark_modes.add(mode)
+            self.state = RiskState(old.version, table, scores, costs, landmark_modes,
+                                   old.source, old.revision + 1)
+            # 프로파일 비용은 모든 점수 열에 연속으로 반응하므로 점수가 하나라도 내려가면 해당 모드 전체 무효화
+            if edges.size and np.any(scores[edges] < old.scores[edges]):
+                with self._profile_lock:
+                    decreased.update(self._profiles)
+            evicted = 0
+            if self.cache:
+                evicted = self.cache.invalidate(self.engine.edge_group[edges].tolist(), decreased,
+                                                revision=old.revision + 1)
+            if self._G is not None:
+                self._map_scores_to_graph(edges)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+        observe_stage('score_delta', elapsed_ms / 1000)
+        changed = edges[np.any(scores[edges] != old.scores[edges], axis=1)] if edges.size else edges
+        if changed.size:
+            self._notify_score_listeners(self.state, changed)
+        return {
+            'version': old.version,
+            'revision': old.revision + 1,
+            'elapsed_ms': round(elapsed_ms, 2),
+            'roads': len(latest),
+            'changed_edges': int(changed.size),
+            'invalidated_modes': sorted(old.landmark_modes - landmark_modes),
+            'invalidated_routes': evicted,
         }
-        danger_segments = []
 
-        for i in range(len(route_nodes) - 1):
-            u = route_nodes[i]
-            v = route_nodes[i+1]
-            edge_data = self.G.get_edge_data(u, v)[0]
+    def add_score_listener(self, listener):
+        """점수가 바뀔 때마다 listener(state, 바뀐 엣지 인덱스)를 호출 (갱신 잠금 밖, 호출한 스레드에서)"""
+        self._score_listeners.append(listener)
 
-            if 'geometry' in edge_data:
-                coords = list(edge_data['geometry'].coords)
-                path_coords.extend([[y, x] for x, y in coords])
+    def _notify_score_listeners(self, state, edges):
+        for listener in list(self._score_listeners):
+            try:
+                listener(state, edges)
+            except Exception as e:
+                log.exception("❌ [오류] 점수 변경 리스너 실패: %s", e)
+
+    def edges_for_roads(self, road_ids):
+        """road_id(OSM way id) 들을 포함하는 엣지 인덱스 (역색인)"""
+        if self._road_edges is None:
+            values = self.snapshot.osmid_values
+            owner = np.repeat(np.arange(self.snapshot.n_edges), np.diff(self.snapshot.osmid_offsets))
+            order = np.argsort(values, kind='stable')
+            self._road_edges = (values[order], owner[order])
+        sorted_ids, owners = self._road_edges
+        road_ids = np.asarray(road_ids, dtype=np.int64)
+        lo = np.searchsorted(sorted_ids, road_ids, side='left')
+        hi = np.searchsorted(sorted_ids, road_ids, side='right')
+        counts = hi - lo
+        idx = np.repeat(lo - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        return np.unique(owners[idx])
+
+    def _still_admissible(self, old, costs):
+        """비용이 그대로이거나 늘기만 한 모드는 기존 ALT 하한이 여전히 유효"""
+        return {mode for mode in old.landmark_modes
+                if np.all(costs[mode].array >= old.costs[mode].array)}
+
+    def start_score_watcher(self, interval=30.0):
+        """점수 CSV 변경을 주기적으로 확인해 자동 갱신하는 백그라운드 스레드"""
+        if self._watcher is not None or not self.state:
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                source = score_fingerprint(self.csv_path)
+                if source is None or source == self.state.source:
+                    continue
+                try:
+                    self.reload_scores()
+                except Exception as e:
+                    log.exception("❌ [오류] 위험 점수 자동 갱신 실패: %s", e)
+
+        self._watcher = threading.Thread(target=watch, name='score-watcher', daemon=True)
+        self._watcher.start()
+
+    def _initial_scores(self, csv_path, table):
+        """스냅샷에 저장된 점수가 현재 CSV와 같으면 그대로 쓰고, 아니면 다시 매핑"""
+        source = score_fingerprint(csv_path)
+        if source is not None and self.snapshot.meta.get('score_source') == source:
+            return self.snapshot.edge_scores
+        return map_scores(self.snapshot.osmid_offsets, self.snapshot.osmid_values, table)
+
+    def _load_landmarks(self, costs):
+        """스냅샷 옆 ALT 인덱스가 있으면 열고, 현재 비용과 맞는 모드 집합 반환"""
+        if not self.index_path or not os.path.exists(self.index_path):
+            return set()
+        try:
+            self.landmarks = LandmarkIndex.load(self.index_path)
+        except ValueError as e:
+            log.warning("⚠️ [경고] ALT 인덱스를 열 수 없습니다: %s", e)
+            return set()
+        modes = {mode for mode, mode_costs in costs.items()
+                 if self.landmarks.is_valid(self.snapshot, mode, mode_costs)}
+        log.info("   - ALT 인덱스 로드 완료 (랜드마크 %d개, 모드 %s)", len(self.landmarks.landmarks), sorted(modes))
+        return modes
+
+    def build_landmarks(self, save=True):
+        """ALT 인덱스를 새로 만들거나, 현재 비용과 맞지 않는 모드만 다시 계산"""
+        with self._reload_lock:
+            state = self.state
+            if self.landmarks is None:
+                landmarks = LandmarkIndex.build(self.engine, state.costs, n_landmarks=self.landmark_count)
+            else:
+                landmarks = LandmarkIndex(dict(self.landmarks.meta), dict(self.landmarks.arrays))
+                for mode, costs in state.costs.items():
+                    if not landmarks.is_valid(self.snapshot, mode, costs):
+                        landmarks.customise(self.engine, mode, costs)
+            if save and self.index_path:
+                landmarks.save(self.index_path)
+            self.landmarks = landmarks
+            self.state = RiskState(state.version, state.table, state.scores, state.costs,
+                                   set(state.costs), state.source, state.revision)
+        return landmarks
+
+    def _search_algorithm(self, state, mode, algorithm):
+        """ALT 인덱스가 이 모드에 유효하지 않으면 대원거리 A*로 대체"""
+        algorithm = algorithm or self.algorithm or 'alt'
+        if algorithm.endswith('alt') and self._alt_index(state, mode)[0] is None:
+            return algorithm[:-len('alt')] + 'astar'
+        return algorithm
+
+    def _map_scores_to_graph(self, edges=None):
+        """그래프 엣지에 모든 점수 매핑 (호환용 dict 속성, edges 지정 시 해당 엣지만)"""
+        snapshot = self.snapshot
+        edges = np.arange(snapshot.n_edges) if edges is None else np.asarray(edges)
+        osmids = snapshot.node_osmid
+        rows = np.asarray(self.scores)[edges].tolist()
+        for s, t, k, row in zip(osmids[snapshot.edge_source[edges]].tolist(),
+                                   osmids[snapshot.edge_target[edges]].tolist(),
+                                   snapshot.edge_key[edges].tolist(), rows):
+            data = self._G[s][t][k]
+            for attr, value in zip(SCORE_ATTRS, row):
+                data[attr] = float(value)
+
+    def snap_points(self, lats, lngs):
+        """여러 좌표를 한 번에 가장 가까운 도로 노드(인덱스)로 스냅"""
+        return self.spatial.snap(lats, lngs)
+
+    def find_path(self, start_lat, start_lng, end_lat, end_lng, mode='fast', algorithm=None, with_stats=False,
+                  profile=None):
+        """profile(CostProfile)을 주면 mode 대신 그 프로파일의 연속 비용으로 탐색"""
+        if with_stats:
+            state, orig_idx, dest_idx, mode = self._prepare(start_lat, start_lng, end_lat, end_lng, mode, profile)
+            return self._route(state, orig_idx, dest_idx, mode, algorithm, with_stats=True)[0]
+        return json.loads(self.find_path_json(start_lat, start_lng, end_lat, end_lng, mode, algorithm, profile))
+
+    def find_path_json(self, start_lat, start_lng, end_lat, end_lng, mode='fast', algorithm=None, profile=None):
+        """find_path 결과를 JSON 문자열로 반환 (경로가 없으면 'null'). 같은 스냅 노드/모드/점수 버전은 캐시 사용"""
+        state, orig_idx, dest_idx, mode = self._prepare(start_lat, start_lng, end_lat, end_lng, mode, profile)
+        return self._route_json(state, orig_idx, dest_idx, mode, algorithm)
+
+    def find_routes(self, start_lat, start_lng, end_lat, end_lng, modes=MODES, mode='fast', alternatives=0,
+                    method='plateau', algorithm=None, with_stats=False, profile=None):
+        """한 번의 스냅으로 여러 모드의 경로와 mode의 대안 경로를 함께 계산
+
+        반환: {'routes': {모드: find_path 결과}, 'alternatives': [find_path 결과 + 'cost_ratio'], 'mode': mode}
+        대안 경로는 mode의 최단 경로 탐색과 ALT 하한을 그대로 재사용한다 (RouteEngine.alternatives).
+        profile을 주면 mode는 그 프로파일 모드('profile:<digest>')가 되고 routes에도 포함된다.
+        """
+        state, orig_idx, dest_idx, mode = self._prepare(start_lat, start_lng, end_lat, end_lng, mode, profile)
+        routes = {}
+        for m in [m for m in modes if m in state.costs] + ([mode] if profile is not None else []):
+            if m in routes or (m == mode and alternatives):
+                continue
+            if with_stats:
+                routes[m] = self._route(state, orig_idx, dest_idx, m, algorithm, with_stats=True)[0]
             else:
-                path_coords.append([self.G.nodes[u]['y'], self.G.nodes[u]['x']])
-
-            r_score = edge_data.get('risk_score', 0)
-            metrics['risk'].append(r_score)
-            metrics['slope'].append(edge_data.get('slope_score', 0))
-            metrics['freeze'].append(edge_data.get('freeze_score', 0))
-            metrics['accident'].append(edge_data.get('accident_score', 0))
-            # ▼▼▼ [추가] ▼▼▼
-            metrics['population'].append(edge_data.get('population_score', 0))
-            metrics['raw'].append(edge_data.get('raw_score', 0))
-
-            if r_score >= 60:
-                raw_name = edge_data.get('name', '도로명 정보 없음')
-                road_name = raw_name[0] if isinstance(raw_name, list) else str(raw_name)
-                danger_segments.append({
-                    'lat': self.G.nodes[u]['y'], 
-                    'lng': self.G.nodes[u]['x'], 
-                    'score': r_score,
-                    'road_name': road_name
-                })
-
-        path_coords.append([self.G.nodes[dest_node]['y'], self.G.nodes[dest_node]['x']])
-
-        if not metrics['risk']:
+                routes[m] = json.loads(self._route_json(state, orig_idx, dest_idx, m, algorithm))
+
+        alts = []
+        if alternatives:
+            best, search_ms = self._search(state, orig_idx, dest_idx, mode, algorithm)
+            response = self._assemble(state, best, dest_idx, with_stats, search_ms)
+            routes[mode] = response
+            if best is not None:
+                if self.cache and not with_stats:
+                    key = RouteCache.key(orig_idx, dest_idx, mode, state.version,
+                                         self._search_algorithm(state, mode, algorithm))
+                    self.cache.put(key,
+                                   json.dumps(response, ensure_ascii=False), best.groups, state.revision)
+                started = time.perf_counter()
+                found = self.engine.alternatives(best, self._costs(state, mode), k=alternatives, method=method,
+                                                 potentials=self._potentials(state, orig_idx, dest_idx, mode))
+                alt_ms = (time.perf_counter() - started) * 1000 / max(len(found), 1)
+                for result in found:
+                    alt = self._assemble(state, result, dest_idx, with_stats, alt_ms)
+                    alt['cost_ratio'] = round(result.cost / best.cost, 3) if best.cost else 1.0
+                    alts.append(alt)
+        return {'routes': routes, 'alternatives': alts, 'mode': mode}
+
+    def _route_json(self, state, orig_idx, dest_idx, mode, algorithm=None):
+        key = RouteCache.key(orig_idx, dest_idx, mode, state.version,
+                             self._search_algorithm(state, mode, algorithm))
+        payload = self.cache.get(key, state.revision) if self.cache else None
+        if payload is None:
+            response, groups = self._route(state, orig_idx, dest_idx, mode, algorithm)
+            with timed('serialize'):
+                payload = json.dumps(response, ensure_ascii=False)
+            if self.cache:
+                self.cache.put(key, payload, groups, state.revision)
+        return payload
+
+    def _potentials(self, state, orig_idx, dest_idx, mode):
+        """대안 경로 탐색용 (h_t, h_s). ALT 인덱스가 유효하면 랜드마크 하한, 아니면 None(대원거리)"""
+        landmarks, table = self._alt_index(state, mode)
+        if landmarks is None:
+            return None
+        return landmarks.potential_pair(orig_idx, dest_idx, table)
+
+    def _alt_index(self, state, mode):
+        """mode 탐색에 쓸 (LandmarkIndex, 거리표 모드). 쓸 수 있는 표가 없으면 (None, None)
+
+        비용 프로파일은 전용 표가 있으면 그것을, 없으면 fast(길이) 표를 쓴다 (배율 >= 1이라 하한 유지).
+        """
+        if mode in state.landmark_modes:
+            return self.landmarks, mode
+        if mode.startswith(PROFILE_PREFIX):
+            with self._profile_lock:
+                entry = self._profiles.get(mode)
+                if entry is not None and entry.landmarks is not None and entry.revision == state.revision:
+                    return entry.landmarks, mode
+            if 'fast' in state.landmark_modes:
+                return self.landmarks, 'fast'
+        return None, None
+
+    def profile_costs(self, state, profile):
+        """프로파일의 ModeCosts. digest와 점수 revision이 같으면 컴파일된 것을 재사용 (LRU)"""
+        mode = profile.mode
+        with self._profile_lock:
+            entry = self._profiles.get(mode)
+            if entry is None:
+                entry = self._profiles[mode] = _CompiledProfile(profile)
+                while len(self._profiles) > self.profile_cache:
+                    self._profiles.popitem(last=False)
+            self._profiles.move_to_end(mode)
+            if entry.revision == state.revision:
+                return entry.costs
+
+        costs = self.engine.costs_from_edges(mode, profile.edge_costs(self.snapshot.edge_length, state.scores))
+        with self._profile_lock:
+            if entry.revision is None or entry.revision < state.revision:
+                entry.revision, entry.costs = state.revision, costs
+                # 전용 ALT 표는 만든 시점 비용 이상일 때만 하한으로 유효
+                if entry.landmarks is not None and not np.all(costs.array >= entry.landmark_costs.array):
+                    entry.landmarks = entry.landmark_costs = None
+        return costs
+
+    def find_profile(self, digest):
+        """digest로 등록된 CostProfile 조회 (없으면 None)"""
+        with self._profile_lock:
+            entry = self._profiles.get(PROFILE_PREFIX + digest)
+        return entry.profile if entry is not None else None
+
+    def _use_profile(self, state, profile):
+        """요청마다 호출. 자주 쓰이는 프로파일은 전용 ALT 표를 백그라운드에서 만든다"""
+        costs = self.profile_costs(state, profile)
+        with self._profile_lock:
+            entry = self._profiles.get(profile.mode)
+            if entry is None:
+                return
+            entry.uses += 1
+            if (entry.building or entry.landmarks is not None or entry.uses < self.profile_alt_after
+                    or self.landmarks is None or entry.revision != state.revision):
+                return
+            entry.building = True
+            base = self.landmarks.landmarks
+
+        def build():
+            index = None
+            try:
+                index = LandmarkIndex.derived(self.engine, base, profile.mode, costs)
+            except Exception as e:
+                log.exception("❌ [오류] 프로파일 ALT 표 생성 실패: %s", e)
+            with self._profile_lock:
+                entry.building = False
+                if index is not None and entry.costs is not None and np.all(entry.costs.array >= costs.array):
+                    entry.landmarks, entry.landmark_costs = index, costs
+
+        threading.Thread(target=build, name='profile-alt', daemon=True).start()
+
+    def _costs(self, state, mode):
+        costs = state.costs.get(mode)
+        if costs is None:
+            with self._profile_lock:
+                entry = self._profiles.get(mode)
+            if entry is None:
+                raise KeyError(f"알 수 없는 비용 모드입니다: {mode}")
+            costs = self.profile_costs(state, entry.profile)
+        return costs
+
+    def _resolve(self, mode, profile=None):
+        """현재 state와 실제로 쓸 모드 이름 (profile이 있으면 그 프로파일 모드)"""
+        state = self.state
+        if not self.engine or not state: raise Exception("지도 데이터가 로드되지 않았습니다.")
+        if profile is not None:
+            self._use_profile(state, profile)
+            mode = profile.mode
+        elif mode not in state.costs: mode = 'fast'
+        return state, mode
+
+    def _prepare(self, start_lat, start_lng, end_lat, end_lng, mode, profile=None):
+        state, mode = self._resolve(mode, profile)
+        with timed('snap'):
+            orig_idx, dest_idx = self.snap_points([start_lat, end_lat], [start_lng, end_lng]).tolist()
+        return state, orig_idx, dest_idx, mode
+
+    def _route(self, state, orig_idx, dest_idx, mode, algorithm=None, with_stats=False):
+        """탐색 + 결과 조립. (응답 dict 또는 None, 지나는 그룹 목록)"""
+        result, search_ms = self._search(state, orig_idx, dest_idx, mode, algorithm)
+        if result is None:
+            return None, []
+        return self._assemble(state, result, dest_idx, with_stats, search_ms), result.groups
+
+    def _search(self, state, orig_idx, dest_idx, mode, algorithm=None):
+        started = time.perf_counter()
+        landmarks, table = self._alt_index(state, mode)
+        result = self.engine.search(
+            orig_idx, dest_idx, self._costs(state, mode),
+            self._search_algorithm(state, mode, algorithm), landmarks=landmarks, landmark_mode=table
+        )
+        elapsed = time.perf_counter() - started
+        observe_stage('search', elapsed)
+        return result, elapsed * 1000
+
+    def _assemble(self, state, result, dest_idx, with_stats=False, search_ms=0.0):
+        """SearchResult -> find_path 응답 dict (경로가 없으면 None)"""
+        if result is None:
+            return None
+        with timed('assemble'):
+            return self._build_response(state, result, dest_idx, with_stats, search_ms)
+
+    def _build_response(self, state, result, dest_idx, with_stats, search_ms):
+        edges = self.engine.group_edge[result.groups]
+        # 점수는 탐색에 쓴 state에서 읽는다 (도중에 갱신돼도 일관성 유지)
+        scores = state.scores[edges]
+        path_coords = self.snapshot.path_coords(edges, dest_idx).tolist()
+
+        danger = np.flatnonzero(scores[:, 0] >= 60)
+        danger_nodes = self.snapshot.edge_source[edges[danger]]
+        danger_segments = [
+            {'lat': lat, 'lng': lng, 'score': score, 'road_name': self.snapshot.road_name(e)}
+            for lat, lng, score, e in zip(self.snapshot.node_y[danger_nodes].tolist(),
+                                          self.snapshot.node_x[danger_nodes].tolist(),
+                                          scores[danger, 0].tolist(), edges[danger].tolist())
+        ]
+
+        if not edges.size:
             stats = {'average': 0, 'max': 0, 'risk_level': 'Safe', 'danger_count': 0, 'env_details': {}}
         else:
-            max_score = max(metrics['risk'])
+            # 누적합은 sum()과 같은 순서로 더하므로 반올림 결과까지 기존과 동일
+            risk, slope, freeze, accident, population, raw = (np.cumsum(scores, axis=0)[-1] / edges.size).tolist()
+            max_score, max_slope = scores[:, :2].max(axis=0).tolist()
             risk_level = 'Danger' if max_score >= 80 else ('Warning' if max_score >= 60 else 'Safe')
 
             stats = {
-                'average': round(sum(metrics['risk']) / len(metrics['risk']), 1),
+                'average': round(risk, 1),
                 'max': round(max_score, 1),
                 'risk_level': risk_level,
                 'danger_count': len(danger_segments),
                 'env_details': {
-                    'avg_slope': round(sum(metrics['slope']) / len(metrics['slope']), 1),
-                    'max_slope': round(max(metrics['slope']), 1),
-                    'avg_freeze': round(sum(metrics['freeze']) / len(metrics['freeze']), 1),
-                    'avg_accident': round(sum(metrics['accident']) / len(metrics['accident']), 1),
-                    'avg_population': round(sum(metrics['population']) / len(metrics['population']), 1),
-                    'avg_raw': round(sum(metrics['raw']) / len(metrics['raw']), 1),
+                    'avg_slope': round(slope, 1),
+                    'max_slope': round(max_slope, 1),
+                    'avg_freeze': round(freeze, 1),
+                    'avg_accident': round(accident, 1),
+                    'avg_population': round(population, 1),
+                    'avg_raw': round(raw, 1),
                 }
             }
 
-        return {
+        response = {
             'path': path_coords,
             'stats': stats,
             'danger_segments': danger_segments
-        }
\ No newline at end of file
+        }
+        if with_stats:
+            response['search'] = {
+                'algorithm': result.algorithm,
+                'settled': result.settled,
+                'elapsed_ms': round(search_ms, 3)
+            }
+        return response
\ No newline at end of file
@@ -0,0 +1,183 @@
+"""
+여러 출발/도착 쌍의 경로 위험도 일괄 평가 (저장 경로 목록, 출근길 위험 요약)
+
+- 좌표 2N개를 한 번에 스냅한다.
+- 경로 캐시에 있는 쌍은 탐색하지 않는다.
+- 출발지가 같은 쌍은 도착지가 ONE_TO_MANY_MIN개 이상이면 one-to-many Dijkstra 한 번으로 푼다.
+- 남은 출발지 묶음은 워커 프로세스들에 나눠 탐색한다. 요청 스레드가 여럿 도는 프로세스에서 fork하면
+  다른 스레드가 잡고 있던 잠금(캐시, 점수 동기화, 로깅 등)을 물려받을 수 있으므로 워커는
+  forkserver(없으면 spawn)로 띄우고, 스냅샷 파일을 mmap으로 열어 풀을 만들 때의 점수 테이블을 적용한다.
+  점수 revision이 바뀌면 풀을 새로 만든다. 스냅샷 파일이 없으면(OSM에서 받은 그래프) 차례로 실행한다.
+- one-to-many 결과는 단일 쌍 탐색 결과와 경로가 다를 수 있어(동점 경로) 캐시 키의 알고리즘을 구분한다.
+"""
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from services.metrics import observe_stage
+from services.risk_scores import ScoreTable, map_scores
+from services.route_algo import RiskState, RouteFinder
+from services.route_cache import RouteCache
+
+ONE_TO_MANY_MIN = 3
+ONE_TO_MANY = 'one_to_many'
+BATCH_WORKERS = int(os.getenv("ROUTE_BATCH_WORKERS", "0")) or (os.cpu_count() or 1)
+# 워커로 보낼 만큼 탐색할 출발지가 많을 때만 풀 사용
+PARALLEL_MIN_GROUPS = 4
+
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+_finder = None  # 워커 프로세스의 RouteFinder
+
+
+def _mp_context():
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    ctx = multiprocessing.get_context('forkserver')
+    # numpy/osmnx 등은 forkserver에서 한 번만 import하고 워커는 거기서 fork
+    ctx.set_forkserver_preload([__name__])
+    return ctx
+
+
+def _init_worker(csv_path, snapshot_path, algorithm, version, revision, road_ids, values):
+    """워커: 스냅샷으로 RouteFinder를 올리고 부모의 점수 테이블(revision)로 상태 교체"""
+    global _finder
+    finder = RouteFinder(csv_path=csv_path, snapshot_path=snapshot_path, algorithm=algorithm, cache_size=0)
+    if finder.state is None:
+        raise RuntimeError(f"배치 워커 지도 로딩 실패: {snapshot_path}")
+    base = finder.state
+    table = ScoreTable(road_ids, values)
+    scores = map_scores(finder.snapshot.osmid_offsets, finder.snapshot.osmid_values, table)
+    costs = finder.engine.compile_costs(scores)
+    finder.state = RiskState(version, table, scores, costs, finder._still_admissible(base, costs),
+                             base.source, revision)
+    _finder = finder
+
+
+def _get_pool(finder, state):
+    """finder의 현재 점수 revision을 적용한 워커 풀 (스냅샷 파일이 없으면 None)"""
+    global _pool, _pool_key
+    snapshot_path = getattr(finder.snapshot, 'path', None)
+    if not snapshot_path:
+        return None
+    key = (id(finder), state.revision)
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None:
+                _pool.shutdown(wait=False)  # 이전 revision으로 진행 중인 요청은 그대로 끝낸다
+            _pool = ProcessPoolExecutor(
+                max_workers=BATCH_WORKERS, mp_context=_mp_context(),
+                initializer=_init_worker,
+                initargs=(finder.csv_path, snapshot_path, finder.algorithm, state.version, state.revision,
+                          np.asarray(state.table.road_ids), np.asarray(state.table.values)),
+            )
+            _pool_key = key
+        return _pool
+
+
+def _evaluate_groups(groups, mode, profile=None, algorithm=None):
+    """워커: 풀을 만들 때의 점수로 올린 RouteFinder로 출발지 묶음들 탐색"""
+    finder = _finder
+    state = finder.state
+    if profile is not None:
+        finder.profile_costs(state, profile)
+    return _search_groups(finder, state, groups, mode, algorithm)
+
+
+def _search_groups(finder, state, groups, mode, algorithm=None):
+    """[(출발, [도착, ...]), ...] -> [((출발, 도착), 응답 또는 None, 그룹 목록, 탐색 알고리즘), ...]"""
+    out = []
+    single = finder._search_algorithm(state, mode, algorithm)
+    for orig, dests in groups:
+        if len(dests) >= ONE_TO_MANY_MIN:
+            found = finder.engine.one_to_many(orig, dests, finder._costs(state, mode))
+            results, used = [(d, found.get(d)) for d in dests], ONE_TO_MANY
+        else:
+            results, used = [(d, finder._search(state, orig, d, mode, algorithm)[0]) for d in dests], single
+        for dest, result in results:
+            response = finder._assemble(state, result, dest)
+            out.append(((orig, dest), response, result.groups if result is not None else [], used))
+    return out
+
+
+def evaluate_routes(finder, pairs, mode='safe', profile=None, algorithm=None, include_path=False, workers=None):
+    """pairs: [(출발 lat, 출발 lng, 도착 lat, 도착 lng), ...] -> (결과 목록, 요약)
+
+    결과는 입력 순서대로 find_path 응답(경로 없으면 None). include_path=False면 path와
+    danger_segments를 빼고 stats만 남긴다. workers=1이면 호출한 프로세스에서 실행.
+    """
+    started = time.perf_counter()
+    state, mode = finder._resolve(mode, profile)
+    if not pairs:
+        return [], {'routes': 0, 'cached': 0, 'searched_pairs': 0, 'origins': 0, 'workers': 0, 'elapsed_ms': 0.0}
+    coords = np.asarray(pairs, dtype=np.float64).reshape(-1, 4)
+    snapped = finder.snap_points(np.concatenate([coords[:, 0], coords[:, 2]]),
+                                 np.concatenate([coords[:, 1], coords[:, 3]]))
+    origs, dests = snapped[:len(coords)].tolist(), snapped[len(coords):].tolist()
+
+    payloads = {}
+    todo = {}
+    # 단일 쌍 탐색(find_path와 같은 결과)을 먼저, 없으면 이전 배치의 one-to-many 결과를 찾는다
+    algorithms = (finder._search_algorithm(state, mode, algorithm), ONE_TO_MANY)
+    for orig, dest in zip(origs, dests):
+        pair = (orig, dest)
+        if pair in payloads or dest in todo.get(orig, ()):
+            continue
+        cached = None
+        for name in algorithms if finder.cache else ():
+            cached = finder.cache.get(RouteCache.key(orig, dest, mode, state.version, name), state.revision)
+            if cached is not None:
+                break
+        if cached is not None:
+            payloads[pair] = json.loads(cached)
+        else:
+            todo.setdefault(orig, []).append(dest)
+    n_cached = len(payloads)
+
+    groups = list(todo.items())
+    workers = 1 if workers == 1 else max(1, min(workers or BATCH_WORKERS, BATCH_WORKERS, len(groups)))
+    pool = _get_pool(finder, state) if workers > 1 and len(groups) >= PARALLEL_MIN_GROUPS else None
+    if pool is None:
+        workers = 1 if groups else 0
+        found = _search_groups(finder, state, groups, mode, algorithm)
+    else:
+        # 탐색 횟수(one-to-many는 한 번으로 보되 더 무겁게)가 고르게 나뉘도록 큰 묶음부터 배정
+        chunks = [[] for _ in range(workers * 2)]
+        loads = [0] * len(chunks)
+        for group in sorted(groups, key=lambda g: -len(g[1])):
+            i = loads.index(min(loads))
+            chunks[i].append(group)
+            loads[i] += min(len(group[1]), ONE_TO_MANY_MIN)
+        futures = [pool.submit(_evaluate_groups, chunk, mode, profile, algorithm) for chunk in chunks if chunk]
+        found = [item for f in futures for item in f.result()]
+
+    for pair, response, path_groups, used in found:
+        payloads[pair] = response
+        if finder.cache and response is not None:
+            finder.cache.put(RouteCache.key(*pair, mode, state.version, used),
+                             json.dumps(response, ensure_ascii=False), path_groups, state.revision)
+
+    results = []
+    for pair in zip(origs, dests):
+        response = payloads[pair]
+        if response is not None and not include_path:
+            response = {'stats': response['stats']}
+        results.append(response)
+    elapsed = time.perf_counter() - started
+    observe_stage('batch_evaluate', elapsed)
+    summary = {
+        'routes': len(results),
+        'cached': n_cached,
+        'searched_pairs': len(found),
+        'origins': len(groups),
+        'workers': workers,
+        'mode': mode,
+        'elapsed_ms': round(elapsed * 1000, 1),
+    }
+    return results, summary
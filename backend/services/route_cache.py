@@ -0,0 +1,248 @@
+"""
+경로 결과 캐시
+
+키: (출발 노드, 도착 노드, 모드, 위험 점수 버전, 탐색 알고리즘). 값은 직렬화된 find_path 결과(JSON 문자열)와
+경로가 지나는 (출발, 도착) 그룹 목록이다. 점수 CSV 전체 갱신은 버전이 바뀌어 자연히 무효화되고,
+부분 갱신(delta)은 바뀐 그룹을 지나는 항목만 지운다.
+
+선택적으로 같은 서버의 여러 워커가 공유하는 SQLite 2차 저장소를 둘 수 있다. 공유 저장소도 같은 키를 쓰고
+delta 때는 바뀐 그룹을 지나는 항목만 지운다 (revision을 키에 넣지 않으므로 나머지 항목은 계속 공유된다).
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class _Entry:
+    __slots__ = ('payload', 'groups', 'expires_at')
+
+    def __init__(self, payload, groups, expires_at):
+        self.payload = payload
+        self.groups = groups
+        self.expires_at = expires_at
+
+
+class SqliteRouteStore:
+    """워커 간 공유용 로컬 SQLite 저장소
+
+    워커들은 같은 점수 이벤트를 같은 순서로 적용해 revision이 일치한다 (services.score_sync).
+    항목마다 계산한 revision과 지나는 그룹을 함께 두어, delta가 오면 바뀐 그룹을 지나는 항목만 지우고
+    그보다 오래된 revision의 결과는 더 이상 받지 않는다 (RouteCache.min_revision과 같은 역할).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(route_cache)')]
+        if columns and 'revision' not in columns:
+            # 키에 revision이 붙던 이전 형식 (캐시라 버리고 새로 만든다)
+            conn.execute('DROP TABLE route_cache')
+        conn.execute('CREATE TABLE IF NOT EXISTS route_cache ('
+                     'key TEXT PRIMARY KEY, mode TEXT, payload TEXT, groups BLOB, revision INTEGER, expires_at REAL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS route_cache_groups (grp INTEGER, key TEXT)')
+        conn.execute('CREATE INDEX IF NOT EXISTS route_cache_groups_grp ON route_cache_groups (grp)')
+        conn.execute('CREATE INDEX IF NOT EXISTS route_cache_groups_key ON route_cache_groups (key)')
+        conn.execute('CREATE TABLE IF NOT EXISTS route_cache_meta (id INTEGER PRIMARY KEY CHECK (id = 0), '
+                     'min_revision INTEGER)')
+        conn.execute('INSERT OR IGNORE INTO route_cache_meta VALUES (0, 0)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def get(self, key, revision):
+        """revision 이하의 점수로 계산된 항목 (payload, groups). 없으면 None"""
+        row = self._connect().execute(
+            'SELECT payload, groups FROM route_cache WHERE key = ? AND revision <= ? AND expires_at > ?',
+            (key, revision, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], frozenset(np.frombuffer(row[1], dtype=np.int64).tolist())
+
+    def put(self, key, mode, payload, groups, revision, expires_at):
+        """저장 여부 반환 (invalidate로 지난 revision이면 저장하지 않음)"""
+        blob = np.fromiter(groups, dtype=np.int64, count=len(groups)).tobytes()
+        with self._transaction() as conn:
+            if conn.execute('SELECT min_revision FROM route_cache_meta').fetchone()[0] > revision:
+                return False
+            conn.execute('DELETE FROM route_cache_groups WHERE key = ?', (key,))
+            conn.execute('INSERT OR REPLACE INTO route_cache VALUES (?, ?, ?, ?, ?, ?)',
+                         (key, mode, payload, blob, revision, expires_at))
+            conn.executemany('INSERT INTO route_cache_groups VALUES (?, ?)', [(int(g), key) for g in groups])
+        return True
+
+    def invalidate(self, groups, modes, revision):
+        """revision 이전에 계산된 항목 중 modes이거나 groups를 지나는 것을 지우고, 이후 revision 미만은 거부"""
+        modes = list(modes)
+        with self._transaction() as conn:
+            conn.execute('UPDATE route_cache_meta SET min_revision = MAX(min_revision, ?)', (revision,))
+            # 그룹 수가 바인딩 변수 한도를 넘을 수 있어 임시 테이블로 넘긴다
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS stale_groups (grp INTEGER PRIMARY KEY)')
+            conn.execute('DELETE FROM stale_groups')
+            conn.executemany('INSERT OR IGNORE INTO stale_groups VALUES (?)', [(int(g),) for g in groups])
+            stale = [row[0] for row in conn.execute(
+                f"SELECT key FROM route_cache WHERE revision < ? AND (mode IN ({', '.join('?' * len(modes))}) "
+                'OR key IN (SELECT key FROM route_cache_groups WHERE grp IN (SELECT grp FROM stale_groups)))',
+                (revision, *modes))]
+            self._delete(conn, stale)
+        return len(stale)
+
+    def clear(self, revision):
+        """revision 이전에 계산된 항목 전부 제거 (점수 CSV 전체 갱신)"""
+        with self._transaction() as conn:
+            conn.execute('UPDATE route_cache_meta SET min_revision = MAX(min_revision, ?)', (revision,))
+            self._delete(conn, [row[0] for row in conn.execute(
+                'SELECT key FROM route_cache WHERE revision < ?', (revision,))])
+
+    def purge_expired(self):
+        with self._transaction() as conn:
+            self._delete(conn, [row[0] for row in conn.execute(
+                'SELECT key FROM route_cache WHERE expires_at <= ?', (time.time(),))])
+
+    @staticmethod
+    def _delete(conn, keys):
+        rows = [(key,) for key in keys]
+        conn.executemany('DELETE FROM route_cache WHERE key = ?', rows)
+        conn.executemany('DELETE FROM route_cache_groups WHERE key = ?', rows)
+
+
+class RouteCache:
+    def __init__(self, maxsize=4096, ttl=600.0, shared=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # 이 revision 이전 점수로 계산된 결과는 저장하지 않음 (갱신 중 진행된 요청 대비)
+        self.min_revision = 0
+
+    @staticmethod
+    def key(orig, dest, mode, version, algorithm):
+        return (orig, dest, mode, version, algorithm)
+
+    @staticmethod
+    def _shared_key(key):
+        return ':'.join(map(str, key))
+
+    def get(self, key, revision=0):
+        """캐시된 JSON 문자열 (없으면 None)"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.payload
+                del self._entries[key]
+
+        if self.shared is not None:
+            try:
+                found = self.shared.get(self._shared_key(key), revision)
+            except sqlite3.Error:
+                found = None
+            if found is not None:
+                payload, groups = found
+                self._store(key, payload, groups, now + self.ttl, revision)
+                with self._lock:
+                    self.hits += 1
+                return payload
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, payload, groups, revision=0):
+        expires_at = time.time() + self.ttl
+        groups = frozenset(groups)
+        if not self._store(key, payload, groups, expires_at, revision):
+            return
+        if self.shared is not None:
+            try:
+                self.shared.put(self._shared_key(key), key[2], payload, groups, revision, expires_at)
+            except sqlite3.Error:
+                pass
+
+    def _store(self, key, payload, groups, expires_at, revision):
+        with self._lock:
+            if revision < self.min_revision:
+                return False
+            self._entries[key] = _Entry(payload, groups, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def invalidate(self, groups=(), modes=(), revision=None):
+        """modes의 항목 전부와, groups 중 하나라도 지나는 항목을 제거. 제거 수 반환
+
+        revision: 새 점수 revision. 이보다 오래된 점수로 계산된 결과는 이후 저장되지 않는다.
+        """
+        groups = set(groups)
+        modes = set(modes)
+        with self._lock:
+            if revision is not None:
+                self.min_revision = max(self.min_revision, revision)
+            stale = [key for key, entry in self._entries.items()
+                     if key[2] in modes or not groups.isdisjoint(entry.groups)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        if self.shared is not None and revision is not None:
+            try:
+                self.shared.invalidate(groups, modes, revision)
+            except sqlite3.Error:
+                pass
+        return len(stale)
+
+    def clear(self, revision=None):
+        with self._lock:
+            self._entries.clear()
+            if revision is not None:
+                self.min_revision = max(self.min_revision, revision)
+        if self.shared is not None and revision is not None:
+            try:
+                self.shared.clear(revision)
+            except sqlite3.Error:
+                pass
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'shared': self.shared.path if self.shared is not None else None,
+            }
@@ -0,0 +1,641 @@
+"""
+NumPy CSR 배열 기반 경로 탐색 엔진
+
+스냅샷의 (출발, 도착, key) 정렬 엣지를 (출발, 도착) 쌍 단위로 묶어 탐색한다.
+병렬 엣지는 모드별 비용의 최솟값을 쓰고, 결과 조립에는 key가 가장 작은
+엣지(기존 get_edge_data(u, v)[0])를 대표 엣지로 사용한다.
+
+탐색 알고리즘: dijkstra, astar(대원거리 하한 휴리스틱), bidirectional,
+bidirectional_astar(양방향 평균 포텐셜). 모든 결과는 확정(settled) 노드 수를 함께 보고한다.
+alternatives()는 최단 경로와 충분히 다른 대안 경로를 plateau/penalty 방식으로 찾는다.
+
+  python -m services.route_engine parity graph_seoul.snap --pairs 50
+  python -m services.route_engine compare graph_seoul.snap --pairs 200
+"""
+import argparse
+import heapq
+import itertools
+import math
+import os
+import random
+import time
+from collections import namedtuple
+import numpy as np
+
+from services.risk_scores import SCORE_ATTRS
+
+MODES = ('fast', 'safe')
+ALGORITHMS = ('dijkstra', 'astar', 'bidirectional', 'bidirectional_astar', 'alt', 'bidirectional_alt')
+EARTH_RADIUS_M = 6_371_009
+_RISK = SCORE_ATTRS.index('risk_score')
+# 부동소수점 오차로 휴리스틱이 실제 비용을 넘지 않도록 두는 여유
+_HEURISTIC_SLACK = 1 - 1e-9
+# 대안 경로: 최단 비용 대비 허용 배율, 이미 고른 경로와 겹칠 수 있는 길이 비율, 패널티 방식 가중/반복
+ALT_STRETCH = 1.25
+ALT_MAX_SHARE = 0.7
+ALT_PENALTY = 0.5
+ALT_PENALTY_ROUNDS = 3
+ALT_METHODS = ('plateau', 'penalty')
+
+SearchResult = namedtuple('SearchResult', ['nodes', 'groups', 'cost', 'settled', 'algorithm'])
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """대원거리 (미터, 배열 가능)"""
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def mode_edge_costs(lengths, scores, mode):
+    """엣지별 모드 비용 (safe: 위험도 60/80 이상 구간에 100/1000배 가중)"""
+    lengths = np.asarray(lengths, dtype=np.float64)
+    if mode == 'fast':
+        return lengths.copy()
+    if mode == 'safe':
+        risk = np.asarray(scores)[:, _RISK]
+        factor = np.where(risk >= 80, 1000.0, np.where(risk >= 60, 100.0, 1.0))
+        return lengths * factor
+    raise ValueError(f"알 수 없는 모드입니다: {mode}")
+
+
+class ModeCosts:
+    """한 모드의 (출발, 도착) 쌍 단위 비용 벡터
+
+    per_metre: 모든 엣지에서 (비용 / 양 끝점 대원거리)의 최솟값.
+    h(v) = per_metre * 대원거리(v, 도착) 는 일관된(consistent) 하한이 된다.
+    """
+
+    def __init__(self, mode, group_costs, per_metre=0.0, forward=None):
+        self.mode = mode
+        self.array = group_costs
+        self.forward = group_costs.tolist() if forward is None else forward
+        self.per_metre = per_metre
+
+
+class RouteEngine:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.n_nodes = snapshot.n_nodes
+
+        src = snapshot.edge_source
+        dst = snapshot.edge_target
+        # (출발, 도착)이 바뀌는 지점이 각 그룹의 대표 엣지 (key 최소)
+        change = np.ones(len(dst), dtype=bool)
+        if len(dst) > 1:
+            change[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+        self.group_edge = np.flatnonzero(change)
+        self.edge_group = np.cumsum(change) - 1
+        self.group_target = np.asarray(dst[self.group_edge], dtype=np.int32)
+
+        counts = np.bincount(src[self.group_edge], minlength=self.n_nodes)
+        self.indptr = np.zeros(self.n_nodes + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.indptr[1:])
+
+        self._indptr = self.indptr.tolist()
+        self._targets = self.group_target.tolist()
+        self._sources = src[self.group_edge].tolist()
+
+        group_source = src[self.group_edge]
+        self.group_gc = haversine_m(
+            snapshot.node_y[group_source], snapshot.node_x[group_source],
+            snapshot.node_y[self.group_target], snapshot.node_x[self.group_target],
+        )
+        self._lat = np.radians(snapshot.node_y).tolist()
+        self._lng = np.radians(snapshot.node_x).tolist()
+        self._coslat = np.cos(np.radians(snapshot.node_y)).tolist()
+        self._reverse = None
+
+    @property
+    def n_groups(self):
+        return len(self.group_edge)
+
+    def compile_costs(self, scores):
+        """점수 배열로 모든 모드의 비용 벡터를 만든다"""
+        return {mode: self.compile_mode(scores, mode) for mode in MODES}
+
+    def compile_mode(self, scores, mode):
+        edge_costs = mode_edge_costs(self.snapshot.edge_length, scores, mode)
+        return self.costs_from_edges(mode, edge_costs)
+
+    def costs_from_edges(self, mode, edge_costs):
+        """엣지 단위 비용 -> 그룹 단위 ModeCosts (병렬 엣지는 최솟값)"""
+        if len(edge_costs) == 0:
+            return ModeCosts(mode, edge_costs)
+        group_costs = np.minimum.reduceat(edge_costs, self.group_edge)
+        moving = self.group_gc > 0
+        per_metre = float(np.min(group_costs[moving] / self.group_gc[moving])) if moving.any() else 0.0
+        return ModeCosts(mode, group_costs, max(per_metre, 0.0) * _HEURISTIC_SLACK)
+
+    def update_mode(self, costs, scores, edges):
+        """edges가 속한 그룹의 비용만 다시 계산한 새 ModeCosts (기존 객체는 그대로)"""
+        groups = np.unique(self.edge_group[np.asarray(edges, dtype=np.int64)])
+        if groups.size == 0:
+            return costs
+        ends = np.append(self.group_edge[1:], len(self.edge_group))
+        counts = ends[groups] - self.group_edge[groups]
+        first = np.cumsum(counts) - counts
+        idx = np.repeat(self.group_edge[groups] - first, counts) + np.arange(counts.sum())
+
+        edge_costs = mode_edge_costs(self.snapshot.edge_length[idx], np.asarray(scores)[idx], costs.mode)
+        group_costs = np.minimum.reduceat(edge_costs, first)
+
+        array = costs.array.copy()
+        array[groups] = group_costs
+        forward = list(costs.forward)
+        for g, c in zip(groups.tolist(), group_costs.tolist()):
+            forward[g] = c
+        # per_metre는 기존 값 이하로만 갱신하므로 하한이 유지된다
+        gc = self.group_gc[groups]
+        moving = gc > 0
+        per_metre = costs.per_metre
+        if moving.any():
+            per_metre = min(per_metre, float(np.min(group_costs[moving] / gc[moving])) * _HEURISTIC_SLACK)
+        return ModeCosts(costs.mode, array, max(per_metre, 0.0), forward)
+
+    def _reverse_csr(self):
+        """도착 노드 기준 CSR (rev_indptr, 이전 노드, 그룹 인덱스)"""
+        if self._reverse is None:
+            order = np.argsort(self.group_target, kind='stable')
+            counts = np.bincount(self.group_target, minlength=self.n_nodes)
+            rev_indptr = np.zeros(self.n_nodes + 1, dtype=np.int64)
+            np.cumsum(counts, out=rev_indptr[1:])
+            sources = np.asarray(self._sources, dtype=np.int64)
+            self._reverse = (rev_indptr.tolist(), sources[order].tolist(), order.tolist())
+        return self._reverse
+
+    def distance_bound(self, target, per_metre):
+        """h(v) = per_metre * 대원거리(v, target) (노드별 메모이즈)"""
+        lat, lng, coslat = self._lat, self._lng, self._coslat
+        lat_t, lng_t, cos_t = lat[target], lng[target], coslat[target]
+        scale = 2 * EARTH_RADIUS_M * per_metre
+        memo = {}
+        sin, asin, sqrt = math.sin, math.asin, math.sqrt
+
+        def h(v):
+            r = memo.get(v)
+            if r is None:
+                a = sin((lat[v] - lat_t) / 2) ** 2 + cos_t * coslat[v] * sin((lng[v] - lng_t) / 2) ** 2
+                r = memo[v] = scale * asin(sqrt(min(a, 1.0)))
+            return r
+        return h
+
+    def search(self, source, target, costs, algorithm='astar', landmarks=None, landmark_mode=None):
+        """알고리즘 이름으로 탐색. 경로가 없으면 None
+
+        alt / bidirectional_alt 는 landmarks(LandmarkIndex)가 필요하다.
+        landmark_mode: 하한으로 쓸 거리표 모드 (기본 costs.mode, 그 비용이 costs 이하여야 함)
+        """
+        landmark_mode = landmark_mode or costs.mode
+        if algorithm == 'dijkstra':
+            return self.dijkstra(source, target, costs)
+        if algorithm == 'astar':
+            return self.astar(source, target, costs)
+        if algorithm == 'bidirectional':
+            return self.bidirectional(source, target, costs, heuristic=False)
+        if algorithm == 'bidirectional_astar':
+            return self.bidirectional(source, target, costs, heuristic=True)
+        if algorithm in ('alt', 'bidirectional_alt'):
+            if landmarks is None:
+                raise ValueError("ALT 탐색에는 랜드마크 인덱스가 필요합니다.")
+            if algorithm == 'alt':
+                h_t = landmarks.potential(source, target, landmark_mode)
+                return self.astar(source, target, costs, potential=h_t, algorithm='alt')
+            h_t, h_s = landmarks.potential_pair(source, target, landmark_mode)
+            return self.bidirectional(source, target, costs, potentials=(h_t, h_s), algorithm='bidirectional_alt')
+        raise ValueError(f"알 수 없는 탐색 알고리즘입니다: {algorithm}")
+
+    def distances_from(self, source, costs, reverse=False):
+        """단일 출발 전체 최단거리 배열 [N] (reverse=True면 source까지의 거리, 도달 불가 inf)"""
+        if reverse:
+            indptr, nbrs, groups = self._reverse_csr()
+        else:
+            indptr, nbrs, groups = self._indptr, self._targets, None
+        cost = costs.forward
+        dist = {source: 0.0}
+        settled = set()
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            for i in range(indptr[u], indptr[u + 1]):
+                v = nbrs[i]
+                nd = d + cost[groups[i] if groups else i]
+                if nd < dist.get(v, float('inf')):
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        out = np.full(self.n_nodes, np.inf)
+        if dist:
+            out[np.fromiter(dist.keys(), dtype=np.int64, count=len(dist))] = np.fromiter(
+                dist.values(), dtype=np.float64, count=len(dist))
+        return out
+
+    def one_to_many(self, source, targets, costs):
+        """한 출발지에서 여러 도착지까지 Dijkstra 한 번. {도착지: SearchResult} (도달 불가는 빠짐)
+
+        모든 도착지가 확정되면 멈춘다. settled는 공유 탐색 전체의 확정 노드 수.
+        """
+        indptr, nbrs, cost = self._indptr, self._targets, costs.forward
+        remaining = set(targets)
+        found = []
+        dist = {source: 0.0}
+        pred = {}
+        settled = set()
+        counter = itertools.count()
+        heap = [(0.0, next(counter), source)]
+        while heap and remaining:
+            d, _, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            if u in remaining:
+                remaining.discard(u)
+                found.append(u)
+            for g in range(indptr[u], indptr[u + 1]):
+                v = nbrs[g]
+                nd = d + cost[g]
+                if nd < dist.get(v, float('inf')):
+                    dist[v] = nd
+                    pred[v] = g
+                    heapq.heappush(heap, (nd, next(counter), v))
+        return {t: self._unwind(source, t, pred, {}, t, dist[t], len(settled), 'one_to_many') for t in found}
+
+    def dijkstra(self, source, target, costs):
+        """이진 힙 Dijkstra. 경로가 없으면 None"""
+        indptr, targets, cost = self._indptr, self._targets, costs.forward
+        dist = {source: 0.0}
+        pred = {}
+        settled = set()
+        counter = itertools.count()
+        heap = [(0.0, next(counter), source)]
+        while heap:
+            d, _, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            if u == target:
+                return self._unwind(source, target, pred, {}, target, d, len(settled), 'dijkstra')
+            for g in range(indptr[u], indptr[u + 1]):
+                v = targets[g]
+                nd = d + cost[g]
+                if nd < dist.get(v, float('inf')):
+                    dist[v] = nd
+                    pred[v] = g
+                    heapq.heappush(heap, (nd, next(counter), v))
+        return None
+
+    def astar(self, source, target, costs, potential=None, algorithm='astar'):
+        """A*. potential 미지정 시 대원거리 하한 사용 (일관된 휴리스틱이어야 함)"""
+        indptr, targets, cost = self._indptr, self._targets, costs.forward
+        h = potential or self.distance_bound(target, costs.per_metre)
+        dist = {source: 0.0}
+        pred = {}
+        settled = set()
+        counter = itertools.count()
+        heap = [(h(source), next(counter), source)]
+        while heap:
+            _, _, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            d = dist[u]
+            if u == target:
+                return self._unwind(source, target, pred, {}, target, d, len(settled), algorithm)
+            for g in range(indptr[u], indptr[u + 1]):
+                v = targets[g]
+                nd = d + cost[g]
+                if nd < dist.get(v, float('inf')):
+                    dist[v] = nd
+                    pred[v] = g
+                    heapq.heappush(heap, (nd + h(v), next(counter), v))
+        return None
+
+    def bidirectional(self, source, target, costs, heuristic=True, potentials=None, algorithm=None):
+        """양방향 탐색. heuristic=True면 평균 포텐셜 p(v) = (h_t(v) - h_s(v)) / 2 로 축소 비용 사용
+
+        potentials: (h_t, h_s) 하한 함수 쌍 (미지정 시 대원거리 하한)
+        """
+        heuristic = heuristic or potentials is not None
+        algorithm = algorithm or ('bidirectional_astar' if heuristic else 'bidirectional')
+        if source == target:
+            return SearchResult([source], [], 0.0, 1, algorithm)
+        indptr, targets, cost = self._indptr, self._targets, costs.forward
+        rev_indptr, rev_sources, rev_groups = self._reverse_csr()
+
+        if heuristic:
+            h_t, h_s = potentials or (self.distance_bound(target, costs.per_metre),
+                                      self.distance_bound(source, costs.per_metre))
+            memo = {}
+
+            def p(v):
+                r = memo.get(v)
+                if r is None:
+                    r = memo[v] = 0.5 * (h_t(v) - h_s(v))
+                return r
+        else:
+            def p(v):
+                return 0.0
+
+        inf = float('inf')
+        counter = itertools.count()
+        dist_f, dist_b = {source: 0.0}, {target: 0.0}
+        pred, succ = {}, {}
+        closed_f, closed_b = set(), set()
+        heap_f, heap_b = [(0.0, next(counter), source)], [(0.0, next(counter), target)]
+        best, meet = inf, None
+
+        while heap_f and heap_b:
+            if heap_f[0][0] + heap_b[0][0] >= best:
+                break
+            if heap_f[0][0] <= heap_b[0][0]:
+                d, _, u = heapq.heappop(heap_f)
+                if u in closed_f:
+                    continue
+                closed_f.add(u)
+                pu = p(u)
+                for g in range(indptr[u], indptr[u + 1]):
+                    v = targets[g]
+                    nd = d + cost[g] + p(v) - pu
+                    if nd < dist_f.get(v, inf):
+                        dist_f[v] = nd
+                        pred[v] = g
+                        heapq.heappush(heap_f, (nd, next(counter), v))
+                        if v in dist_b and nd + dist_b[v] < best:
+                            best, meet = nd + dist_b[v], v
+            else:
+                d, _, u = heapq.heappop(heap_b)
+                if u in closed_b:
+                    continue
+                closed_b.add(u)
+                pu = p(u)
+                for r in range(rev_indptr[u], rev_indptr[u + 1]):
+                    v = rev_sources[r]
+                    g = rev_groups[r]
+                    nd = d + cost[g] + pu - p(v)
+                    if nd < dist_b.get(v, inf):
+                        dist_b[v] = nd
+                        succ[v] = g
+                        heapq.heappush(heap_b, (nd, next(counter), v))
+                        if v in dist_f and dist_f[v] + nd < best:
+                            best, meet = dist_f[v] + nd, v
+
+        if meet is None:
+            return None
+        true_cost = best - p(target) + p(source)
+        return self._unwind(source, target, pred, succ, meet, true_cost,
+                            len(closed_f) + len(closed_b), algorithm)
+
+    def _unwind(self, source, target, pred, succ, meet, cost, settled, algorithm):
+        nodes = [meet]
+        groups = []
+        v = meet
+        while v != source:
+            g = pred[v]
+            groups.append(g)
+            v = self._sources[g]
+            nodes.append(v)
+        nodes.reverse()
+        groups.reverse()
+        v = meet
+        while v != target:
+            g = succ[v]
+            groups.append(g)
+            v = self._targets[g]
+            nodes.append(v)
+        return SearchResult(nodes, groups, cost, settled, algorithm)
+
+    def bounded_tree(self, root, costs, limit, bound, reverse=False):
+        """root에서 나가는(reverse면 root로 들어오는) 최단거리 트리
+
+        d(v) + bound(v) > limit 인 노드는 넓히지 않는다 (bound는 반대쪽 끝까지의 하한).
+        반환: (거리 dict, 트리 그룹 dict — 정방향은 v로 들어온 그룹, 역방향은 v에서 나간 그룹)
+        """
+        if reverse:
+            indptr, nbrs, groups = self._reverse_csr()
+        else:
+            indptr, nbrs, groups = self._indptr, self._targets, None
+        cost = costs.forward
+        dist = {root: 0.0}
+        tree = {}
+        settled = set()
+        heap = [(0.0, root)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            for i in range(indptr[u], indptr[u + 1]):
+                v = nbrs[i]
+                g = groups[i] if groups else i
+                nd = d + cost[g]
+                if nd < dist.get(v, float('inf')) and nd + bound(v) <= limit:
+                    dist[v] = nd
+                    tree[v] = g
+                    heapq.heappush(heap, (nd, v))
+        return dist, tree, len(settled)
+
+    def alternatives(self, best, costs, k=2, stretch=ALT_STRETCH, max_share=ALT_MAX_SHARE,
+                     method='plateau', potentials=None):
+        """최단 경로 best(SearchResult)와 충분히 다른 대안 경로 최대 k개 (SearchResult 목록)
+
+        plateau: 양방향 최단거리 트리를 한 번씩 만들고 두 트리가 겹치는 구간(plateau)이 긴
+                 경유 경로부터 고른다. 추가 탐색 없이 트리에서 경로를 조립한다.
+        penalty: 고른 경로의 비용을 (1 + ALT_PENALTY)배씩 올려 가며 다시 탐색한다.
+                 비용은 늘어나기만 하므로 potentials(대원거리/ALT 하한)를 그대로 재사용한다.
+        조건: 원래 비용 <= stretch * 최단 비용, 이미 고른 경로와 겹치는 길이 <= max_share * 길이.
+        potentials: (h_t, h_s) 하한 함수 쌍 (미지정 시 대원거리 하한)
+        """
+        source, target = best.nodes[0], best.nodes[-1]
+        if k <= 0 or source == target:
+            return []
+        h_t, h_s = potentials or (self.distance_bound(target, costs.per_metre),
+                                  self.distance_bound(source, costs.per_metre))
+        limit = best.cost * stretch
+        chosen = [best]
+        group_length = self.snapshot.edge_length[self.group_edge]
+
+        def accept(result):
+            if result is None or result.cost > limit or len(set(result.nodes)) != len(result.nodes):
+                return False
+            groups = np.asarray(result.groups, dtype=np.int64)
+            length = group_length[groups].sum()
+            for other in chosen:
+                if group_length[np.intersect1d(groups, other.groups)].sum() > max_share * length:
+                    return False
+            chosen.append(result)
+            return True
+
+        if method == 'plateau':
+            self._plateau_alternatives(source, target, costs, limit, h_t, h_s, k, accept)
+        elif method == 'penalty':
+            self._penalty_alternatives(best, costs, limit, h_t, k, accept)
+        else:
+            raise ValueError(f"알 수 없는 대안 경로 방식입니다: {method}")
+        return chosen[1:]
+
+    def _plateau_alternatives(self, source, target, costs, limit, h_t, h_s, k, accept):
+        dist_f, pred, settled_f = self.bounded_tree(source, costs, limit, h_t)
+        dist_b, succ, settled_b = self.bounded_tree(target, costs, limit, h_s, reverse=True)
+        settled = settled_f + settled_b
+        sources, targets = self._sources, self._targets
+
+        # 두 트리가 같은 그룹을 쓰는 구간 u -> v 를 이어 plateau 사슬로 만든다
+        step = {}
+        for v, g in pred.items():
+            u = sources[g]
+            if succ.get(u) == g:
+                step[u] = g
+        heads = set(step) - {targets[g] for g in step.values()}
+        plateaus = []
+        for a in heads:
+            b = a
+            while b in step:
+                b = targets[step[b]]
+            via = dist_f[a] + dist_b[a]
+            if via <= limit:
+                plateaus.append((dist_f[b] - dist_f[a], a, b, via))
+        plateaus.sort(key=lambda p: (-p[0], p[3]))
+
+        found = 0
+        for _, a, b, via in plateaus:
+            groups = []
+            v = a
+            while v != source:
+                groups.append(pred[v])
+                v = sources[pred[v]]
+            groups.reverse()
+            v = a
+            while v != target:
+                groups.append(succ[v])
+                v = targets[succ[v]]
+            nodes = [source] + [targets[g] for g in groups]
+            if accept(SearchResult(nodes, groups, via, settled, 'plateau')):
+                found += 1
+                if found == k:
+                    return
+
+    def _penalty_alternatives(self, best, costs, limit, h_t, k, accept):
+        forward = list(costs.forward)
+        penalised = ModeCosts(costs.mode, costs.array, costs.per_metre, forward)
+        last = best
+        found = 0
+        for _ in range(k * ALT_PENALTY_ROUNDS):
+            for g in last.groups:
+                forward[g] *= 1 + ALT_PENALTY
+            result = self.astar(best.nodes[0], best.nodes[-1], penalised, potential=h_t, algorithm='penalty')
+            if result is None:
+                return
+            cost = float(costs.array[result.groups].sum()) if result.groups else 0.0
+            result = result._replace(cost=cost)
+            last = result
+            if accept(result):
+                found += 1
+                if found == k:
+                    return
+
+
+def check_parity(snapshot, scores, pairs, mode='fast'):
+    """networkx shortest_path와 노드 순서를 비교. 불일치 (출발, 도착) 목록 반환"""
+    import networkx as nx
+
+    G = snapshot.to_networkx(scores)
+    engine = RouteEngine(snapshot)
+    costs = engine.compile_mode(scores, mode)
+
+    def weight_function(u, v, d):
+        # MultiDiGraph에서는 d가 {key: 속성} 이므로 병렬 엣지 중 최솟값
+        best = float('inf')
+        for attr in d.values():
+            length = attr.get('length', 10)
+            risk = attr.get('risk_score', 0)
+            if mode == 'safe':
+                if risk >= 80: length *= 1000
+                elif risk >= 60: length *= 100
+            best = min(best, length)
+        return best
+
+    osmids = snapshot.node_osmid.tolist()
+    mismatches = []
+    for s, t in pairs:
+        try:
+            expected = nx.shortest_path(G, osmids[s], osmids[t], weight=weight_function)
+        except nx.NetworkXNoPath:
+            expected = None
+        result = engine.dijkstra(s, t, costs)
+        actual = [osmids[n] for n in result.nodes] if result else None
+        if actual != expected:
+            mismatches.append((osmids[s], osmids[t]))
+    return mismatches
+
+
+def _parity(args):
+    from services.graph_snapshot import GraphSnapshot
+
+    snapshot = GraphSnapshot.load(args.snapshot)
+    rng = random.Random(args.seed)
+    pairs = [(rng.randrange(snapshot.n_nodes), rng.randrange(snapshot.n_nodes)) for _ in range(args.pairs)]
+    failed = False
+    for mode in MODES:
+        mismatches = check_parity(snapshot, snapshot.edge_scores, pairs, mode)
+        print(f"[{mode}] {len(pairs) - len(mismatches)}/{len(pairs)} 일치")
+        for orig, dest in mismatches:
+            print(f"   ❌ 불일치: {orig} -> {dest}")
+        failed = failed or bool(mismatches)
+    raise SystemExit(1 if failed else 0)
+
+
+def _compare(args):
+    from services.graph_snapshot import GraphSnapshot
+    from services.route_index import LandmarkIndex, index_path
+
+    snapshot = GraphSnapshot.load(args.snapshot)
+    engine = RouteEngine(snapshot)
+    landmarks = LandmarkIndex.load(index_path(args.snapshot)) if os.path.exists(index_path(args.snapshot)) else None
+    rng = random.Random(args.seed)
+    pairs = [(rng.randrange(snapshot.n_nodes), rng.randrange(snapshot.n_nodes)) for _ in range(args.pairs)]
+
+    for mode in MODES:
+        costs = engine.compile_mode(snapshot.edge_scores, mode)
+        baseline = [engine.dijkstra(s, t, costs) for s, t in pairs]
+        print(f"[{mode}] (노드당 최소 비용 {costs.per_metre:.4f}/m)")
+        for algorithm in ALGORITHMS:
+            if algorithm.endswith('alt') and (landmarks is None or not landmarks.is_valid(snapshot, mode, costs)):
+                print(f"   {algorithm:<20} (ALT 인덱스 없음/만료, 건너뜀)")
+                continue
+            settled, wrong = 0, 0
+            started = time.perf_counter()
+            for (s, t), base in zip(pairs, baseline):
+                result = engine.search(s, t, costs, algorithm, landmarks=landmarks)
+                if (result is None) != (base is None) or (
+                        result and not math.isclose(result.cost, base.cost, rel_tol=1e-9)):
+                    wrong += 1
+                settled += result.settled if result else 0
+            elapsed_ms = (time.perf_counter() - started) * 1000 / len(pairs)
+            print(f"   {algorithm:<20} 평균 확정 노드 {settled / len(pairs):>10.1f}  "
+                  f"평균 {elapsed_ms:8.2f}ms  비용 불일치 {wrong}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m services.route_engine', description='경로 탐색 엔진 도구')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_parity = sub.add_parser('parity', help='networkx shortest_path 와 결과 비교')
+    p_parity.add_argument('snapshot')
+    p_parity.add_argument('--pairs', type=int, default=50)
+    p_parity.add_argument('--seed', type=int, default=0)
+    p_parity.set_defaults(func=_parity)
+
+    p_compare = sub.add_parser('compare', help='알고리즘별 확정 노드 수/시간 비교')
+    p_compare.add_argument('snapshot')
+    p_compare.add_argument('--pairs', type=int, default=200)
+    p_compare.add_argument('--seed', type=int, default=0)
+    p_compare.set_defaults(func=_compare)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
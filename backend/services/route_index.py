@@ -0,0 +1,259 @@
+"""
+ALT(A*, Landmarks, Triangle inequality) 전처리 인덱스
+
+모드(fast, safe)별로 랜드마크 L개에 대한 정방향/역방향 최단거리 표를 만들어
+스냅샷 옆(<스냅샷>.alt)에 저장한다. 질의 시 삼각부등식으로 얻은 하한을
+A* 포텐셜로 사용한다.
+
+위험 점수가 바뀌면 지도는 그대로 두고 해당 모드의 표만 다시 계산(customise)한다.
+fast 모드 비용은 길이뿐이라 점수 변경의 영향을 받지 않는다.
+
+  python -m services.route_index build graph_seoul.snap --landmarks 16
+  python -m services.route_index customise graph_seoul.snap --mode safe
+"""
+import argparse
+import hashlib
+import math
+import os
+import random
+import time
+import numpy as np
+
+from services.graph_snapshot import read_container, write_container
+from services.route_engine import MODES, RouteEngine
+
+ACTIVE_LANDMARKS = 4
+# 부동소수점 오차로 하한이 실제 거리를 넘지 않도록 두는 여유
+_BOUND_SLACK = 1 - 1e-9
+# 하한을 노드별로 계산하다가 전체 한 번 계산으로 바꾸는 방문 노드 비율 (노드별 계산이 약 15배 비쌈)
+_LAZY_SHARE = 1 / 32
+
+
+def cost_digest(costs):
+    """비용 벡터 지문 (인덱스가 현재 비용으로 만들어졌는지 판별)"""
+    return hashlib.blake2b(np.ascontiguousarray(costs.array).tobytes(), digest_size=8).hexdigest()
+
+
+def graph_identity(snapshot):
+    meta = snapshot.meta
+    return {'created': meta.get('created'), 'n_nodes': snapshot.n_nodes, 'n_edges': snapshot.n_edges}
+
+
+def index_path(snapshot_path):
+    return f"{snapshot_path}.alt"
+
+
+class LandmarkIndex:
+    def __init__(self, meta, arrays):
+        self.meta = meta
+        self.arrays = arrays
+        self.landmarks = arrays['landmarks']
+
+    @property
+    def modes(self):
+        return dict(self.meta.get('modes', {}))
+
+    def is_valid(self, snapshot, mode, costs):
+        """이 모드의 표가 현재 그래프/비용으로 만들어졌는지"""
+        return (self.meta.get('graph') == graph_identity(snapshot)
+                and self.modes.get(mode) == cost_digest(costs))
+
+    @classmethod
+    def build(cls, engine, costs_by_mode, n_landmarks=16, seed=0):
+        """farthest 방식으로 랜드마크를 고르고 모든 모드의 표를 계산"""
+        landmarks = select_landmarks(engine, costs_by_mode['fast'], n_landmarks, seed)
+        index = cls({'kind': 'alt', 'graph': graph_identity(engine.snapshot), 'modes': {}},
+                    {'landmarks': landmarks})
+        for mode, costs in costs_by_mode.items():
+            index.customise(engine, mode, costs)
+        return index
+
+    @classmethod
+    def derived(cls, engine, landmarks, mode, costs):
+        """기존 랜드마크로 한 모드의 표만 계산한 인덱스 (비용 프로파일용, 저장하지 않음)"""
+        index = cls({'kind': 'alt', 'graph': graph_identity(engine.snapshot), 'modes': {}},
+                    {'landmarks': landmarks})
+        index.customise(engine, mode, costs)
+        return index
+
+    def customise(self, engine, mode, costs):
+        """한 모드의 거리표만 다시 계산 (랜드마크는 유지)"""
+        lm = self.landmarks.tolist()
+        self.arrays[f'{mode}_from'] = np.vstack([engine.distances_from(l, costs) for l in lm])
+        self.arrays[f'{mode}_to'] = np.vstack([engine.distances_from(l, costs, reverse=True) for l in lm])
+        self.meta['modes'] = {**self.modes, mode: cost_digest(costs)}
+
+    def drop_mode(self, mode):
+        """더 이상 유효하지 않은 모드의 표 제거"""
+        self.arrays.pop(f'{mode}_from', None)
+        self.arrays.pop(f'{mode}_to', None)
+        self.meta['modes'] = {m: d for m, d in self.modes.items() if m != mode}
+
+    @classmethod
+    def load(cls, path):
+        meta, arrays = read_container(path)
+        return cls(meta, arrays)
+
+    def save(self, path):
+        write_container(path, dict(self.meta), dict(self.arrays))
+
+    def _active(self, mode, source, target):
+        """(source, target) 하한이 가장 큰 랜드마크 ACTIVE_LANDMARKS개"""
+        d_from, d_to = self.arrays[f'{mode}_from'], self.arrays[f'{mode}_to']
+        with np.errstate(invalid='ignore'):
+            bound = np.fmax(d_from[:, target] - d_from[:, source], d_to[:, source] - d_to[:, target])
+        bound = np.where(np.isfinite(bound), bound, -np.inf)
+        k = min(ACTIVE_LANDMARKS, len(bound))
+        return np.argsort(-bound, kind='stable')[:k]
+
+    def _bounds_all(self, d_from, d_to, node, active, toward):
+        """모든 노드에 대한 하한 [N] (numpy로 한 번에)"""
+        d_from, d_to = d_from[active], d_to[active]
+        with np.errstate(invalid='ignore'):
+            if toward:
+                a = d_from[:, node:node + 1] - d_from
+                b = d_to - d_to[:, node:node + 1]
+            else:
+                a = d_from - d_from[:, node:node + 1]
+                b = d_to[:, node:node + 1] - d_to
+        a = np.where(np.isfinite(a), a, 0.0)
+        b = np.where(np.isfinite(b), b, 0.0)
+        return (np.maximum(np.maximum(a, b).max(axis=0), 0.0) * _BOUND_SLACK).tolist()
+
+    def _bound(self, mode, node, active, toward):
+        """랜드마크 하한 함수 h(v)
+
+        toward=True면 h(v) <= d(v, node), False면 h(v) <= d(node, v).
+        무한대가 섞인 항(도달 불가 랜드마크)은 0으로 본다.
+        탐색이 방문한 노드만 계산해 메모이즈하고, 방문 노드가 전체의 _LAZY_SHARE를 넘으면
+        그때 전체 노드 하한을 numpy로 한 번에 계산해 이후 조회에 쓴다 (짧은 경로는 O(방문 노드),
+        긴 경로도 전체 계산 1회 이내).
+        """
+        # memmap 서브클래스를 거치지 않는 일반 ndarray 뷰 (원소 접근이 더 빠름)
+        d_from, d_to = np.asarray(self.arrays[f'{mode}_from']), np.asarray(self.arrays[f'{mode}_to'])
+        sub, add = [], []  # c - x(v) 항, x(v) - c 항
+        for l in active.tolist():
+            f_node, t_node = d_from.item(l, node), d_to.item(l, node)
+            if toward:
+                sub.append((d_from[l].item, f_node))
+                add.append((d_to[l].item, t_node))
+            else:
+                add.append((d_from[l].item, f_node))
+                sub.append((d_to[l].item, t_node))
+        # c가 무한대면 그 항은 모든 v에서 inf/nan 이므로 미리 뺀다. x(v)가 무한대인 항은 비교에서 거른다
+        sub = [(item, c) for item, c in sub if math.isfinite(c)]
+        inf = float('inf')
+        limit = max(int(d_from.shape[1] * _LAZY_SHARE), 1)
+        memo = {}
+        full = None
+
+        def h(v):
+            nonlocal full
+            if full is not None:
+                return full[v]
+            r = memo.get(v)
+            if r is None:
+                r = 0.0
+                for item, c in sub:
+                    x = c - item(v)
+                    if x > r:
+                        r = x
+                for item, c in add:
+                    x = item(v) - c
+                    if r < x < inf:
+                        r = x
+                r = memo[v] = r * _BOUND_SLACK
+                if len(memo) >= limit:
+                    full = self._bounds_all(d_from, d_to, node, active, toward)
+            return r
+        return h
+
+    def potential(self, source, target, mode):
+        """A*용 h_t(v)"""
+        return self._bound(mode, target, self._active(mode, source, target), toward=True)
+
+    def potential_pair(self, source, target, mode):
+        """양방향 탐색용 (h_t, h_s)"""
+        active = self._active(mode, source, target)
+        return self._bound(mode, target, active, toward=True), self._bound(mode, source, active, toward=False)
+
+
+def select_landmarks(engine, costs, n_landmarks, seed=0):
+    """farthest 선택: 이미 고른 랜드마크들과의 최소 거리가 가장 먼 노드를 차례로 추가"""
+    rng = random.Random(seed)
+    n_landmarks = min(n_landmarks, engine.n_nodes)
+    first = rng.randrange(engine.n_nodes)
+    nearest = engine.distances_from(first, costs)
+    chosen = []
+    for _ in range(n_landmarks):
+        reachable = np.where(np.isfinite(nearest), nearest, -1.0)
+        if chosen:
+            reachable[chosen] = -1.0
+        candidate = int(np.argmax(reachable))
+        if reachable[candidate] < 0:
+            break
+        chosen.append(candidate)
+        nearest = np.minimum(nearest, engine.distances_from(candidate, costs))
+    return np.array(chosen, dtype=np.int32)
+
+
+def _engine_and_costs(args):
+    from services.graph_snapshot import GraphSnapshot
+    from services.risk_scores import load_score_table, map_scores, score_fingerprint
+
+    snapshot = GraphSnapshot.load(args.snapshot)
+    scores = snapshot.edge_scores
+    if args.csv and os.path.exists(args.csv) and snapshot.meta.get('score_source') != score_fingerprint(args.csv):
+        scores = map_scores(snapshot.osmid_offsets, snapshot.osmid_values, load_score_table(args.csv))
+    engine = RouteEngine(snapshot)
+    return engine, engine.compile_costs(scores)
+
+
+def _build(args):
+    started = time.time()
+    engine, costs = _engine_and_costs(args)
+    index = LandmarkIndex.build(engine, costs, n_landmarks=args.landmarks, seed=args.seed)
+    out = index_path(args.snapshot)
+    index.save(out)
+    print(f"✅ ALT 인덱스 저장: {out} (랜드마크 {len(index.landmarks)}개, 모드 {list(index.modes)}, "
+          f"{time.time() - started:.1f}s)")
+
+
+def _customise(args):
+    started = time.time()
+    engine, costs = _engine_and_costs(args)
+    path = index_path(args.snapshot)
+    index = LandmarkIndex.load(path)
+    for mode in args.mode or MODES:
+        if index.is_valid(engine.snapshot, mode, costs[mode]):
+            print(f"   - [{mode}] 비용 변화 없음, 건너뜀")
+            continue
+        index.customise(engine, mode, costs[mode])
+        print(f"   - [{mode}] 거리표 재계산 완료")
+    index.save(path)
+    print(f"✅ ALT 인덱스 갱신: {path} ({time.time() - started:.1f}s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m services.route_index', description='ALT 랜드마크 인덱스 도구')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_build = sub.add_parser('build', help='랜드마크 선택 + 모든 모드 거리표 계산')
+    p_build.add_argument('snapshot')
+    p_build.add_argument('--csv', default='final_freezing_score.csv')
+    p_build.add_argument('--landmarks', type=int, default=16)
+    p_build.add_argument('--seed', type=int, default=0)
+    p_build.set_defaults(func=_build)
+
+    p_custom = sub.add_parser('customise', help='점수 변경 후 바뀐 모드의 거리표만 재계산')
+    p_custom.add_argument('snapshot')
+    p_custom.add_argument('--csv', default='final_freezing_score.csv')
+    p_custom.add_argument('--mode', action='append', choices=MODES)
+    p_custom.set_defaults(func=_customise)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+멀티 프로세스(prefork) 서버에서 워커 간 위험 점수 동기화
+
+워커들은 부모가 올린 같은 RiskState에서 fork되므로, 점수 변경(전체 재로드 / road_id 부분 갱신)을
+SQLite 이벤트 로그에 순서대로 남기고 모든 워커가 같은 순서로 적용한다. 같은 상태에서 같은 이벤트를
+같은 순서로 적용하므로 워커마다 version/revision이 일치해 공유 경로 캐시(SqliteRouteStore)를 함께 쓸 수 있다.
+나중에 다시 fork된 워커도 로그를 처음부터 따라가 같은 상태가 된다.
+
+리더(잠금 파일을 잡은 워커 하나)만 점수 CSV 변경 감시와 히트맵 타일 갱신을 맡는다.
+리더가 죽으면 잠금이 풀리고 다시 뜬 워커가 이어받는다.
+"""
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from services.risk_scores import score_fingerprint
+
+RELOAD, DELTA = 'reload', 'delta'
+
+log = logging.getLogger(__name__)
+
+
+class ScoreSync:
+    def __init__(self, finder, path, interval=1.0, watch_interval=0.0):
+        self.finder = finder
+        self.path = path
+        self.interval = interval
+        self.watch_interval = watch_interval
+        self.last_id = 0
+        self.leader = False
+        self._lead_fd = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._connect().execute('CREATE TABLE IF NOT EXISTS score_events ('
+                                'id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, payload TEXT, created_at REAL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def reset(self):
+        """서버 시작 시(부모 프로세스) 이전 실행의 이벤트를 지움 — 워커는 방금 올린 점수에서 시작"""
+        conn = self._connect()
+        conn.execute('DELETE FROM score_events')
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'score_events'").fetchone()
+        self.last_id = row[0] if row else 0
+
+    def after_fork(self):
+        """fork된 워커에서 호출: 부모의 연결/잠금을 버리고 리더 선출 후 동기화 스레드 시작"""
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.leader = self._try_lead()
+        self._thread = threading.Thread(target=self._follow, name='score-sync', daemon=True)
+        self._thread.start()
+        return self
+
+    def _try_lead(self):
+        fd = os.open(f"{self.path}.leader", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lead_fd = fd  # 프로세스가 끝날 때까지 잡고 있는다
+        return True
+
+    def submit(self, kind, payload=None):
+        """이벤트를 로그에 남기고 이 워커에 바로 적용해 결과 보고를 반환
+
+        쓰기 트랜잭션 안에서 밀린 이벤트를 먼저 적용하므로 로그 순서와 적용 순서가 같다.
+        적용이 실패하면(잘못된 delta 등) 로그에 남기지 않는다.
+        """
+        conn = self._connect()
+        with self._lock:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._catch_up(conn)
+                report = self._apply(kind, payload)
+                cur = conn.execute('INSERT INTO score_events (kind, payload, created_at) VALUES (?, ?, ?)',
+                                   (kind, json.dumps(payload), time.time()))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            self.last_id = cur.lastrowid
+        return report
+
+    def _apply(self, kind, payload):
+        if kind == RELOAD:
+            return self.finder.reload_scores()
+        if kind == DELTA:
+            return self.finder.apply_score_deltas(payload)
+        raise ValueError(f"알 수 없는 점수 이벤트입니다: {kind}")
+
+    def _catch_up(self, conn):
+        rows = conn.execute('SELECT id, kind, payload FROM score_events WHERE id > ? ORDER BY id',
+                            (self.last_id,)).fetchall()
+        for event_id, kind, payload in rows:
+            try:
+                self._apply(kind, json.loads(payload))
+            except Exception as e:
+                log.exception("❌ [오류] 점수 이벤트 #%d 적용 실패: %s", event_id, e)
+            self.last_id = event_id
+        return len(rows)
+
+    def _follow(self):
+        next_watch = time.monotonic() + self.watch_interval
+        while True:
+            time.sleep(self.interval)
+            try:
+                if self.leader and self.watch_interval > 0 and time.monotonic() >= next_watch:
+                    next_watch = time.monotonic() + self.watch_interval
+                    source = score_fingerprint(self.finder.csv_path)
+                    if source is not None and source != self.finder.state.source:
+                        self.submit(RELOAD)
+                        continue
+                with self._lock:
+                    self._catch_up(self._connect())
+            except Exception as e:
+                log.exception("❌ [오류] 점수 동기화 실패: %s", e)
+
+    def stats(self):
+        pending = self._connect().execute('SELECT COUNT(*) FROM score_events WHERE id > ?',
+                                          (self.last_id,)).fetchone()[0]
+        return {'last_event': self.last_id, 'pending_events': pending,
+                'leader': self.leader, 'following': self._thread is not None}
@@ -0,0 +1,188 @@
+"""
+출발/도착 좌표 스냅용 공간 인덱스
+
+노드 좌표와 엣지 geometry 선분을 지역 등거리 투영(미터)한 뒤 균일 격자에 넣는다.
+질의는 격자 창을 한 칸씩 넓혀 가며 찾고, 찾은 거리가 창 반경 안이면 확정한다.
+여러 점을 한 번의 벡터 연산으로 스냅하는 배치 API를 제공한다.
+"""
+import numpy as np
+
+from services.route_engine import EARTH_RADIUS_M
+
+DEFAULT_CELL_M = 150.0
+MAX_RING = 8
+
+
+def _point_segment_d2(px, py, ax, ay, bx, by):
+    """점-선분 거리 제곱 (배열)"""
+    dx, dy = bx - ax, by - ay
+    l2 = dx * dx + dy * dy
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = np.where(l2 > 0, ((px - ax) * dx + (py - ay) * dy) / l2, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    ex, ey = ax + t * dx - px, ay + t * dy - py
+    return ex * ex + ey * ey
+
+
+def _expand_ranges(starts, counts):
+    """[starts[i], starts[i] + counts[i]) 구간들을 이어 붙인 인덱스와 소속 구간 번호"""
+    owner = np.repeat(np.arange(len(counts)), counts)
+    first = np.cumsum(counts) - counts
+    return starts[owner] + (np.arange(owner.size) - first[owner]), owner
+
+
+class _SegmentGrid:
+    """선분(점은 길이 0 선분)을 bbox가 걸치는 모든 격자 칸에 등록"""
+
+    def __init__(self, ax, ay, bx, by, cell):
+        self.ax, self.ay, self.bx, self.by = ax, ay, bx, by
+        self.cell = cell
+        self.x0 = float(min(ax.min(), bx.min())) if ax.size else 0.0
+        self.y0 = float(min(ay.min(), by.min())) if ay.size else 0.0
+        ix0, ix1 = self._cx(np.minimum(ax, bx)), self._cx(np.maximum(ax, bx))
+        iy0, iy1 = self._cy(np.minimum(ay, by)), self._cy(np.maximum(ay, by))
+        self.nx = int(ix1.max()) + 1 if ax.size else 1
+        self.ny = int(iy1.max()) + 1 if ay.size else 1
+
+        width = ix1 - ix0 + 1
+        counts = width * (iy1 - iy0 + 1)
+        local, seg = _expand_ranges(np.zeros(len(counts), dtype=np.int64), counts)
+        cell_id = (iy0[seg] + local // width[seg]) * self.nx + ix0[seg] + local % width[seg]
+        order = np.argsort(cell_id, kind='stable')
+        self.items = seg[order]
+        self.ptr = np.zeros(self.nx * self.ny + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell_id, minlength=self.nx * self.ny), out=self.ptr[1:])
+
+    def _cx(self, x):
+        return np.floor((x - self.x0) / self.cell).astype(np.int64)
+
+    def _cy(self, y):
+        return np.floor((y - self.y0) / self.cell).astype(np.int64)
+
+    def in_box(self, x0, y0, x1, y1):
+        """bbox와 걸치는 칸에 등록된 선분 인덱스 (중복 없음, 후보이므로 호출자가 정확히 거른다)"""
+        if self.ax.size == 0:
+            return np.zeros(0, dtype=np.int64)
+        cx0, cx1 = (int(np.clip(c, 0, self.nx - 1)) for c in self._cx(np.array([x0, x1])))
+        cy0, cy1 = (int(np.clip(c, 0, self.ny - 1)) for c in self._cy(np.array([y0, y1])))
+        rows = np.arange(cy0, cy1 + 1) * self.nx
+        starts = self.ptr[rows + cx0]
+        ends = self.ptr[rows + cx1 + 1]
+        idx, _ = _expand_ranges(starts, ends - starts)
+        return np.unique(self.items[idx])
+
+    def nearest(self, px, py):
+        """각 점에서 가장 가까운 선분 인덱스와 거리 (선분이 없으면 -1, inf)"""
+        n = len(px)
+        best = np.full(n, -1, dtype=np.int64)
+        best_d = np.full(n, np.inf)
+        if self.ax.size == 0 or n == 0:
+            return best, best_d
+
+        pending = np.arange(n)
+        qcx, qcy = self._cx(px), self._cy(py)
+        for ring in range(1, MAX_RING + 1):
+            if pending.size == 0:
+                break
+            offs = np.arange(-ring, ring + 1)
+            dx, dy = np.meshgrid(offs, offs)
+            cx = qcx[pending, None] + dx.ravel()
+            cy = qcy[pending, None] + dy.ravel()
+            inside = (cx >= 0) & (cx < self.nx) & (cy >= 0) & (cy < self.ny)
+            cells = np.where(inside, cy * self.nx + cx, 0)
+            counts = np.where(inside, self.ptr[cells + 1] - self.ptr[cells], 0).ravel()
+            cand, slot = _expand_ranges(self.ptr[cells].ravel(), counts)
+            seg = self.items[cand]
+            q = pending[slot // cells.shape[1]]
+
+            if seg.size:
+                d2 = _point_segment_d2(px[q], py[q], self.ax[seg], self.ay[seg], self.bx[seg], self.by[seg])
+                # 후보는 질의 순서대로 이어져 있으므로 구간별 최솟값 후 첫 최소 위치를 고른다
+                per_q = counts.reshape(len(pending), -1).sum(axis=1)
+                hit = per_q > 0
+                group_min = np.minimum.reduceat(d2, (np.cumsum(per_q) - per_q)[hit])
+                at_min = np.flatnonzero(d2 == np.repeat(group_min, per_q[hit]))
+                hit_q, first = np.unique(q[at_min], return_index=True)
+                best[hit_q] = seg[at_min[first]]
+                best_d[hit_q] = np.sqrt(d2[at_min[first]])
+
+            # 창 반경 안에서 찾은 결과만 확정 (창 밖에 더 가까운 선분이 있을 수 없음)
+            pending = pending[~(best_d[pending] <= ring * self.cell)]
+
+        for q in pending.tolist():
+            d2 = _point_segment_d2(px[q], py[q], self.ax, self.ay, self.bx, self.by)
+            i = int(np.argmin(d2))
+            best[q], best_d[q] = i, float(np.sqrt(d2[i]))
+        return best, best_d
+
+
+class SpatialIndex:
+    def __init__(self, snapshot, cell_size=DEFAULT_CELL_M):
+        self.snapshot = snapshot
+        lat0 = float(np.mean(snapshot.node_y)) if snapshot.n_nodes else 37.5
+        self._ky = np.radians(1.0) * EARTH_RADIUS_M
+        self._kx = self._ky * np.cos(np.radians(lat0))
+
+        node_x, node_y = self.project(snapshot.node_y, snapshot.node_x)
+        self.node_x, self.node_y = node_x, node_y
+        self._nodes = _SegmentGrid(node_x, node_y, node_x, node_y, cell_size)
+
+        # 엣지 선분: geometry가 있으면 연속 좌표 쌍, 없으면 (출발 노드, 도착 노드)
+        geom_counts = np.diff(snapshot.geom_offsets)
+        coord_edge = np.repeat(np.arange(snapshot.n_edges), geom_counts)
+        gx, gy = self.project(snapshot.geom_coords[:, 1], snapshot.geom_coords[:, 0])
+        pair = np.flatnonzero(coord_edge[:-1] == coord_edge[1:]) if coord_edge.size > 1 else np.zeros(0, dtype=np.int64)
+        plain = np.flatnonzero(geom_counts == 0)
+        src, dst = snapshot.edge_source[plain], snapshot.edge_target[plain]
+
+        self.segment_edge = np.concatenate([coord_edge[pair], plain])
+        self._edges = _SegmentGrid(
+            np.concatenate([gx[pair], node_x[src]]), np.concatenate([gy[pair], node_y[src]]),
+            np.concatenate([gx[pair + 1], node_x[dst]]), np.concatenate([gy[pair + 1], node_y[dst]]),
+            cell_size,
+        )
+
+    def project(self, lats, lngs):
+        """위경도 -> 지역 등거리 투영 (미터)"""
+        return (np.asarray(lngs, dtype=np.float64) * self._kx,
+                np.asarray(lats, dtype=np.float64) * self._ky)
+
+    def nearest_nodes(self, lats, lngs):
+        """가장 가까운 노드 인덱스 [Q]"""
+        px, py = self.project(lats, lngs)
+        return self._nodes.nearest(px, py)[0]
+
+    def nodes_in_bbox(self, south, west, north, east):
+        """위경도 bbox 안의 노드 인덱스 (오름차순, 경계 포함)"""
+        (x0, x1), (y0, y1) = self.project([south, north], [west, east])
+        cand = self._nodes.in_box(x0, y0, x1, y1)
+        ys, xs = self.snapshot.node_y[cand], self.snapshot.node_x[cand]
+        return cand[(ys >= south) & (ys <= north) & (xs >= west) & (xs <= east)]
+
+    def nearest_edges(self, lats, lngs):
+        """가장 가까운 엣지 인덱스 [Q] (엣지가 없으면 -1)"""
+        return self._nearest_edges(*self.project(lats, lngs))
+
+    def _nearest_edges(self, px, py):
+        seg, _ = self._edges.nearest(px, py)
+        if self.segment_edge.size == 0:
+            return seg
+        return np.where(seg >= 0, self.segment_edge[np.maximum(seg, 0)], -1)
+
+    def snap(self, lats, lngs):
+        """가장 가까운 엣지의 두 끝점 중 더 가까운 노드 인덱스 [Q]"""
+        px, py = self.project(lats, lngs)
+        px, py = np.atleast_1d(px), np.atleast_1d(py)
+        edges = self._nearest_edges(px, py)
+        found = edges >= 0
+        if not found.any():
+            return self._nodes.nearest(px, py)[0]
+
+        e = np.maximum(edges, 0)
+        u, v = self.snapshot.edge_source[e], self.snapshot.edge_target[e]
+        du = (self.node_x[u] - px) ** 2 + (self.node_y[u] - py) ** 2
+        dv = (self.node_x[v] - px) ** 2 + (self.node_y[v] - py) ** 2
+        nodes = np.where(du < dv, u, v).astype(np.int64)
+        if not found.all():
+            nodes[~found] = self._nodes.nearest(px[~found], py[~found])[0]
+        return nodes
@@ -0,0 +1,59 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import BigInteger
+from sqlalchemy.ext.compiler import compiles
+
+# services / bench 패키지를 backend 기준으로 import (python -m services.x 와 같은 기준)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@compiles(BigInteger, 'sqlite')
+def _sqlite_bigint(type_, compiler, **kw):
+    # SQLite는 INTEGER PRIMARY KEY만 자동 증가 (users.user_id 등 BigInteger 키)
+    return 'INTEGER'
+
+
+@pytest.fixture
+def app_module(monkeypatch):
+    """Flask 앱 모듈 (메모리 SQLite, 테스트마다 빈 DB)"""
+    os.environ.setdefault('DATABASE_URI', 'sqlite://')
+    os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-' + '0' * 32)
+    import app as appmod
+
+    with appmod.app.app_context():
+        appmod.db.drop_all()
+        appmod.db.create_all()
+    monkeypatch.setattr(appmod, 'ADMIN_USERS', frozenset())
+    return appmod
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    """login(username, role) -> 회원가입 후 로그인한 Authorization 헤더"""
+    def _login(username, role='general', password='pw'):
+        client.post('/api/register', json={'username': username, 'password': password, 'role': role})
+        token = client.post('/api/login', json={'username': username, 'password': password}).get_json()['access_token']
+        return {'Authorization': f'Bearer {token}'}
+    return _login
+
+
+@pytest.fixture(scope='session')
+def grid_finder(tmp_path_factory):
+    """합성 격자 도시의 RouteFinder (앱 테스트용, 경로 캐시 없음)"""
+    from bench.city import grid_city, write_risk_csv
+    from services.graph_snapshot import GraphSnapshot
+    from services.route_algo import RouteFinder
+
+    root = tmp_path_factory.mktemp('grid')
+    snap_path, csv_path = str(root / 'grid.snap'), str(root / 'risk.csv')
+    snapshot = GraphSnapshot.from_graph(grid_city(10, seed=1), region='test grid')
+    snapshot.save(snap_path)
+    write_risk_csv(snapshot, csv_path, seed=1)
+    return RouteFinder(csv_path=csv_path, snapshot_path=snap_path)
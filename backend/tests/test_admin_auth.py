@@ -0,0 +1,33 @@
+"""관리자 API는 ADMIN_USERS만 허용 (사용자가 직접 고를 수 있는 role은 권한 근거가 아님)"""
+import pytest
+
+ADMIN_ENDPOINTS = [
+    ('post', '/api/admin/scores/reload', None),
+    ('post', '/api/admin/scores/delta', {'deltas': [{'road_id': 1, 'final_risk_score': 99}]}),
+    ('get', '/api/admin/route_cache', None),
+    ('get', '/api/admin/risk_tiles', None),
+]
+
+
+@pytest.mark.parametrize('method, url, body', ADMIN_ENDPOINTS)
+def test_self_registered_expert_is_forbidden(client, login, method, url, body):
+    headers = login('mallory', role='expert')
+    response = getattr(client, method)(url, json=body, headers=headers)
+    assert response.status_code == 403
+
+
+def test_expert_via_profile_is_forbidden(client, login):
+    client.post('/api/register', json={'username': 'eve', 'password': 'pw'})
+    headers = login('eve')
+    assert client.patch('/api/profile', json={'role': 'expert'}, headers=headers).status_code == 200
+    headers = login('eve')
+    assert client.post('/api/admin/scores/delta', json={'deltas': [{'road_id': 1}]}, headers=headers).status_code == 403
+
+
+@pytest.mark.parametrize('method, url, body', ADMIN_ENDPOINTS)
+def test_allowlisted_admin_passes(app_module, client, login, monkeypatch, method, url, body):
+    monkeypatch.setattr(app_module, 'ADMIN_USERS', frozenset({'ops'}))
+    headers = login('ops')
+    response = getattr(client, method)(url, json=body, headers=headers)
+    # 지도가 로딩되지 않은 테스트 앱이므로 권한 검사 다음 단계(503)까지 진행
+    assert response.status_code == 503
@@ -0,0 +1,56 @@
+"""services.job_queue: prefork 워커 간 작업 공유, 제출자별 조회/취소"""
+import sqlite3
+import threading
+import time
+
+from services.job_queue import CANCELLED, DONE, JobQueue, SqliteJobStore
+
+
+def _wait(queue, job_id, status, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(queue.get(job_id))
+
+
+def test_sqlite_store_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    # 같은 파일을 쓰는 두 워커 프로세스의 큐
+    submitter, other = JobQueue(1, 4, SqliteJobStore(path)), JobQueue(1, 4, SqliteJobStore(path))
+    release = threading.Event()
+    blocker = submitter.submit('test', {}, release.wait, 5)
+    queued = submitter.submit('test', {'n': 1}, lambda: {'ok': True})
+
+    assert other.get(queued)['params'] == {'n': 1}
+    assert other.cancel(queued)
+    release.set()
+    _wait(other, blocker, DONE)
+    assert submitter.get(queued)['status'] == CANCELLED
+
+    finished = submitter.submit('test', {}, lambda: {'ok': True})
+    assert _wait(other, finished, DONE)['result'] == {'ok': True}
+
+
+def test_jobs_are_scoped_to_owner(tmp_path):
+    for store in (None, SqliteJobStore(str(tmp_path / 'jobs.db'))):
+        jobs = JobQueue(1, 4, store)
+        job_id = jobs.submit('test', {}, lambda: {'ok': True}, owner='alice')
+        assert jobs.get(job_id, owner='bob') is None
+        assert not jobs.cancel(job_id, owner='bob')
+        assert _wait(jobs, job_id, DONE)['owner'] == 'alice'
+        assert jobs.get(job_id, owner='alice')['result'] == {'ok': True}
+
+
+def test_sqlite_store_adds_owner_to_old_files(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT, status TEXT, params TEXT, result TEXT, '
+                 'error TEXT, submitted_at REAL, started_at REAL, finished_at REAL, cancel_requested INTEGER DEFAULT 0)')
+    conn.commit()
+    conn.close()
+    jobs = JobQueue(1, 4, SqliteJobStore(path))
+    job_id = jobs.submit('test', {}, lambda: None, owner='alice')
+    assert _wait(jobs, job_id, DONE)['owner'] == 'alice'
@@ -0,0 +1,70 @@
+"""저장한 지역 그래프가 학습 그래프와 같은 Q 상태 정수를 내는지 (services.local_graph)"""
+import random
+
+import networkx as nx
+import pytest
+
+from bench.city import grid_city
+from services.graph_snapshot import GraphSnapshot
+from services.local_graph import (LocalGraphStore, extract_subgraph, graphs_path, nearest_node,
+                                  save_local_graphs, state_parity)
+from services.plow_engine import inference_tables
+
+DIST = 600
+
+
+def _shuffled(G, seed):
+    """노드/엣지 추가 순서만 다른 같은 그래프 (osmnx 응답 순서를 흉내)"""
+    rng = random.Random(seed)
+    nodes = list(G.nodes(data=True))
+    edges = list(G.edges(keys=True, data=True))
+    rng.shuffle(nodes)
+    rng.shuffle(edges)
+    H = nx.MultiDiGraph(crs='epsg:4326')
+    H.add_nodes_from(nodes)
+    H.add_edges_from(edges)
+    return H
+
+
+@pytest.fixture(scope='module')
+def trained(tmp_path_factory):
+    snapshot = GraphSnapshot.from_graph(grid_city(12, seed=5), region='test grid')
+    rng = random.Random(1)
+    bases, graphs, Q = [], [], {}
+    for i in rng.sample(range(snapshot.n_nodes), 3):
+        lat, lng = float(snapshot.node_y[i]), float(snapshot.node_x[i])
+        G = _shuffled(extract_subgraph(snapshot, lat, lng, dist=DIST), seed=i)
+        graph_dict, edge_attr = inference_tables(G)
+        full = (1 << len(edge_attr)) - 1
+        for u, nbs in graph_dict.items():
+            for v in nbs:
+                Q[((u, full), v)] = rng.random()
+        bases.append((lat, lng))
+        graphs.append((lat, lng, G, nearest_node(G, lat, lng)))
+    path = save_local_graphs(graphs_path(str(tmp_path_factory.mktemp('models') / 'q_table_test.pkl')),
+                             graphs, {'dist': DIST})
+    return snapshot, graphs, Q, LocalGraphStore.load(path)
+
+
+def test_stored_graph_matches_training_states(trained):
+    _, graphs, Q, store = trained
+    assert len(store) == len(graphs)
+    for lat, lng, reference, start in graphs:
+        slot = store.find(lat, lng)
+        assert slot is not None
+        G, start_node = store.graph(slot)
+        assert start_node == start
+        report = state_parity(G, start_node, reference, start, Q)
+        assert report['nodes'] and report['neighbors'] and report['edge_bits']
+        assert report['first_mismatch'] is None
+        assert report['q_hits'] == report['reference_q_hits'] > 0
+
+
+def test_snapshot_cut_order_is_detected(trained):
+    snapshot, graphs, Q, _ = trained
+    lat, lng, reference, start = graphs[0]
+    G = extract_subgraph(snapshot, lat, lng, dist=DIST)
+    assert set(G.nodes) == set(reference.nodes)
+    report = state_parity(G, nearest_node(G, lat, lng), reference, start, Q)
+    assert not report['edge_bits']
+    assert report['first_mismatch'] is not None
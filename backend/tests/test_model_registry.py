@@ -0,0 +1,74 @@
+"""ModelRegistry가 저장된 학습 그래프만 쓰는지 (ai_inference)"""
+import pickle
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+import ai_inference
+import services.local_graph as local_graph
+from bench.city import grid_city
+from services.graph_snapshot import GraphSnapshot
+from services.local_graph import extract_subgraph, graphs_path, nearest_node, save_local_graphs
+from services.plow_engine import CompiledGraph, inference_tables
+
+DIST = 600
+
+
+@pytest.fixture
+def models(tmp_path):
+    snapshot = GraphSnapshot.from_graph(grid_city(12, seed=7), region='test grid')
+    lat, lng = float(snapshot.node_y[20]), float(snapshot.node_x[20])
+    cut = extract_subgraph(snapshot, lat, lng, dist=DIST)
+    # 학습 그래프: 스냅샷 잘라낸 것과 노드/엣지 순서가 다름
+    nodes, edges = list(cut.nodes(data=True)), list(cut.edges(keys=True, data=True))
+    random.Random(0).shuffle(edges)
+    trained = nx.MultiDiGraph(crs='epsg:4326')
+    trained.add_nodes_from(reversed(nodes))
+    trained.add_edges_from(edges)
+    graph_dict, edge_attr = inference_tables(trained)
+    full = (1 << len(edge_attr)) - 1
+    Q = {((u, full), v): 1.0 for u, nbs in graph_dict.items() for v in nbs}
+    pkl_path = tmp_path / 'q_table_test.pkl'
+    with open(pkl_path, 'wb') as f:
+        pickle.dump({'Q': Q}, f)
+    save_local_graphs(graphs_path(str(pkl_path)), [(lat, lng, trained, nearest_node(trained, lat, lng))])
+    return snapshot, trained, (lat, lng), ai_inference.ModelRegistry(model_dir=str(tmp_path))
+
+
+@pytest.fixture(autouse=True)
+def no_fallback(monkeypatch):
+    """저장된 그래프 대신 내려받거나 스냅샷에서 잘라내면 실패"""
+    def fail(*args, **kwargs):
+        raise AssertionError("학습 그래프 대신 다른 그래프를 만들었습니다")
+    monkeypatch.setattr(local_graph, 'download_graph', fail)
+    monkeypatch.setattr(local_graph, 'extract_subgraph', fail)
+
+
+def test_stored_graph_is_used(models):
+    _, trained, (lat, lng), registry = models
+    assert registry.has_graph(lat, lng)
+    local = registry.local_graph(lat, lng)
+    assert list(local.G.nodes) == list(trained.nodes)
+    assert list(local.G.edges(keys=True)) == list(trained.edges(keys=True))
+    assert local.start_node == nearest_node(trained, lat, lng)
+    assert registry.local_graph(lat, lng) is local
+
+
+def test_missing_graph_is_refused(models):
+    snapshot, _, _, registry = models
+    lat, lng = float(snapshot.node_y[100]), float(snapshot.node_x[100])
+    assert not registry.has_graph(lat, lng)
+    with pytest.raises(FileNotFoundError, match='services.local_graph export'):
+        registry.local_graph(lat, lng)
+    assert registry.warm([(lat, lng)]) == 0
+
+
+def test_plan_route_uses_stored_graph(models, monkeypatch):
+    snapshot, trained, (lat, lng), registry = models
+    monkeypatch.setattr(ai_inference, 'registry', registry)
+    result = ai_inference.plan_route('test', lat, lng)
+    # 엣지 비트 순서가 학습 그래프와 같음
+    assert np.array_equal(result['edges'], CompiledGraph(*inference_tables(trained)).edge_pairs)
+    assert ai_inference.get_ai_route('test', float(snapshot.node_y[100]), float(snapshot.node_x[100])) is None
@@ -0,0 +1,118 @@
+"""plow_engine(CompiledSnowEnv + 정책)이 기존 ai_inference.InferenceSnowEnv / select_action과 같은 행동을 고르는지"""
+import random
+from collections import deque
+
+import pytest
+
+from ai_inference import InferenceSnowEnv, select_action
+from bench.city import grid_city
+from services.graph_snapshot import GraphSnapshot
+from services.local_graph import extract_subgraph, nearest_node
+from services.plow_engine import (FRONTIER_WEIGHT, LOOKAHEAD_HOPS, LOOKAHEAD_WEIGHT, CompiledGraph,
+                                  CompiledSnowEnv, inference_tables, make_policy)
+
+STEPS = 300
+# 동점이 자주 나오도록 몇 가지 값만 사용 (FRONTIER_WEIGHT 배수 포함)
+Q_VALUES = (0.0, 1.0, 2.5, FRONTIER_WEIGHT, -FRONTIER_WEIGHT)
+
+
+def _lookahead_reference(env, Q, k=LOOKAHEAD_HOPS, weight=LOOKAHEAD_WEIGHT):
+    """select_action + k홉 안 가장 가까운 미제설 노드 보너스 (정수 비트마스크 환경에서 직접 계산)"""
+    node = env.cur
+    actions = list(env.g[node])
+    if not actions:
+        return None
+    cand = [a for a in actions if a not in env.node_tabu] or actions
+
+    def nearest(src):
+        seen, frontier = {src}, deque([(src, 0)])
+        while frontier:
+            u, hop = frontier.popleft()
+            if env.incident_unplowed(u):
+                return hop
+            if hop < k:
+                for v in env.g[u]:
+                    if v not in seen:
+                        seen.add(v)
+                        frontier.append((v, hop + 1))
+        return k + 1
+
+    best, best_val = None, -1e18
+    for a in cand:
+        val = Q.get(((env.cur, env.unplowed), a), 0.0) + FRONTIER_WEIGHT * env.incident_unplowed(a) \
+            + weight * (k + 1 - nearest(a)) / (k + 1)
+        if val > best_val:
+            best, best_val = a, val
+    return best
+
+
+REFERENCE = {'greedy': select_action, 'lookahead': _lookahead_reference}
+
+
+def _reference_rollout(G, start, Q, policy, fill=None):
+    """기존 구현으로 실행한 노드 순서. fill(rng)이 있으면 방문한 상태마다 Q 항목을 채워 가며 실행"""
+    graph_dict, edge_attr = inference_tables(G)
+    env = InferenceSnowEnv(start, graph_dict, edge_attr, step_limit=STEPS)
+    path = [start]
+    for _ in range(STEPS):
+        if fill is not None:
+            for a in graph_dict[env.cur]:
+                if fill.random() < 0.7:
+                    Q[((env.cur, env.unplowed), a)] = fill.choice(Q_VALUES)
+        nxt = REFERENCE[policy](env, Q)
+        if nxt is None:
+            break
+        _, done = env.step(nxt)
+        path.append(nxt)
+        if done:
+            break
+    return path
+
+
+def _compiled_rollout(G, start, Q, policy):
+    graph = CompiledGraph(*inference_tables(G))
+    q_index = graph.compile_q(Q)
+    select = make_policy(policy, graph)
+    env = CompiledSnowEnv(graph, graph.node_id[start], step_limit=STEPS)
+    path = [start]
+    for _ in range(STEPS):
+        nxt = select(env, q_index)
+        if nxt is None:
+            break
+        _, done = env.step(nxt)
+        path.append(graph.nodes[nxt])
+        if done:
+            break
+    return path
+
+
+@pytest.fixture(scope='module')
+def bases():
+    snapshot = GraphSnapshot.from_graph(grid_city(16, seed=11), region='test grid')
+    rng = random.Random(2)
+    out = []
+    for i in rng.sample(range(snapshot.n_nodes), 4):
+        lat, lng = float(snapshot.node_y[i]), float(snapshot.node_x[i])
+        G = extract_subgraph(snapshot, lat, lng, dist=700)
+        out.append((G, nearest_node(G, lat, lng)))
+    return out
+
+
+@pytest.mark.parametrize('policy', ['greedy', 'lookahead'])
+def test_same_actions_as_reference(bases, policy):
+    for seed, (G, start) in enumerate(bases):
+        Q = {}
+        _reference_rollout(G, start, Q, policy, fill=random.Random(seed))
+        # 무관한 키 형식과 이 그래프에 없는 노드도 섞음
+        Q['not a state'] = 1.0
+        Q[((-1, 1), start)] = 100.0
+        expected = _reference_rollout(G, start, Q, policy)
+        assert len(expected) > 20
+        assert _compiled_rollout(G, start, Q, policy) == expected
+
+
+def test_same_actions_without_q(bases):
+    # Q가 비면 모든 후보가 frontier만으로 비교돼 동점이 가장 많다
+    for G, start in bases:
+        for policy in REFERENCE:
+            assert _compiled_rollout(G, start, {}, policy) == _reference_rollout(G, start, {}, policy)
@@ -0,0 +1,31 @@
+"""/api/professional/jobs: 제출한 사용자만 조회/취소"""
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def blocked(app_module, monkeypatch):
+    """작업이 끝나지 않도록 추론을 막아 둠"""
+    release = threading.Event()
+
+    def fake_plan(gu_name, lat, lng, policy=None):
+        release.wait(5)
+        return {'path': [], 'plowed_edges': 0, 'total_edges': 0}
+    monkeypatch.setattr(app_module, 'plan_route_in_pool', fake_plan)
+    yield
+    release.set()
+
+
+def test_other_user_cannot_read_or_cancel_job(client, login, blocked):
+    alice, bob = login('alice', role='expert'), login('bob', role='expert')
+    body = {'gu_name': 'gangnam', 'base_coords': {'lat': 37.5, 'lng': 127.0}}
+    job_id = client.post('/api/professional/jobs', json=body, headers=alice).get_json()['job_id']
+
+    assert client.get(f'/api/professional/jobs/{job_id}', headers=bob).status_code == 404
+    assert client.delete(f'/api/professional/jobs/{job_id}', headers=bob).status_code == 404
+    assert client.get(f'/api/professional/jobs/{job_id}', headers=alice).status_code == 200
+
+    response = client.delete(f'/api/professional/jobs/{job_id}', headers=alice)
+    assert response.status_code == 200
+    assert response.get_json()['cancel_requested']
@@ -0,0 +1,98 @@
+"""CompactQTable(.qtab) 조회가 딕셔너리 Q(plow_engine.QIndex)와 같은지"""
+import pickle
+import random
+
+import pytest
+
+from bench.city import grid_city
+from services.graph_snapshot import GraphSnapshot
+from services.local_graph import extract_subgraph, nearest_node
+from services.plow_engine import CompiledGraph, CompiledSnowEnv, QIndex, inference_tables, select_action
+from services.qtable import CompactQTable, compact_arrays
+
+STEPS = 250
+
+
+@pytest.fixture(scope='module')
+def model(tmp_path_factory):
+    """격자 도시 기지 그래프들과, 실제로 방문하는 상태를 채운 Q 딕셔너리 / 변환한 .qtab"""
+    snapshot = GraphSnapshot.from_graph(grid_city(16, seed=4), region='test grid')
+    rng = random.Random(9)
+    graphs, Q = [], {}
+    for i in rng.sample(range(snapshot.n_nodes), 3):
+        lat, lng = float(snapshot.node_y[i]), float(snapshot.node_x[i])
+        G = extract_subgraph(snapshot, lat, lng, dist=700)
+        graph = CompiledGraph(*inference_tables(G))
+        env = CompiledSnowEnv(graph, graph.node_id[nearest_node(G, lat, lng)], step_limit=STEPS)
+        # 방문 상태의 일부 행동에만 값을 넣어 빠진 키도 조회되게 함 (값은 float32로 표현되지 않는 실수)
+        for _ in range(STEPS):
+            state = (graph.nodes[env.cur], env.unplowed)
+            for a in graph.neighbors[env.cur]:
+                if rng.random() < 0.6:
+                    Q[(state, graph.nodes[a])] = rng.uniform(-30, 30)
+            nxt = select_action(env, QIndex(Q, graph))
+            if nxt is None or env.step(nxt)[1]:
+                break
+        graphs.append((graph, env.start))
+    # 없는 노드, 음수/실수 상태, 형식이 다른 키
+    Q[((-5, 1), -6)] = 1.0
+    Q[((graphs[0][0].nodes[0], -1), graphs[0][0].nodes[0])] = 7.0
+    Q[((graphs[0][0].nodes[0], 1.5), graphs[0][0].nodes[0])] = 7.0
+    Q['bad key'] = 3.0
+
+    pkl_path = str(tmp_path_factory.mktemp('models') / 'q_table_test.pkl')
+    with open(pkl_path, 'wb') as f:
+        pickle.dump({'Q': Q}, f)
+    table = CompactQTable.load(CompactQTable.convert(pkl_path))
+    assert table.is_current(pkl_path)
+    return graphs, Q, table
+
+
+def _rollout(graph, start, q_index, probe=None):
+    env = CompiledSnowEnv(graph, start, step_limit=STEPS)
+    path = []
+    for _ in range(STEPS):
+        if probe is not None:
+            probe(env)
+        nxt = select_action(env, q_index)
+        if nxt is None:
+            break
+        path.append(nxt)
+        if env.step(nxt)[1]:
+            break
+    return path
+
+
+def test_lookups_match_dict(model):
+    graphs, Q, table = model
+    for graph, start in graphs:
+        reference, compact = QIndex(Q, graph), table.index_for(graph)
+        lookups = []
+
+        def probe(env):
+            for a in range(len(graph.nodes)) if env.t == 0 else graph.neighbors[env.cur]:
+                lookups.append((reference.get(env, a), compact.get(env, a)))
+        _rollout(graph, start, reference, probe)
+        assert any(ref != 0.0 for ref, _ in lookups)
+        assert any(ref == 0.0 for ref, _ in lookups)
+        assert all(ref == got for ref, got in lookups)
+
+
+def test_greedy_actions_match_dict(model):
+    graphs, Q, table = model
+    for graph, start in graphs:
+        expected = _rollout(graph, start, QIndex(Q, graph))
+        assert len(expected) > 50
+        assert _rollout(graph, start, table.index_for(graph)) == expected
+
+
+def test_state_check_rejects_hash_collision(model):
+    graphs, Q, table = model
+    graph, start = graphs[0]
+    env = CompiledSnowEnv(graph, start, step_limit=STEPS)
+    state = (graph.nodes[start], env.unplowed)
+    action = next(a for a in graph.neighbors[start] if (state, graph.nodes[a]) in Q)
+    # 해시(unplowed mod 2^61-1)는 같고 상태 정수는 다른 키만 있는 표
+    collided = {((state[0], state[1] + (1 << 61) - 1), graph.nodes[action]): 5.0}
+    assert QIndex(collided, graph).get(env, action) == 0.0
+    assert CompactQTable({'kind': 'qtable'}, compact_arrays(collided)).index_for(graph).get(env, action) == 0.0
@@ -0,0 +1,83 @@
+"""map_scores(벡터화 조인)를 기존 엣지별 dict 조회와 비교: osmid 목록, 테이블에 없는 id, 열별 최댓값"""
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench.city import grid_city, write_risk_csv
+from services.graph_snapshot import GraphSnapshot
+from services.risk_scores import CSV_COLUMNS, load_score_table, map_scores
+
+
+def _baseline(G, csv_path):
+    """이전 구현: road_id -> 점수 dict (중복은 최고 위험도 행), 엣지 osmid 중 있는 것들의 열별 max, 없으면 0"""
+    score_df = pd.read_csv(csv_path)
+    score_df = score_df.sort_values('final_risk_score', ascending=False).drop_duplicates(['road_id'])
+    risk_map = score_df.set_index('road_id')[CSV_COLUMNS].to_dict('index')
+    expected = {}
+    for u, v, k, data in G.edges(keys=True, data=True):
+        osmids = data.get('osmid', [])
+        osmids = osmids if isinstance(osmids, list) else [osmids]
+        target_ids = [i for i in osmids if i in risk_map]
+        expected[u, v, k] = [max(risk_map[i][col] for i in target_ids) if target_ids else 0.0
+                             for col in CSV_COLUMNS]
+    return expected
+
+
+def _assert_parity(G, csv_path):
+    snapshot = GraphSnapshot.from_graph(G)
+    scores = map_scores(snapshot.osmid_offsets, snapshot.osmid_values, load_score_table(csv_path))
+    expected = _baseline(G, csv_path)
+    src = np.repeat(np.arange(snapshot.n_nodes), np.diff(snapshot.indptr))
+    assert scores.shape == (len(expected), len(CSV_COLUMNS))
+    for e in range(snapshot.n_edges):
+        key = (int(snapshot.node_osmid[src[e]]), int(snapshot.node_osmid[snapshot.edge_target[e]]),
+               int(snapshot.edge_key[e]))
+        np.testing.assert_array_equal(scores[e], expected[key], err_msg=str(key))
+
+
+def _row(road_id, final, *rest):
+    rest = rest or (final,) * (len(CSV_COLUMNS) - 1)
+    return {'road_id': road_id, **dict(zip(CSV_COLUMNS, (final, *rest)))}
+
+
+def test_map_scores_matches_per_edge_lookup(tmp_path):
+    G = nx.MultiDiGraph()
+    for n in range(1, 7):
+        G.add_node(n, x=127.0 + n * 1e-3, y=37.5)
+    G.add_edge(1, 2, osmid=10, length=10)               # 단일 id
+    G.add_edge(2, 3, osmid=[10, 11, 12], length=10)     # 목록: 열마다 다른 id가 최댓값
+    G.add_edge(3, 4, osmid=[99, 11], length=10)         # 일부만 테이블에 있음
+    G.add_edge(4, 5, osmid=[98, 99], length=10)         # 모두 없음 -> 0점
+    G.add_edge(5, 6, length=10)                         # osmid 없음 -> 0점
+    G.add_edge(5, 6, osmid=13, length=12)               # 병렬 엣지 (key 1)
+    G.add_edge(6, 1, osmid=[13, 97, 14], length=10)     # 음수 점수 + 없는 id (0이 아니라 있는 id의 최댓값)
+    csv_path = str(tmp_path / 'risk.csv')
+    pd.DataFrame([
+        _row(10, 30.0, 0.9, 0.1, 0.5, 0.2, 40.0),
+        _row(11, 70.0, 0.2, 0.8, 0.5, 0.7, 10.0),
+        _row(12, 50.0, 0.4, 0.3, 0.9, 0.1, 90.0),
+        _row(13, -5.0),
+        _row(14, -2.0, -1.0, -3.0, -0.5, -4.0, -6.0),
+        _row(11, 20.0, 1.0, 1.0, 1.0, 1.0, 99.0),       # 중복 road_id: 위험도가 높은 행만 사용
+        _row(15, 100.0),                                # 그래프에 없는 road_id
+    ]).to_csv(csv_path, index=False)
+
+    _assert_parity(G, csv_path)
+    snapshot = GraphSnapshot.from_graph(G)
+    scores = map_scores(snapshot.osmid_offsets, snapshot.osmid_values, load_score_table(csv_path))
+    # (2, 3): 열별로 10/11/12 중 최댓값 (노드 2의 유일한 나가는 엣지)
+    e = int(snapshot.indptr[snapshot.node_index(2)])
+    np.testing.assert_array_equal(scores[e], [70.0, 0.9, 0.8, 0.9, 0.7, 90.0])
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_map_scores_matches_per_edge_lookup_on_grid(tmp_path, seed):
+    G = grid_city(8, seed=seed)
+    snapshot = GraphSnapshot.from_graph(G)
+    csv_path = str(tmp_path / 'risk.csv')
+    write_risk_csv(snapshot, csv_path, seed=seed)
+    # 일부 road_id를 빼서 테이블에 없는 id가 섞이게 한다
+    df = pd.read_csv(csv_path)
+    df.sample(frac=0.7, random_state=seed).to_csv(csv_path, index=False)
+    _assert_parity(G, csv_path)
@@ -0,0 +1,57 @@
+"""RouteCache 공유 SQLite 저장소: delta는 바뀐 그룹을 지나는 항목만 지우고 나머지는 워커 간 계속 공유"""
+import pytest
+
+from services.route_cache import RouteCache, SqliteRouteStore
+
+FAST = RouteCache.key(1, 2, 'fast', 1, 'alt')
+OTHER = RouteCache.key(3, 4, 'fast', 1, 'alt')
+SAFE = RouteCache.key(1, 2, 'safe', 1, 'alt')
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """같은 공유 저장소를 쓰는 두 워커의 캐시"""
+    path = str(tmp_path / 'routes.db')
+    return RouteCache(shared=SqliteRouteStore(path)), RouteCache(shared=SqliteRouteStore(path))
+
+
+def test_delta_keeps_unrelated_shared_entries(workers):
+    a, b = workers
+    a.put(FAST, 'fast', {1, 2}, revision=1)
+    a.put(OTHER, 'other', {3}, revision=1)
+    a.put(SAFE, 'safe', {4}, revision=1)
+
+    # 두 워커가 같은 delta(revision 2)를 적용: 그룹 2를 지나는 경로만 무효
+    a.invalidate([2], (), revision=2)
+    b.invalidate([2], (), revision=2)
+    assert b.get(FAST, 2) is None
+    assert b.get(OTHER, 2) == 'other'
+    assert b.get(SAFE, 2) == 'safe'
+
+    # 점수가 내려간 모드는 그 모드 전체 무효
+    a.invalidate((), {'safe'}, revision=3)
+    fresh = RouteCache(shared=a.shared)
+    assert fresh.get(SAFE, 3) is None
+    assert fresh.get(OTHER, 3) == 'other'
+
+
+def test_stale_revision_is_not_shared(workers):
+    a, b = workers
+    a.invalidate([2], (), revision=2)
+    # delta를 아직 적용하지 못한 워커가 이전 점수로 계산한 결과는 공유 저장소에 들어가지 않는다
+    b.put(FAST, 'stale', {2}, revision=1)
+    assert RouteCache(shared=a.shared).get(FAST, 2) is None
+
+    a.put(FAST, 'fresh', {2}, revision=2)
+    # 다른 워커의 delta가 늦게 와도 새 revision으로 계산된 항목은 지우지 않는다
+    b.invalidate([2], (), revision=2)
+    assert RouteCache(shared=a.shared).get(FAST, 2) == 'fresh'
+    # 아직 그 revision에 못 미친 워커에게는 주지 않는다
+    assert RouteCache(shared=a.shared).get(FAST, 1) is None
+
+
+def test_full_reload_clears_shared_entries(workers):
+    a, b = workers
+    a.put(OTHER, 'other', {3}, revision=1)
+    b.clear(revision=2)
+    assert RouteCache(shared=a.shared).get(OTHER, 2) is None
@@ -0,0 +1,41 @@
+"""/api/admin/route_digest: 관리자만, 페이지 단위로 평가"""
+
+
+def _save_routes(client, headers, finder, count):
+    snapshot = finder.snapshot
+    for i in range(count):
+        s, t = i, snapshot.n_nodes - 1 - i
+        client.post('/api/routes', headers=headers, json={
+            'name': f'route {i}', 'start_name': 'a', 'end_name': 'b',
+            'start_lat': float(snapshot.node_y[s]), 'start_lng': float(snapshot.node_x[s]),
+            'end_lat': float(snapshot.node_y[t]), 'end_lng': float(snapshot.node_x[t]),
+        })
+
+
+def test_expert_cannot_read_other_users_routes(client, login, app_module, grid_finder, monkeypatch):
+    monkeypatch.setattr(app_module, 'route_finder', grid_finder)
+    _save_routes(client, login('alice'), grid_finder, 2)
+    response = client.post('/api/admin/route_digest', json={}, headers=login('mallory', role='expert'))
+    assert response.status_code == 403
+
+
+def test_admin_digest_is_paginated(client, login, app_module, grid_finder, monkeypatch):
+    monkeypatch.setattr(app_module, 'route_finder', grid_finder)
+    monkeypatch.setattr(app_module, 'ADMIN_USERS', frozenset({'ops'}))
+    _save_routes(client, login('alice'), grid_finder, 3)
+    _save_routes(client, login('bob'), grid_finder, 2)
+    headers = login('ops')
+
+    seen, after_id, pages = [], 0, 0
+    while after_id is not None:
+        body = client.post('/api/admin/route_digest', json={'limit': 2, 'after_id': after_id}, headers=headers).get_json()
+        assert body['success']
+        routes = [r for user in body['users'] for r in user['routes']]
+        assert len(routes) <= 2
+        seen.extend(r['id'] for r in routes)
+        after_id, pages = body['next_after_id'], pages + 1
+    assert sorted(seen) == seen and len(set(seen)) == 5
+    assert pages == 3
+
+    assert client.post('/api/admin/route_digest', json={'limit': 0}, headers=headers).status_code == 400
+    assert client.post('/api/admin/route_digest', json={'limit': 10 ** 6}, headers=headers).status_code == 400
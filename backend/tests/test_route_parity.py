@@ -0,0 +1,99 @@
+"""RouteEngine / RouteFinder.find_path 결과를 networkx shortest_path와 비교 (합성 격자 도시)"""
+import math
+import random
+
+import networkx as nx
+import pandas as pd
+import pytest
+
+from bench.city import grid_city, write_risk_csv
+from services.graph_snapshot import GraphSnapshot
+from services.route_algo import RouteFinder
+from services.route_engine import ALGORITHMS, MODES
+
+GRID_SIZE = 14
+N_PAIRS = 40
+
+
+def _weight(mode):
+    """기존 networkx 구현의 가중치 (safe: 위험도 60/80 이상 100/1000배, 병렬 엣지는 최솟값)"""
+    def weight(u, v, d):
+        best = float('inf')
+        for attr in d.values():
+            length = attr['length']
+            if mode == 'safe':
+                if attr['risk_score'] >= 80: length *= 1000
+                elif attr['risk_score'] >= 60: length *= 100
+            best = min(best, length)
+        return best
+    return weight
+
+
+@pytest.fixture(scope='module')
+def city(tmp_path_factory):
+    root = tmp_path_factory.mktemp('city')
+    G = grid_city(GRID_SIZE, seed=3)
+    snap_path, csv_path = str(root / 'grid.snap'), str(root / 'risk.csv')
+    snapshot = GraphSnapshot.from_graph(G, region='test grid')
+    snapshot.save(snap_path)
+    write_risk_csv(snapshot, csv_path, seed=3)
+
+    # 기준 그래프: 스냅샷을 거치지 않고 CSV를 원본 그래프 엣지에 직접 매핑 (osmid 여러 개면 최댓값)
+    risk = pd.read_csv(csv_path).groupby('road_id')['final_risk_score'].max().to_dict()
+    for _, _, data in G.edges(data=True):
+        osmids = data['osmid'] if isinstance(data['osmid'], list) else [data['osmid']]
+        data['risk_score'] = max(risk.get(o, 0.0) for o in osmids)
+
+    finder = RouteFinder(csv_path=csv_path, snapshot_path=snap_path, cache_size=0, landmark_count=6)
+    finder.build_landmarks(save=True)
+    rng = random.Random(0)
+    pairs = [(rng.randrange(snapshot.n_nodes), rng.randrange(snapshot.n_nodes)) for _ in range(N_PAIRS)]
+    return G, finder, pairs
+
+
+def _expected(G, osmids, s, t, mode):
+    try:
+        nodes = nx.shortest_path(G, osmids[s], osmids[t], weight=_weight(mode))
+    except nx.NetworkXNoPath:
+        return None, None
+    weight = _weight(mode)
+    return nodes, sum(weight(u, v, G[u][v]) for u, v in zip(nodes, nodes[1:]))
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_engine_matches_networkx(city, mode):
+    G, finder, pairs = city
+    state = finder.state
+    assert mode in state.landmark_modes
+    osmids = finder.snapshot.node_osmid.tolist()
+    costs = state.costs[mode]
+    for s, t in pairs:
+        expected_nodes, expected_cost = _expected(G, osmids, s, t, mode)
+        for algorithm in ALGORITHMS:
+            result = finder.engine.search(s, t, costs, algorithm, landmarks=finder.landmarks)
+            if expected_nodes is None:
+                assert result is None, (algorithm, s, t)
+                continue
+            assert [osmids[n] for n in result.nodes] == expected_nodes, (algorithm, s, t)
+            assert math.isclose(result.cost, expected_cost, rel_tol=1e-9), (algorithm, s, t)
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_find_path_follows_networkx_nodes(city, mode):
+    G, finder, pairs = city
+    snapshot = finder.snapshot
+    osmids = snapshot.node_osmid.tolist()
+    for s, t in pairs:
+        expected_nodes, _ = _expected(G, osmids, s, t, mode)
+        route = finder.find_path(float(snapshot.node_y[s]), float(snapshot.node_x[s]),
+                                 float(snapshot.node_y[t]), float(snapshot.node_x[t]), mode=mode, with_stats=True)
+        if expected_nodes is None:
+            assert route is None, (s, t)
+            continue
+        assert route['search']['algorithm'] == 'alt'
+        # 경로 좌표열(geometry 포함)에 기준 경로의 노드 좌표가 순서대로 모두 나와야 함
+        coords = iter(route['path'])
+        for osmid in expected_nodes:
+            node = G.nodes[osmid]
+            assert any(math.isclose(lat, node['y'], abs_tol=1e-9) and math.isclose(lng, node['x'], abs_tol=1e-9)
+                       for lat, lng in coords), (s, t, osmid)
@@ -0,0 +1,85 @@
+"""RouteFinder.apply_score_deltas: 빈 점수 테이블/기존 테이블에 대한 반영과 경로 캐시 선택 무효화"""
+import numpy as np
+import pytest
+
+from bench.city import grid_city, write_risk_csv
+from services.graph_snapshot import GraphSnapshot
+from services.risk_scores import CSV_COLUMNS
+from services.route_algo import RouteFinder
+
+SCORE = CSV_COLUMNS.index('final_risk_score')
+
+
+@pytest.fixture(scope='module')
+def city(tmp_path_factory):
+    root = tmp_path_factory.mktemp('deltas')
+    snap_path, csv_path = str(root / 'grid.snap'), str(root / 'risk.csv')
+    snapshot = GraphSnapshot.from_graph(grid_city(10, seed=2), region='test grid')
+    snapshot.save(snap_path)
+    write_risk_csv(snapshot, csv_path, seed=2)
+    return snapshot, snap_path, csv_path, str(root / 'missing.csv')
+
+
+def _roads(snapshot, edge):
+    return snapshot.osmid_values[snapshot.osmid_offsets[edge]:snapshot.osmid_offsets[edge + 1]].tolist()
+
+
+def _point(snapshot, node):
+    return float(snapshot.node_y[node]), float(snapshot.node_x[node])
+
+
+@pytest.mark.parametrize('csv', ['existing', 'empty'])
+def test_delta_updates_only_matching_edges(city, csv):
+    snapshot, snap_path, csv_path, missing_path = city
+    finder = RouteFinder(csv_path=csv_path if csv == 'existing' else missing_path, snapshot_path=snap_path,
+                         cache_size=0)
+    old = finder.state
+    assert (len(old.table) == 0) == (csv == 'empty')
+
+    road = _roads(snapshot, 0)[0]
+    result = finder.apply_score_deltas([{'road_id': road, 'final_risk_score': 95.0}])
+
+    edges = finder.edges_for_roads([road])
+    assert edges.size
+    assert result['revision'] == old.revision + 1 and result['version'] == old.version
+    assert finder.state.revision == old.revision + 1
+    assert finder.state.table.rows([road])[0, SCORE] == 95.0
+    # 같은 road_id를 지나는 엣지만 바뀌고 나머지 엣지 점수는 그대로
+    assert np.all(finder.state.scores[edges, SCORE] >= 95.0)
+    others = np.setdiff1d(np.arange(snapshot.n_edges), edges)
+    np.testing.assert_array_equal(finder.state.scores[others], old.scores[others])
+    if csv == 'empty':
+        # 빈 테이블에 추가된 행 외에는 모두 0점 (테이블에 없는 road_id)
+        assert len(finder.state.table) == 1
+        assert not finder.state.scores[others].any()
+
+
+def test_delta_invalidates_only_routes_through_changed_edges(city):
+    snapshot, snap_path, csv_path, _ = city
+    finder = RouteFinder(csv_path=csv_path, snapshot_path=snap_path, cache_size=1024)
+    n = snapshot.n_nodes
+    pairs = [(0, n - 1), (n - 1, 0), (0, 9), (n - 10, n - 1), (5, n - 5)]
+    for s, t in pairs:
+        finder.find_path(*_point(snapshot, s), *_point(snapshot, t), mode='fast')
+    cached = dict(finder.cache._entries)
+    assert len(cached) == len(pairs)
+
+    # 첫 경로가 지나는 그룹의 도로 점수를 올린다 (내려가면 모드 전체가 무효화된다)
+    target = next(iter(cached))
+    group = min(cached[target].groups)
+    roads = sorted({r for e in np.flatnonzero(finder.engine.edge_group == group) for r in _roads(snapshot, e)})
+    groups = set(finder.engine.edge_group[finder.edges_for_roads(roads)].tolist())
+    result = finder.apply_score_deltas([{'road_id': r, 'final_risk_score': 100.0} for r in roads])
+
+    hit = {key for key, entry in cached.items() if not groups.isdisjoint(entry.groups)}
+    kept = set(cached) - hit
+    assert target in hit and kept
+    assert result['invalidated_routes'] == len(hit)
+    assert set(finder.cache._entries) == kept
+
+    # 남은 경로는 캐시에서, 지워진 경로는 새로 계산
+    hits, misses = finder.cache.hits, finder.cache.misses
+    for s, t in pairs:
+        finder.find_path(*_point(snapshot, s), *_point(snapshot, t), mode='fast')
+    assert finder.cache.hits - hits == len(kept)
+    assert finder.cache.misses - misses == len(hit)
@@ -0,0 +1,15 @@
+"""
+운영 서버 진입점 (prefork, 워커 여러 개)
+
+  gunicorn -c gunicorn.conf.py wsgi:app
+
+부모 프로세스가 이 모듈을 한 번 import하며 지도/점수/인덱스를 올리고(preload_app),
+워커들은 fork로 그 메모리를 복사 없이 함께 쓴다. 워커 수만큼 라우팅이 병렬로 돌지만
+그래프 메모리는 한 벌이다. 워커 간 점수 변경은 services.score_sync로 맞춘다.
+개발 중에는 기존처럼 python app.py.
+"""
+from app import app, db, init_services
+
+with app.app_context():
+    db.create_all()
+init_services(prefork=True)